@@ -0,0 +1,206 @@
+"""
+Painel de analytics pré-calculado por distrito
+
+O painel é servido de duas tabelas de resumo: `resumos_distrito` (totais,
+top pregadores e avaliações recentes do distrito) e `resumos_distrito_mes`
+(itens, recusas, cancelamentos e avaliações por mês).
+
+- Nas escritas, o flush marca como desatualizados os resumos dos distritos
+  afetados (um UPDATE que só toca a linha se ela ainda estava atualizada).
+  Escritas em lote marcam os distritos das linhas inseridas ou o da opção
+  `id_distrito` do comando; sem nenhum dos dois, marcam todos.
+- Na leitura, um resumo desatualizado (ou inexistente) é recalculado com a
+  linha travada (FOR UPDATE), e `versao` é incrementada; o ETag do painel é
+  derivado dela, então um cliente com o painel em cache recebe 304.
+- `scripts/refresh_analytics.py` recalcula os desatualizados fora do
+  horário de uso, se preferir não pagar o recálculo na primeira leitura.
+"""
+from datetime import datetime, timezone
+from itertools import chain
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, extract, func, inspect, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models import Avaliacao, Distrito, Escala, Igreja, ItemEscala, ResumoDistrito, ResumoDistritoMes, Usuario, linhas_escrita_em_lote
+
+TOP_PREGADORES = 10
+AVALIACOES_RECENTES = 20
+COLUNAS_AVALIACAO = ['id', 'id_item_escala', 'id_igreja', 'tipo_membro', 'id_usuario_avaliado', 'nota', 'comentario', 'criado_em']
+
+
+def etag(resumo: ResumoDistrito) -> str:
+    return f'W/"{resumo.id_distrito}-{resumo.versao}"'
+
+
+def _recalcular(db: Session, resumo: ResumoDistrito):
+    id_distrito = resumo.id_distrito
+    resumo.total_igrejas = db.scalar(select(func.count()).select_from(Igreja).where(Igreja.id_distrito == id_distrito, Igreja.ativo == True))
+    ativos = (Usuario.id_distrito == id_distrito, Usuario.ativo == True)
+    resumo.total_pregadores, resumo.total_cantores = db.execute(select(func.count().filter(Usuario.eh_pregador == True), func.count().filter(Usuario.eh_cantor == True)).where(*ativos)).one()
+    pregadores = db.execute(select(Usuario.id, Usuario.nome_usuario, Usuario.nome_completo, Usuario.id_igreja, Usuario.pontuacao_pregacao).where(*ativos, Usuario.eh_pregador == True).order_by(Usuario.pontuacao_pregacao.desc()).limit(TOP_PREGADORES)).all()
+    resumo.top_pregadores = [dict(linha._mapping) for linha in pregadores]
+    igrejas = select(Igreja.id).where(Igreja.id_distrito == id_distrito)
+    avaliacoes = db.execute(select(*(getattr(Avaliacao, coluna) for coluna in COLUNAS_AVALIACAO)).where(Avaliacao.id_igreja.in_(igrejas)).order_by(Avaliacao.criado_em.desc()).limit(AVALIACOES_RECENTES)).all()
+    resumo.avaliacoes_recentes = [{**linha._mapping, 'criado_em': linha.criado_em.isoformat() if linha.criado_em else None} for linha in avaliacoes]
+
+    meses: Dict[Tuple[int, int], Dict[str, int]] = {}
+    itens = db.execute(
+        select(Escala.ano, Escala.mes, func.count(), func.count().filter(ItemEscala.status == 'recusado'), func.count().filter(ItemEscala.status == 'cancelado'))
+        .join(ItemEscala, ItemEscala.id_escala == Escala.id)
+        .where(Escala.id_distrito == id_distrito)
+        .group_by(Escala.ano, Escala.mes)
+    )
+    for ano, mes, total, recusados, cancelados in itens:
+        meses.setdefault((ano, mes), {}).update(total_itens=total, recusados=recusados, cancelados=cancelados)
+    ano_avaliacao, mes_avaliacao = extract('year', Avaliacao.criado_em), extract('month', Avaliacao.criado_em)
+    notas = db.execute(select(ano_avaliacao, mes_avaliacao, func.count(), func.sum(Avaliacao.nota)).where(Avaliacao.id_igreja.in_(igrejas)).group_by(ano_avaliacao, mes_avaliacao))
+    for ano, mes, total, soma in notas:
+        meses.setdefault((int(ano), int(mes)), {}).update(total_avaliacoes=total, soma_notas=soma or 0)
+    db.execute(ResumoDistritoMes.__table__.delete().where(ResumoDistritoMes.id_distrito == id_distrito))
+    if meses:
+        db.execute(insert(ResumoDistritoMes), [{'id_distrito': id_distrito, 'ano': ano, 'mes': mes, **valores} for (ano, mes), valores in meses.items()])
+
+    resumo.desatualizado = False
+    resumo.versao += 1
+    resumo.atualizado_em = datetime.now(timezone.utc)
+
+
+def obter_resumo(db: Session, id_distrito: str) -> Tuple[Optional[ResumoDistrito], bool]:
+    """Resumo do distrito, recalculado se estiver desatualizado. Retorna (resumo, recalculou); None se o distrito não existe."""
+    resumo = db.get(ResumoDistrito, id_distrito)
+    if resumo is not None and not resumo.desatualizado:
+        return resumo, False
+    if resumo is None and db.get(Distrito, id_distrito) is None:
+        return None, False
+    db.execute(insert(ResumoDistrito).values(id_distrito=id_distrito, desatualizado=True, versao=0, total_igrejas=0, total_pregadores=0, total_cantores=0, top_pregadores=[], avaliacoes_recentes=[]).on_conflict_do_nothing())
+    # Trava a linha antes de ler os dados: uma escrita concorrente que marcar o
+    # resumo como desatualizado espera este recálculo terminar
+    resumo = db.scalars(select(ResumoDistrito).where(ResumoDistrito.id_distrito == id_distrito).with_for_update().execution_options(populate_existing=True)).one()
+    if resumo.desatualizado:
+        _recalcular(db, resumo)
+        db.flush()
+    return resumo, True
+
+
+def tendencia_mensal(db: Session, id_distrito: str) -> List[Dict]:
+    linhas = db.scalars(select(ResumoDistritoMes).where(ResumoDistritoMes.id_distrito == id_distrito).order_by(ResumoDistritoMes.ano, ResumoDistritoMes.mes)).all()
+    return [{
+        'ano': linha.ano,
+        'mes': linha.mes,
+        'total_itens': linha.total_itens,
+        'recusados': linha.recusados,
+        'cancelados': linha.cancelados,
+        'taxa_recusa': round(linha.recusados / linha.total_itens, 4) if linha.total_itens else 0.0,
+        'taxa_cancelamento': round(linha.cancelados / linha.total_itens, 4) if linha.total_itens else 0.0,
+        'total_avaliacoes': linha.total_avaliacoes,
+        'media_notas': round(linha.soma_notas / linha.total_avaliacoes, 3) if linha.total_avaliacoes else None,
+    } for linha in linhas]
+
+
+def painel(db: Session, id_distrito: str) -> Tuple[Optional[Dict], Optional[str], bool]:
+    resumo, recalculou = obter_resumo(db, id_distrito)
+    if resumo is None:
+        return None, None, False
+    dados = {
+        'total_igrejas': resumo.total_igrejas,
+        'total_pregadores': resumo.total_pregadores,
+        'total_cantores': resumo.total_cantores,
+        'top_pregadores': resumo.top_pregadores,
+        'avaliacoes_recentes': resumo.avaliacoes_recentes,
+        'tendencia_mensal': tendencia_mensal(db, id_distrito),
+        'atualizado_em': resumo.atualizado_em,
+    }
+    return dados, etag(resumo), recalculou
+
+
+def atualizar_desatualizados(db: Session, todos: bool = False) -> List[str]:
+    """Recalcula os resumos desatualizados (ou, com `todos`, os de todos os distritos)."""
+    if todos:
+        db.execute(update(ResumoDistrito).values(desatualizado=True))
+        ids = db.scalars(select(Distrito.id).where(Distrito.ativo == True)).all()
+    else:
+        ids = db.scalars(select(ResumoDistrito.id_distrito).where(ResumoDistrito.desatualizado == True)).all()
+    for id_distrito in ids:
+        obter_resumo(db, id_distrito)
+        db.commit()
+    return list(ids)
+
+
+# Marcação nas escritas
+
+def _distritos_afetados(obj) -> Tuple[Set[Optional[str]], Set[str], Set[str]]:
+    """(ids de distrito, ids de escala, ids de igreja) cujo distrito deve ser marcado."""
+    estado = inspect(obj)
+    def valores(atributo):
+        historico = estado.attrs[atributo].history
+        return {valor for valor in chain(historico.added or (), historico.unchanged or (), historico.deleted or ()) if valor is not None}
+    if isinstance(obj, (Escala, Igreja, Usuario)):
+        return valores('id_distrito'), set(), set()
+    if isinstance(obj, ItemEscala):
+        return set(), valores('id_escala'), set()
+    if isinstance(obj, Avaliacao):
+        return set(), set(), valores('id_igreja')
+    return set(), set(), set()
+
+
+def _marcar(conexao, distritos: Set[Optional[str]], escalas: Set[str], igrejas: Set[str]):
+    # Só atualiza linhas ainda marcadas como atualizadas: escritas seguidas no
+    # mesmo distrito não disputam o lock da linha do resumo
+    comando = update(ResumoDistrito.__table__).where(ResumoDistrito.desatualizado == False).values(desatualizado=True)
+    if None not in distritos:  # None: distrito desconhecido, marca todos
+        comando = comando.where(or_(
+            ResumoDistrito.id_distrito.in_(distritos),
+            ResumoDistrito.id_distrito.in_(select(Escala.id_distrito).where(Escala.id.in_(escalas))),
+            ResumoDistrito.id_distrito.in_(select(Igreja.id_distrito).where(Igreja.id.in_(igrejas))),
+        ))
+    conexao.execute(comando)
+
+
+@event.listens_for(Session, 'after_flush')
+def _marcar_resumos(session, flush_context):
+    distritos, escalas, igrejas = set(), set(), set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, ResumoDistrito):
+            continue
+        d, e, i = _distritos_afetados(obj)
+        distritos |= d
+        escalas |= e
+        igrejas |= i
+    if distritos or escalas or igrejas:
+        _marcar(session.connection(), distritos, escalas, igrejas)
+
+
+def _afetados_em_lote(classe, estado) -> Tuple[Set[Optional[str]], Set[str], Set[str]]:
+    """Como `_distritos_afetados`, para um insert/update/delete em lote.
+
+    O alcance vem da opção `id_distrito` do comando ou das linhas inseridas;
+    sem nenhum dos dois (ex.: o UPDATE global de `recalcular_pontuacoes`),
+    todos os distritos são marcados.
+    """
+    id_distrito = estado.execution_options.get('id_distrito')
+    if id_distrito is not None:
+        return {id_distrito}, set(), set()
+    linhas = linhas_escrita_em_lote(estado)
+    if linhas is not None:
+        try:
+            if classe is Usuario:
+                return {linha['id_distrito'] for linha in linhas if linha.get('id_distrito')}, set(), set()
+            if classe in (Escala, Igreja):
+                return {linha['id_distrito'] for linha in linhas}, set(), set()
+            if classe is ItemEscala:
+                return set(), {linha['id_escala'] for linha in linhas}, set()
+            if classe is Avaliacao:
+                return set(), set(), {linha['id_igreja'] for linha in linhas}
+        except KeyError:
+            pass
+    return {None}, set(), set()
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _marcar_escrita_em_lote(estado):
+    if (estado.is_insert or estado.is_update or estado.is_delete) and estado.bind_mapper is not None and estado.bind_mapper.class_ in (Escala, ItemEscala, Igreja, Usuario, Avaliacao):
+        distritos, escalas, igrejas = _afetados_em_lote(estado.bind_mapper.class_, estado)
+        if distritos or escalas or igrejas:
+            _marcar(estado.session.connection(), distritos, escalas, igrejas)
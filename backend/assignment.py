@@ -0,0 +1,73 @@
+"""
+Atribuição de custo mínimo (algoritmo húngaro) em NumPy puro
+
+Usado pelo planejador otimizado para distribuir os cultos de uma mesma data
+entre os membros disponíveis.
+"""
+import numpy as np
+
+# Custo usado para pares proibidos (membro indisponível ou já escalado)
+CUSTO_PROIBIDO = 1e9
+
+
+def atribuicao_custo_minimo(custo: np.ndarray) -> np.ndarray:
+    """Resolve a atribuição retangular de custo mínimo.
+
+    Retorna, para cada linha de `custo`, o índice da coluna atribuída ou -1.
+    Pares com custo >= CUSTO_PROIBIDO nunca são devolvidos como atribuídos.
+    """
+    custo = np.asarray(custo, dtype=float)
+    n_linhas, n_colunas = custo.shape
+    if n_linhas == 0 or n_colunas == 0:
+        return np.full(n_linhas, -1, dtype=int)
+    if n_linhas > n_colunas:
+        colunas = atribuicao_custo_minimo(custo.T)
+        resultado = np.full(n_linhas, -1, dtype=int)
+        for coluna, linha in enumerate(colunas):
+            if linha >= 0:
+                resultado[linha] = coluna
+        return resultado
+
+    # Caminhos aumentantes mais curtos com potenciais (índices a partir de 1)
+    n, m = n_linhas, n_colunas
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=int)
+    caminho = np.zeros(m + 1, dtype=int)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        usado = np.zeros(m + 1, dtype=bool)
+        while True:
+            usado[j0] = True
+            i0 = p[j0]
+            livres = ~usado[1:]
+            atual = custo[i0 - 1] - u[i0] - v[1:]
+            melhorou = livres & (atual < minv[1:])
+            minv[1:][melhorou] = atual[melhorou]
+            caminho[1:][melhorou] = j0
+            candidatos = np.where(livres, minv[1:], np.inf)
+            j1 = int(np.argmin(candidatos)) + 1
+            delta = candidatos[j1 - 1]
+            u[p[usado]] += delta
+            v[usado] -= delta
+            minv[~usado] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = caminho[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    resultado = np.full(n, -1, dtype=int)
+    for j in range(1, m + 1):
+        if p[j]:
+            resultado[p[j] - 1] = j - 1
+    linhas = np.arange(n)
+    atribuido = resultado >= 0
+    proibido = np.zeros(n, dtype=bool)
+    proibido[atribuido] = custo[linhas[atribuido], resultado[atribuido]] >= CUSTO_PROIBIDO
+    resultado[proibido] = -1
+    return resultado
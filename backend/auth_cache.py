@@ -0,0 +1,107 @@
+"""
+Cache do usuário autenticado
+
+Toda rota autenticada decodifica o JWT e busca o `Usuario` correspondente.
+Os dois passos ficam em cache no processo:
+
+- Tokens: o payload decodificado, pela chave sha256 do token. A expiração
+  (`exp`) continua sendo conferida a cada uso.
+- Usuários: uma cópia destacada (sem sessão) de cada usuário ativo, por id.
+  Em um acerto a cópia é incorporada à sessão da requisição com
+  `merge(load=False)`, sem consulta, e as rotas podem alterá-la normalmente.
+
+A entrada de um usuário é descartada quando uma sessão que o alterou (ex.:
+`update_user`, `update_me`, `delete_user` desativando-o) faz commit. Com
+vários workers cada processo tem o seu cache, e alterações feitas por outro
+processo aparecem em até `AUTH_CACHE_TTL` segundos.
+"""
+import copy
+import hashlib
+import os
+import time
+from itertools import chain
+from typing import Optional
+
+import jwt
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from cache import CacheTTL
+from metrics import registrar_cache
+from models import Usuario
+
+AUTH_CACHE_TTL = float(os.environ.get('AUTH_CACHE_TTL', 60))
+AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', 10000))
+
+_tokens = registrar_cache('tokens', CacheTTL(max_itens=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL))
+_usuarios = registrar_cache('usuarios_autenticados', CacheTTL(max_itens=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL))
+
+
+def decodificar_token(token: str, chave: str, algoritmo: str) -> dict:
+    """`jwt.decode` com cache; levanta as mesmas exceções do PyJWT."""
+    hash_token = hashlib.sha256(token.encode()).hexdigest()
+    payload = _tokens.obter(hash_token)
+    if payload is None:
+        payload = jwt.decode(token, chave, algorithms=[algoritmo])
+        _tokens.guardar(hash_token, payload)
+    elif payload.get('exp') is not None and payload['exp'] < time.time():
+        raise jwt.ExpiredSignatureError("Signature has expired")
+    return payload
+
+
+def _copia_destacada(usuario: Usuario) -> Usuario:
+    colunas = inspect(Usuario).column_attrs
+    copia = Usuario(**{coluna.key: copy.deepcopy(getattr(usuario, coluna.key)) for coluna in colunas})
+    make_transient_to_detached(copia)
+    return copia
+
+
+async def carregar_usuario_ativo(db: AsyncSession, id_usuario: str) -> Optional[Usuario]:
+    copia = _usuarios.obter(id_usuario)
+    if copia is not None:
+        return await db.merge(copia, load=False)
+    geracao = _usuarios.geracao
+    usuario = await db.scalar(select(Usuario).where(Usuario.id == id_usuario, Usuario.ativo == True))
+    if usuario is not None:
+        _usuarios.guardar(id_usuario, _copia_destacada(usuario), geracao)
+    return usuario
+
+
+def invalidar_usuario(id_usuario: str):
+    _usuarios.remover(id_usuario)
+
+
+def marcar_alterado(session, id_usuario: Optional[str]):
+    """Descarta o usuário do cache quando `session` fizer commit (None = todos)."""
+    session.info.setdefault('usuarios_alterados', set()).add(id_usuario)
+
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_usuarios_alterados(session, flush_context):
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Usuario):
+            marcar_alterado(session, obj.id)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _registrar_escrita_em_lote(estado):
+    if (estado.is_update or estado.is_delete) and estado.bind_mapper is not None and estado.bind_mapper.class_ is Usuario:
+        marcar_alterado(estado.session, None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_usuarios(session):
+    alterados = session.info.pop('usuarios_alterados', None)
+    if not alterados:
+        return
+    if None in alterados:
+        _usuarios.limpar()
+    else:
+        for id_usuario in alterados:
+            invalidar_usuario(id_usuario)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_usuarios_alterados(session):
+    session.info.pop('usuarios_alterados', None)
@@ -0,0 +1,206 @@
+"""
+Disponibilidade dos membros por data
+
+Responde "quais destes N usuários estão indisponíveis nestas M datas?" com uma
+única consulta: as datas entram como VALUES e são cruzadas com os intervalos
+de `periodos_indisponibilidade` pelo operador `@>` do daterange, que usa o
+índice GiST da tabela.
+
+A matriz de disponibilidade do editor de escalas é montada a partir desses
+conjuntos e do índice de ocupação, guardados em cache por (distrito, ano, mês)
+e pela versão desse mês em `versoes_disponibilidade`. A versão fica no banco,
+então vale para todos os processos (workers da API, scripts e jobs): cada
+escrita incrementa, na própria transação, só as versões que ela afeta. Uma
+escala ou um membro do distrito muda a versão do mês (ou de todos os meses)
+daquele distrito; um item de escala, uma atribuição ou um período de
+indisponibilidade muda a do distrito do usuário envolvido (ele pode estar
+escalado fora do próprio distrito). A leitura consulta a versão atual antes
+de usar o cache.
+"""
+import calendar
+from dataclasses import dataclass, field
+from datetime import date
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import Date, Integer, String, column, event, func, inspect, literal, literal_column, or_, select, tuple_, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from cache import CacheTTL
+from metrics import registrar_cache
+from models import Distrito, Usuario, Escala, ItemEscala, Atribuicao, PeriodoIndisponibilidade, VersaoDisponibilidade, linhas_escrita_em_lote
+from occupancy import IndiceOcupacao, carregar_ocupacao
+
+LIVRE, INDISPONIVEL, OCUPADO = 'L', 'I', 'O'
+LEGENDA = {LIVRE: 'livre', INDISPONIVEL: 'indisponivel', OCUPADO: 'ocupado'}
+
+
+def carregar_indisponiveis(db: Session, ids_usuarios: Iterable[str], datas: Iterable[str]) -> Set[Tuple[str, str]]:
+    """Pares (id_usuario, data) em que o usuário está indisponível."""
+    ids_usuarios = sorted(set(ids_usuarios))
+    datas = sorted(set(datas))
+    if not ids_usuarios or not datas:
+        return set()
+    tabela_datas = values(column('data', Date), name='datas').data([(date.fromisoformat(data),) for data in datas])
+    intervalo = func.daterange(PeriodoIndisponibilidade.data_inicio, PeriodoIndisponibilidade.data_fim, literal_column("'[]'"))
+    linhas = db.query(PeriodoIndisponibilidade.id_usuario, tabela_datas.c.data).join(tabela_datas, intervalo.op('@>')(tabela_datas.c.data)).filter(PeriodoIndisponibilidade.id_usuario.in_(ids_usuarios)).distinct().all()
+    return {(id_usuario, data.isoformat()) for id_usuario, data in linhas}
+
+
+def usuarios_livres(db: Session, ids_usuarios: Iterable[str], datas: Iterable[str]) -> Set[Tuple[str, str]]:
+    """Complemento de `carregar_indisponiveis`: pares (id_usuario, data) livres."""
+    ids_usuarios, datas = set(ids_usuarios), set(datas)
+    indisponiveis = carregar_indisponiveis(db, ids_usuarios, datas)
+    return {(id_usuario, data) for id_usuario in ids_usuarios for data in datas} - indisponiveis
+
+
+@dataclass
+class DisponibilidadeMes:
+    """Membros escaláveis do distrito com sua indisponibilidade e ocupação no mês."""
+    membros: List[Dict]
+    indisponiveis: Set[Tuple[str, str]] = field(default_factory=set)
+    ocupacao: IndiceOcupacao = field(default_factory=IndiceOcupacao)
+
+    def linha(self, id_usuario: str, datas: List[str], ignorar: Dict[str, Set[str]]) -> str:
+        """Um caractere por data; `ignorar` são os itens (por data) da própria escala."""
+        return ''.join(INDISPONIVEL if (id_usuario, data) in self.indisponiveis else OCUPADO if self.ocupacao.ocupado(id_usuario, data, ignorar.get(data, ())) else LIVRE for data in datas)
+
+
+_cache_mes = registrar_cache('disponibilidade_mes', CacheTTL(max_itens=256, ttl=600.0))
+
+
+def versao_do_mes(db: Session, id_distrito: str, ano: int, mes: int) -> int:
+    """Soma das versões do distrito inteiro e do mês: muda com qualquer escrita que afete o mês."""
+    return db.scalar(select(func.coalesce(func.sum(VersaoDisponibilidade.versao), 0)).where(VersaoDisponibilidade.id_distrito == id_distrito, tuple_(VersaoDisponibilidade.ano, VersaoDisponibilidade.mes).in_([(0, 0), (ano, mes)])))
+
+
+def disponibilidade_do_mes(db: Session, id_distrito: str, ano: int, mes: int) -> DisponibilidadeMes:
+    chave = (id_distrito, ano, mes, versao_do_mes(db, id_distrito, ano, mes))
+    disponibilidade = _cache_mes.obter(chave)
+    if disponibilidade is not None:
+        return disponibilidade
+    # As versões anteriores do mês não serão mais lidas
+    _cache_mes.remover_se(lambda outra, _: outra[:3] == chave[:3])
+    geracao = _cache_mes.geracao
+    membros = db.query(Usuario.id, Usuario.nome_completo, Usuario.eh_pregador, Usuario.eh_cantor).filter(Usuario.id_distrito == id_distrito, Usuario.ativo == True, or_(Usuario.eh_pregador == True, Usuario.eh_cantor == True)).order_by(Usuario.nome_completo, Usuario.id).all()
+    ids = [membro.id for membro in membros]
+    _, num_dias = calendar.monthrange(ano, mes)
+    datas = [f"{ano:04d}-{mes:02d}-{dia:02d}" for dia in range(1, num_dias + 1)]
+    disponibilidade = DisponibilidadeMes(
+        membros=[{"id": m.id, "nome_completo": m.nome_completo, "eh_pregador": bool(m.eh_pregador), "eh_cantor": bool(m.eh_cantor)} for m in membros],
+        indisponiveis=carregar_indisponiveis(db, ids, datas),
+        ocupacao=carregar_ocupacao(db, datas, ids),
+    )
+    _cache_mes.guardar(chave, disponibilidade, geracao)
+    return disponibilidade
+
+
+def _mes_da_data(data: Optional[str]) -> Optional[Tuple[int, int]]:
+    try:
+        return int(data[:4]), int(data[5:7])
+    except (TypeError, ValueError):
+        return None
+
+
+# Marcadores de alteração: ('distrito', id_distrito, mês) ou ('usuario', id_usuario, mês),
+# com mês = (ano, mes) ou None para todos os meses; None sozinho muda a versão de todos os distritos.
+Marcador = Optional[Tuple[str, str, Optional[Tuple[int, int]]]]
+
+
+def _valores(obj, atributo: str) -> list:
+    """Valor atual e valores anteriores (ainda não gravados) do atributo."""
+    historico = inspect(obj).attrs[atributo].history
+    return [valor for valor in chain([getattr(obj, atributo)], historico.deleted or ()) if valor is not None]
+
+
+def _usuarios_do_item(id_pregador: Optional[str], ids_cantores) -> List[str]:
+    return [id_usuario for id_usuario in chain([id_pregador], ids_cantores or ()) if id_usuario]
+
+
+def _marcadores(session: Session, obj) -> Set[Marcador]:
+    if isinstance(obj, Escala):
+        marcadores = {('distrito', id_distrito, (obj.ano, obj.mes)) for id_distrito in _valores(obj, 'id_distrito')}
+        if obj not in session.new and obj not in session.deleted and inspect(obj).attrs.status.history.has_changes():
+            # O status da escala decide se os itens ocupam os escalados, que podem ser de outro distrito
+            escalados = session.connection().execute(select(Atribuicao.id_usuario).join(ItemEscala, ItemEscala.id == Atribuicao.id_item_escala).where(ItemEscala.id_escala == obj.id).distinct()).scalars()
+            marcadores.update(('usuario', id_usuario, (obj.ano, obj.mes)) for id_usuario in escalados)
+        return marcadores
+    if isinstance(obj, ItemEscala):
+        meses = {_mes_da_data(data) for data in _valores(obj, 'data')}
+        usuarios = set(_valores(obj, 'id_pregador'))
+        for cantores in _valores(obj, 'ids_cantores'):
+            usuarios.update(cantores)
+        return {('usuario', id_usuario, mes) for id_usuario in usuarios for mes in meses}
+    if isinstance(obj, Atribuicao):
+        meses = {_mes_da_data(data) for data in _valores(obj, 'data')}
+        return {('usuario', id_usuario, mes) for id_usuario in _valores(obj, 'id_usuario') for mes in meses}
+    if isinstance(obj, Usuario):
+        return {('distrito', id_distrito, None) for id_distrito in _valores(obj, 'id_distrito')}
+    if isinstance(obj, PeriodoIndisponibilidade):
+        return {('usuario', id_usuario, None) for id_usuario in _valores(obj, 'id_usuario')}
+    return set()
+
+
+def _marcadores_em_lote(classe, estado) -> Set[Marcador]:
+    """Marcadores de um insert/update/delete em lote, pelas opções do comando ou pelas linhas inseridas."""
+    opcoes = estado.execution_options
+    if opcoes.get('id_distrito') is not None:
+        marcadores = {('distrito', opcoes['id_distrito'], None)}
+        marcadores.update(('usuario', id_usuario, None) for id_usuario in opcoes.get('ids_usuarios', ()))
+        return marcadores
+    linhas = linhas_escrita_em_lote(estado)
+    if linhas is None:
+        return {None}
+    try:
+        if classe is Escala:
+            return {('distrito', linha['id_distrito'], (linha['ano'], linha['mes'])) for linha in linhas}
+        if classe is ItemEscala:
+            return {('usuario', id_usuario, _mes_da_data(linha['data'])) for linha in linhas for id_usuario in _usuarios_do_item(linha.get('id_pregador'), linha.get('ids_cantores'))}
+        if classe is Atribuicao:
+            return {('usuario', linha['id_usuario'], _mes_da_data(linha['data'])) for linha in linhas}
+        if classe is Usuario:
+            return {('distrito', linha['id_distrito'], None) for linha in linhas if linha.get('id_distrito')}
+        if classe is PeriodoIndisponibilidade:
+            return {('usuario', linha['id_usuario'], None) for linha in linhas}
+    except KeyError:
+        pass
+    return {None}
+
+
+def _incrementar_versoes(conexao, marcadores: Set[Marcador]):
+    # Um único upsert; as linhas seguem uma ordem fixa para que transações
+    # concorrentes travem as versões sempre na mesma sequência
+    tabela = VersaoDisponibilidade.__table__
+    if None in marcadores:
+        alvos = select(Distrito.id, literal(0), literal(0), literal(1)).order_by(Distrito.id)
+    else:
+        linhas = sorted({(id_alterado if tipo == 'distrito' else None, id_alterado if tipo == 'usuario' else None, *(mes or (0, 0))) for tipo, id_alterado, mes in marcadores}, key=str)
+        alterados = values(column('id_distrito', String), column('id_usuario', String), column('ano', Integer), column('mes', Integer), name='alterados').data(linhas)
+        id_distrito = func.coalesce(alterados.c.id_distrito, Usuario.id_distrito).label('id_distrito')
+        alvos = (
+            select(id_distrito, alterados.c.ano, alterados.c.mes, literal(1))
+            .select_from(alterados.outerjoin(Usuario, Usuario.id == alterados.c.id_usuario))
+            .where(id_distrito.isnot(None)).distinct()
+            .order_by(id_distrito, alterados.c.ano, alterados.c.mes)
+        )
+    comando = insert(tabela).from_select(['id_distrito', 'ano', 'mes', 'versao'], alvos)
+    conexao.execute(comando.on_conflict_do_update(index_elements=['id_distrito', 'ano', 'mes'], set_={'versao': tabela.c.versao + 1}))
+
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_alteracoes(session, flush_context):
+    marcadores = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        marcadores.update(_marcadores(session, obj))
+    if marcadores:
+        _incrementar_versoes(session.connection(), marcadores)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _registrar_escrita_em_lote(estado):
+    # insert/update/delete em lote não passam pelo flush (ex.: gravar_plano); o chamador
+    # pode informar o alcance com execution_options(id_distrito=..., ids_usuarios=...)
+    if (estado.is_insert or estado.is_update or estado.is_delete) and estado.bind_mapper is not None and estado.bind_mapper.class_ in (Usuario, Escala, ItemEscala, Atribuicao, PeriodoIndisponibilidade):
+        marcadores = _marcadores_em_lote(estado.bind_mapper.class_, estado)
+        if marcadores:
+            _incrementar_versoes(estado.session.connection(), marcadores)
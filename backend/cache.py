@@ -0,0 +1,74 @@
+"""
+Cache em memória com expiração (TTL) e descarte LRU
+
+Usado para resultados caros de montar que podem ser reaproveitados entre
+requisições do mesmo processo. A invalidação incrementa `geracao`, e quem
+montou um valor a partir de dados lidos antes da invalidação não consegue
+gravá-lo (ver `guardar`).
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class CacheTTL:
+    """Mapa chave -> valor limitado a `max_itens`, com validade de `ttl` segundos."""
+
+    def __init__(self, max_itens: int = 256, ttl: float = 300.0):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self.geracao = 0
+        self.acertos = 0
+        self.falhas = 0
+        self._itens: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave: Hashable, padrao: Any = None) -> Any:
+        with self._lock:
+            entrada = self._itens.get(chave)
+            if entrada is None:
+                self.falhas += 1
+                return padrao
+            expira_em, valor = entrada
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                self.falhas += 1
+                return padrao
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def guardar(self, chave: Hashable, valor: Any, geracao: Optional[int] = None):
+        """Grava o valor; com `geracao`, descarta-o se houve invalidação desde então."""
+        with self._lock:
+            if geracao is not None and geracao != self.geracao:
+                return
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def remover(self, chave: Hashable):
+        with self._lock:
+            self.geracao += 1
+            self._itens.pop(chave, None)
+
+    def remover_se(self, predicado: Callable[[Hashable, Any], bool]):
+        """Remove as entradas em que `predicado(chave, valor)` é verdadeiro."""
+        with self._lock:
+            self.geracao += 1
+            for chave in [chave for chave, (_, valor) in self._itens.items() if predicado(chave, valor)]:
+                del self._itens[chave]
+
+    def limpar(self):
+        with self._lock:
+            self.geracao += 1
+            self._itens.clear()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {"itens": len(self._itens), "acertos": self.acertos, "falhas": self.falhas}
+
+    def __len__(self):
+        return len(self._itens)
@@ -0,0 +1,82 @@
+"""
+Exportação em streaming (NDJSON e CSV)
+
+As linhas são lidas com cursor no servidor (`yield_per`) e escritas lote a
+lote, então o consumo de memória não depende do tamanho da exportação.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Callable, Iterator, List
+from sqlalchemy import Select, select
+
+from database import SessionLocal
+from models import Escala, ItemEscala, Avaliacao, Igreja
+
+TAMANHO_LOTE = 1000
+
+FORMATOS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def consulta_itens_escala(id_distrito: str = None, ano: int = None, mes: int = None) -> Select:
+    consulta = select(ItemEscala.id, ItemEscala.id_escala, Escala.id_igreja, Escala.id_distrito, Escala.ano, Escala.mes, Escala.status.label('status_escala'), ItemEscala.data, ItemEscala.horario, ItemEscala.id_pregador, ItemEscala.ids_cantores, ItemEscala.status, ItemEscala.motivo_recusa, ItemEscala.confirmado_em, ItemEscala.cancelado_em, ItemEscala.criado_em).join(Escala, Escala.id == ItemEscala.id_escala)
+    if id_distrito:
+        consulta = consulta.where(Escala.id_distrito == id_distrito)
+    if ano:
+        consulta = consulta.where(Escala.ano == ano)
+    if mes:
+        consulta = consulta.where(Escala.mes == mes)
+    return consulta.order_by(ItemEscala.data, ItemEscala.id)
+
+
+def consulta_avaliacoes(id_distrito: str = None, data_inicio: str = None, data_fim: str = None) -> Select:
+    consulta = select(Avaliacao.id, Avaliacao.id_item_escala, Avaliacao.id_igreja, Igreja.id_distrito, Avaliacao.tipo_membro, Avaliacao.id_usuario_avaliado, Avaliacao.nota, Avaliacao.comentario, Avaliacao.criado_em).join(Igreja, Igreja.id == Avaliacao.id_igreja)
+    if id_distrito:
+        consulta = consulta.where(Igreja.id_distrito == id_distrito)
+    if data_inicio:
+        consulta = consulta.where(Avaliacao.criado_em >= date.fromisoformat(data_inicio))
+    if data_fim:
+        consulta = consulta.where(Avaliacao.criado_em < date.fromisoformat(data_fim))
+    return consulta.order_by(Avaliacao.criado_em, Avaliacao.id)
+
+
+def _valor_json(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return valor
+
+
+def _valor_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, (list, dict)):
+        return json.dumps(valor)
+    return _valor_json(valor)
+
+
+def exportar(consulta: Select, formato: str, session_factory: Callable = SessionLocal, tamanho_lote: int = TAMANHO_LOTE) -> Iterator[str]:
+    """Gera o conteúdo da exportação em blocos, um por lote lido do banco.
+
+    Abre a própria sessão porque o corpo é enviado depois que a dependência
+    `get_db` da requisição já foi encerrada.
+    """
+    db = session_factory()
+    try:
+        resultado = db.execute(consulta.execution_options(yield_per=tamanho_lote))
+        colunas: List[str] = list(resultado.keys())
+        if formato == 'csv':
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer)
+            escritor.writerow(colunas)
+            for lote in resultado.partitions():
+                escritor.writerows([_valor_csv(valor) for valor in linha] for linha in lote)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            for lote in resultado.partitions():
+                yield ''.join(json.dumps({coluna: _valor_json(valor) for coluna, valor in zip(colunas, linha)}, ensure_ascii=False) + '\n' for linha in lote)
+    finally:
+        db.close()
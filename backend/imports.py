@@ -0,0 +1,219 @@
+"""
+Importação de membros em lote (CSV e XLSX)
+
+O arquivo é lido em streaming, linha a linha, e validado com o Pydantic em
+lotes de `TAMANHO_LOTE` linhas. Depois da leitura:
+
+- os nomes de usuário são conferidos contra o banco em uma única consulta
+  (e entre si, dentro do arquivo);
+- as senhas são transformadas em hash em paralelo (`passwords.hash_senhas`);
+  as linhas sem a coluna `senha` recebem a senha padrão informada, com um
+  único hash compartilhado;
+- os membros são gravados com um INSERT em lote (executemany) e um commit.
+
+A importação é tudo ou nada: havendo qualquer erro, nada é gravado e o
+resultado lista os erros com o número da linha. Com `simulacao=True` o
+arquivo é apenas validado (sem hash nem gravação).
+
+Colunas (cabeçalho na primeira linha, em qualquer ordem): `nome_usuario`,
+`nome_completo`, `funcao`, e opcionalmente `email`, `telefone`, `igreja`
+(nome ou id de uma igreja do distrito), `eh_pregador`, `eh_cantor` e `senha`.
+XLSX exige o pacote `openpyxl`.
+"""
+import codecs
+import csv
+from itertools import islice
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, EmailStr, TypeAdapter, ValidationError, field_validator
+from sqlalchemy import String, any_, bindparam, insert, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from models import Igreja, Usuario
+from passwords import hash_senha, hash_senhas
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+TAMANHO_LOTE = 1000
+MAX_ERROS = 200  # erros listados no resultado; o total vem em `total_erros`
+
+FORMATOS = ('csv', 'xlsx')
+FUNCOES_IMPORTAVEIS = ('lider_igreja', 'pregador', 'cantor', 'membro')
+VERDADEIRO = {'1', 'true', 'sim', 's', 'yes', 'y', 'x'}
+FALSO = {'', '0', 'false', 'nao', 'não', 'n', 'no'}
+
+
+class LinhaImportacao(BaseModel):
+    nome_usuario: str
+    nome_completo: str
+    funcao: str
+    email: Optional[EmailStr] = None
+    telefone: Optional[str] = None
+    igreja: Optional[str] = None
+    eh_pregador: bool = False
+    eh_cantor: bool = False
+    senha: Optional[str] = None
+
+    @field_validator('*', mode='before')
+    @classmethod
+    def vazio_como_ausente(cls, valor):
+        if isinstance(valor, str):
+            valor = valor.strip()
+            return valor or None
+        return valor
+
+    @field_validator('eh_pregador', 'eh_cantor', mode='before')
+    @classmethod
+    def booleano(cls, valor):
+        if valor is None:
+            return False
+        if isinstance(valor, str):
+            if valor.lower() in VERDADEIRO:
+                return True
+            if valor.lower() in FALSO:
+                return False
+        return valor
+
+    @field_validator('funcao')
+    @classmethod
+    def funcao_valida(cls, valor: str) -> str:
+        if valor not in FUNCOES_IMPORTAVEIS:
+            raise ValueError(f"must be one of {', '.join(FUNCOES_IMPORTAVEIS)}")
+        return valor
+
+
+LOTE_LINHAS = TypeAdapter(List[LinhaImportacao])
+
+
+class ErroImportacao(Exception):
+    """Arquivo que não pode ser lido (formato, cabeçalho)."""
+
+
+def formato_do_arquivo(nome_arquivo: str) -> Optional[str]:
+    extensao = nome_arquivo.rsplit('.', 1)[-1].lower() if '.' in nome_arquivo else ''
+    return extensao if extensao in FORMATOS else None
+
+
+def _normalizar_cabecalho(cabecalho) -> List[str]:
+    colunas = [str(coluna or '').strip().lower() for coluna in cabecalho]
+    faltando = [coluna for coluna in ('nome_usuario', 'nome_completo', 'funcao') if coluna not in colunas]
+    if faltando:
+        raise ErroImportacao(f"Missing columns: {', '.join(faltando)}")
+    return colunas
+
+
+def _valor_planilha(valor):
+    # Números do Excel (telefone, nome de usuário numérico) viram texto; 12.0 -> '12'
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return str(valor)
+    return valor
+
+
+def ler_linhas(arquivo: IO[bytes], formato: str) -> Iterator[Tuple[int, Dict]]:
+    """(número da linha no arquivo, valores por coluna), sem carregar o arquivo inteiro."""
+    if formato == 'csv':
+        leitor = csv.reader(codecs.iterdecode(arquivo, 'utf-8-sig'))
+    elif formato == 'xlsx':
+        if openpyxl is None:
+            raise ErroImportacao("XLSX import requires the openpyxl package")
+        planilha = openpyxl.load_workbook(arquivo, read_only=True, data_only=True).active
+        leitor = ([_valor_planilha(valor) for valor in linha] for linha in planilha.iter_rows(values_only=True))
+    else:
+        raise ErroImportacao(f"Unsupported format: {formato}")
+    try:
+        colunas = _normalizar_cabecalho(next(leitor))
+        for numero, valores in enumerate(leitor, start=2):
+            if not any(valor not in (None, '') for valor in valores):
+                continue
+            yield numero, {coluna: valor for coluna, valor in zip(colunas, valores) if coluna}
+    except StopIteration:
+        raise ErroImportacao("Empty file")
+    except UnicodeDecodeError:
+        raise ErroImportacao("CSV files must be UTF-8 encoded")
+    except csv.Error as exc:
+        raise ErroImportacao(f"Invalid CSV: {exc}")
+
+
+def _mensagem(erro: dict) -> str:
+    campo = '.'.join(str(parte) for parte in erro['loc'][1:])
+    return f"{campo}: {erro['msg']}" if campo else erro['msg']
+
+
+def validar_lote(lote: List[Tuple[int, Dict]]) -> Tuple[List[Tuple[int, LinhaImportacao]], List[Dict]]:
+    """Valida o lote de uma vez; só quando há erros separa as linhas válidas das inválidas."""
+    try:
+        return list(zip((numero for numero, _ in lote), LOTE_LINHAS.validate_python([valores for _, valores in lote]))), []
+    except ValidationError as exc:
+        erros_por_indice: Dict[int, List[str]] = {}
+        for erro in exc.errors():
+            erros_por_indice.setdefault(erro['loc'][0], []).append(_mensagem(erro))
+    validas = [(indice, lote[indice]) for indice in range(len(lote)) if indice not in erros_por_indice]
+    linhas = LOTE_LINHAS.validate_python([valores for _, (_, valores) in validas])
+    erros = [{"linha": lote[indice][0], "erro": '; '.join(mensagens)} for indice, mensagens in sorted(erros_por_indice.items())]
+    return [(numero, linha) for (_, (numero, _)), linha in zip(validas, linhas)], erros
+
+
+def importar_usuarios(db: Session, arquivo: IO[bytes], formato: str, id_distrito: str, senha_padrao: Optional[str] = None, simulacao: bool = False, tamanho_lote: int = TAMANHO_LOTE) -> Dict:
+    """Valida e grava os membros do arquivo no distrito; devolve o resumo da importação."""
+    igrejas = db.execute(select(Igreja.id, Igreja.nome).where(Igreja.id_distrito == id_distrito, Igreja.ativo == True)).all()
+    ids_igrejas = {id_igreja for id_igreja, _ in igrejas}
+    igrejas_por_nome = {nome.strip().lower(): id_igreja for id_igreja, nome in igrejas}
+
+    total, erros, validas = 0, [], []
+    linhas = ler_linhas(arquivo, formato)
+    while lote := list(islice(linhas, tamanho_lote)):
+        total += len(lote)
+        linhas_validas, erros_lote = validar_lote(lote)
+        erros.extend(erros_lote)
+        validas.extend(linhas_validas)
+
+    # Regras que dependem do distrito e do arquivo inteiro
+    membros, vistos = [], {}
+    for numero, linha in validas:
+        problemas = []
+        if linha.nome_usuario in vistos:
+            problemas.append(f"nome_usuario: duplicated in line {vistos[linha.nome_usuario]}")
+        vistos.setdefault(linha.nome_usuario, numero)
+        id_igreja = None
+        if linha.igreja is not None:
+            id_igreja = linha.igreja if linha.igreja in ids_igrejas else igrejas_por_nome.get(linha.igreja.lower())
+            if id_igreja is None:
+                problemas.append(f"igreja: church '{linha.igreja}' not found in the district")
+        if linha.senha is None and not senha_padrao:
+            problemas.append("senha: required when no default password is given")
+        if problemas:
+            erros.append({"linha": numero, "erro": '; '.join(problemas)})
+        else:
+            membros.append((numero, linha, id_igreja))
+
+    nomes = [linha.nome_usuario for _, linha, _ in membros]
+    if nomes:
+        existentes = set(db.scalars(select(Usuario.nome_usuario).where(Usuario.nome_usuario == any_(bindparam('nomes', nomes, type_=ARRAY(String))))))
+        erros.extend({"linha": numero, "erro": "nome_usuario: username already exists"} for numero, linha, _ in membros if linha.nome_usuario in existentes)
+
+    erros.sort(key=lambda erro: erro['linha'])
+    resultado = {"total": total, "validos": total - len({erro['linha'] for erro in erros}), "importados": 0, "simulacao": simulacao, "total_erros": len(erros), "erros": erros[:MAX_ERROS]}
+    if erros or simulacao or not membros:
+        return resultado
+
+    proprias = [linha.senha for _, linha, _ in membros if linha.senha is not None]
+    hashes = iter(hash_senhas(proprias))
+    hash_padrao = hash_senha(senha_padrao) if len(proprias) < len(membros) else None
+    registros = [{
+        "nome_usuario": linha.nome_usuario, "nome_completo": linha.nome_completo, "email": linha.email, "telefone": linha.telefone,
+        "funcao": linha.funcao, "id_distrito": id_distrito, "id_igreja": id_igreja, "eh_pregador": linha.eh_pregador, "eh_cantor": linha.eh_cantor,
+        "senha_hash": next(hashes) if linha.senha is not None else hash_padrao,
+    } for _, linha, id_igreja in membros]
+    # render_nulls: sem ele, linhas com e sem email/telefone viram INSERTs separados
+    comando = insert(Usuario).execution_options(render_nulls=True)
+    for inicio in range(0, len(registros), tamanho_lote):
+        db.execute(comando, registros[inicio:inicio + tamanho_lote])
+    db.commit()
+    resultado["importados"] = len(registros)
+    return resultado
@@ -0,0 +1,207 @@
+"""
+Geração de escalas em lote (vários meses e distritos)
+
+O trabalho é particionado por distrito: os problemas de cada distrito são
+carregados no processo principal, resolvidos em um pool de processos (sem
+acesso ao banco) e gravados em uma transação por distrito.
+
+Na API, todos os jobs dividem um único pool de `GENERATION_WORKERS`
+processos, então jobs simultâneos esperam na fila em vez de multiplicar
+processos.
+
+Os jobs ficam em memória no processo da API para a consulta de progresso;
+os finalizados são descartados após `GENERATION_JOB_TTL` segundos, e no
+máximo `GENERATION_JOB_MAX` jobs são mantidos (os finalizados mais antigos
+saem primeiro).
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from database import SessionLocal
+from models import gerar_uuid
+from planner import ItemPlanejado, ProblemaEscala, carregar_problema, gravar_plano, resolver
+
+logger = logging.getLogger(__name__)
+
+GENERATION_JOB_TTL = int(os.environ.get('GENERATION_JOB_TTL', 3600))
+GENERATION_JOB_MAX = int(os.environ.get('GENERATION_JOB_MAX', 200))
+GENERATION_WORKERS = int(os.environ.get('GENERATION_WORKERS', min(4, os.cpu_count() or 1)))
+
+
+@dataclass
+class JobGeracao:
+    ids_distritos: List[str]
+    meses: List[Tuple[int, int]]  # (ano, mes)
+    modo: str = 'round_robin'
+    id_gerado_por: Optional[str] = None
+    id: str = field(default_factory=gerar_uuid)
+    status: str = 'pendente'  # pendente, executando, concluido, concluido_com_erros, falhou
+    concluidos: List[str] = field(default_factory=list)
+    escalas: Dict[str, List[str]] = field(default_factory=dict)
+    erros: Dict[str, str] = field(default_factory=dict)
+    criado_em: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    finalizado_em: Optional[datetime] = None
+
+    def para_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "modo": self.modo,
+            "meses": [f"{ano:04d}-{mes:02d}" for ano, mes in self.meses],
+            "total_distritos": len(self.ids_distritos),
+            "distritos_concluidos": len(self.concluidos),
+            "total_escalas": sum(len(ids) for ids in self.escalas.values()),
+            "escalas": self.escalas,
+            "erros": self.erros,
+            "criado_em": self.criado_em,
+            "finalizado_em": self.finalizado_em,
+        }
+
+
+_jobs: Dict[str, JobGeracao] = {}
+_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def criar_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def pool_compartilhado() -> ProcessPoolExecutor:
+    """Pool de processos dos jobs da API, criado no primeiro uso."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = criar_pool(GENERATION_WORKERS)
+        return _pool
+
+
+def _descartar_pool(pool: ProcessPoolExecutor):
+    # Um processo filho morreu: o pool não aceita mais tarefas, o próximo job cria outro
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+
+def encerrar_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def meses_no_intervalo(mes_inicio: int, ano_inicio: int, mes_fim: int, ano_fim: int) -> List[Tuple[int, int]]:
+    """Lista (ano, mes) do intervalo, inclusive nas duas pontas."""
+    if not (1 <= mes_inicio <= 12 and 1 <= mes_fim <= 12):
+        raise ValueError("Month must be between 1 and 12")
+    inicio, fim = ano_inicio * 12 + mes_inicio - 1, ano_fim * 12 + mes_fim - 1
+    if fim < inicio:
+        raise ValueError("End month is before start month")
+    return [(indice // 12, indice % 12 + 1) for indice in range(inicio, fim + 1)]
+
+
+def _descartar_antigos():
+    # Chamado com _lock; jobs em andamento nunca são descartados
+    agora = datetime.now(timezone.utc)
+    finalizados = [job for job in _jobs.values() if job.finalizado_em is not None]
+    excedente = len(_jobs) - GENERATION_JOB_MAX
+    for job in sorted(finalizados, key=lambda job: job.finalizado_em):
+        if excedente > 0 or (agora - job.finalizado_em).total_seconds() > GENERATION_JOB_TTL:
+            del _jobs[job.id]
+            excedente -= 1
+
+
+def registrar_job(job: JobGeracao) -> JobGeracao:
+    with _lock:
+        _jobs[job.id] = job
+        _descartar_antigos()
+    return job
+
+
+def obter_job(id_job: str) -> Optional[JobGeracao]:
+    with _lock:
+        _descartar_antigos()
+        return _jobs.get(id_job)
+
+
+def _resolver_particao(problemas: List[ProblemaEscala], modo: str) -> List[List[ItemPlanejado]]:
+    # Executado no processo filho: apenas dados em memória, nenhum acesso ao banco
+    return [resolver(problema, modo) for problema in problemas]
+
+
+def executar_job(job: JobGeracao, session_factory: Callable = SessionLocal, pool: Optional[ProcessPoolExecutor] = None, ao_progredir: Optional[Callable[[JobGeracao], None]] = None):
+    """Executa o job até o fim; cada distrito é gravado (ou revertido) isoladamente.
+
+    Sem `pool`, usa o pool compartilhado do processo.
+    """
+    job.status = 'executando'
+    pool = pool or pool_compartilhado()
+    futuros = {}
+    for id_distrito in job.ids_distritos:
+        db = session_factory()
+        try:
+            problemas = [carregar_problema(db, id_distrito, mes, ano) for ano, mes in job.meses]
+        except Exception as exc:
+            logger.exception("Falha ao carregar distrito %s", id_distrito)
+            job.erros[id_distrito] = str(exc)
+            continue
+        finally:
+            db.close()
+        try:
+            futuros[pool.submit(_resolver_particao, problemas, job.modo)] = (id_distrito, problemas)
+        except BrokenProcessPool as exc:
+            _descartar_pool(pool)
+            job.erros[id_distrito] = str(exc)
+
+    for futuro in as_completed(futuros):
+        id_distrito, problemas = futuros[futuro]
+        db = session_factory()
+        try:
+            planos = futuro.result()
+            escalas = []
+            for problema, itens in zip(problemas, planos):
+                escalas.extend(gravar_plano(db, problema, itens, job.id_gerado_por))
+            db.commit()
+            job.escalas[id_distrito] = escalas
+            job.concluidos.append(id_distrito)
+        except Exception as exc:
+            db.rollback()
+            if isinstance(exc, BrokenProcessPool):
+                _descartar_pool(pool)
+            logger.exception("Falha ao gerar escalas do distrito %s", id_distrito)
+            job.erros[id_distrito] = str(exc)
+        finally:
+            db.close()
+        if ao_progredir:
+            ao_progredir(job)
+
+    job.status = 'concluido_com_erros' if job.erros else 'concluido'
+    job.finalizado_em = datetime.now(timezone.utc)
+    return job
+
+
+def _executar_em_fundo(job: JobGeracao):
+    try:
+        executar_job(job)
+    except Exception as exc:
+        logger.exception("Job de geração %s falhou", job.id)
+        job.status = 'falhou'
+        job.erros['job'] = str(exc)
+        job.finalizado_em = datetime.now(timezone.utc)
+
+
+def iniciar_job(job: JobGeracao) -> JobGeracao:
+    """Registra o job e o executa em uma thread de fundo, liberando a requisição."""
+    registrar_job(job)
+    threading.Thread(target=_executar_em_fundo, args=(job,), name=f"job-geracao-{job.id}", daemon=True).start()
+    return job
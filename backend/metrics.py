@@ -0,0 +1,294 @@
+"""
+Métricas do pool de conexões e das consultas por requisição
+
+- Espera no checkout: tempo que uma sessão aguardou por uma conexão livre
+  do pool (medido em `_do_get` das classes de pool instrumentadas).
+- Conexões: checkouts, checkins, conexões abertas e invalidadas, pelos
+  eventos de pool do SQLAlchemy.
+- Caches em memória registrados: itens, acertos e falhas.
+- Consultas por requisição: o middleware (profiling.py) abre um contador em
+  um ContextVar; `before_cursor_execute` o incrementa e `after_cursor_execute`
+  soma o tempo gasto no banco.
+- Por rota (método + caminho da rota): requisições por status, duração,
+  consultas, tempo no banco, tempo fora do banco e bytes da resposta.
+
+`snapshot()` alimenta `GET /api/metrics/db`; `exposicao_prometheus()` gera
+o mesmo conteúdo no formato texto do Prometheus para `GET /metrics`.
+"""
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+
+class Amostras:
+    """Total acumulado e janela das últimas amostras para percentis."""
+
+    def __init__(self, janela: int = 2000):
+        self.total = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+        self._recentes = deque(maxlen=janela)
+        self._lock = threading.Lock()
+
+    def registrar(self, valor: float):
+        with self._lock:
+            self.total += 1
+            self.soma += valor
+            self.maximo = max(self.maximo, valor)
+            self._recentes.append(valor)
+
+    def resumo(self) -> Dict[str, float]:
+        with self._lock:
+            recentes = sorted(self._recentes)
+            total, soma, maximo = self.total, self.soma, self.maximo
+        def percentil(p):
+            return recentes[min(len(recentes) - 1, int(p * len(recentes)))] if recentes else 0.0
+        return {
+            "total": total,
+            "media": round(soma / total, 3) if total else 0.0,
+            "p50": round(percentil(0.50), 3),
+            "p95": round(percentil(0.95), 3),
+            "p99": round(percentil(0.99), 3),
+            "maximo": round(maximo, 3),
+        }
+
+
+class MetricasEngine:
+    def __init__(self):
+        self.espera_checkout_ms = Amostras()
+        self.contadores: Dict[str, int] = {"conexoes_abertas": 0, "checkouts": 0, "checkins": 0, "invalidadas": 0, "consultas": 0}
+        self._lock = threading.Lock()
+
+    def incrementar(self, nome: str, quantidade: int = 1):
+        with self._lock:
+            self.contadores[nome] += quantidade
+
+
+_engines: Dict[str, tuple] = {}  # nome -> (engine, MetricasEngine)
+_caches: Dict[str, object] = {}  # nome -> CacheTTL
+consultas_por_requisicao = Amostras()
+duracao_requisicao_ms = Amostras()
+
+
+class ContadorConsultas:
+    __slots__ = ('consultas', 'tempo_banco_ms')
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_banco_ms = 0.0
+
+
+class MetricasRota:
+    def __init__(self):
+        self.duracao_ms = Amostras()
+        self.por_status: Dict[int, int] = {}
+        self.consultas = 0
+        self.tempo_banco_ms = 0.0
+        self.tempo_python_ms = 0.0
+        self.bytes_resposta = 0
+        self.orcamento_excedido = 0
+        self._lock = threading.Lock()
+
+    def registrar(self, status: int, duracao_ms: float, consultas: int, tempo_banco_ms: float, bytes_resposta: int, orcamento_excedido: bool = False):
+        self.duracao_ms.registrar(duracao_ms)
+        with self._lock:
+            self.orcamento_excedido += orcamento_excedido
+            self.por_status[status] = self.por_status.get(status, 0) + 1
+            self.consultas += consultas
+            self.tempo_banco_ms += tempo_banco_ms
+            self.tempo_python_ms += max(0.0, duracao_ms - tempo_banco_ms)
+            self.bytes_resposta += bytes_resposta
+
+    def resumo(self) -> Dict:
+        with self._lock:
+            requisicoes = sum(self.por_status.values())
+            return {
+                "requisicoes": requisicoes,
+                "por_status": {str(status): total for status, total in self.por_status.items()},
+                "duracao_ms": self.duracao_ms.resumo(),
+                "consultas_por_requisicao": round(self.consultas / requisicoes, 2) if requisicoes else 0.0,
+                "tempo_banco_ms": round(self.tempo_banco_ms, 1),
+                "tempo_python_ms": round(self.tempo_python_ms, 1),
+                "bytes_resposta": self.bytes_resposta,
+                "orcamento_excedido": self.orcamento_excedido,
+            }
+
+
+_rotas: Dict[tuple, MetricasRota] = {}  # (método, rota) -> MetricasRota
+_lock_rotas = threading.Lock()
+
+
+def metricas_rota(metodo: str, rota: str) -> MetricasRota:
+    chave = (metodo, rota)
+    metricas = _rotas.get(chave)
+    if metricas is None:
+        with _lock_rotas:
+            metricas = _rotas.setdefault(chave, MetricasRota())
+    return metricas
+
+
+# Objeto mutável: o incremento feito dentro do greenlet do AsyncSession ou de
+# uma thread do threadpool é visto pela requisição que abriu o contador
+_contador_atual: ContextVar[Optional[ContadorConsultas]] = ContextVar('contador_consultas', default=None)
+
+
+class _MedirEspera:
+    nome_metricas = None
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.nome_metricas in _engines:
+                _engines[self.nome_metricas][1].espera_checkout_ms.registrar((time.perf_counter() - inicio) * 1000)
+
+
+def classe_pool(nome: str, base=QueuePool):
+    """Subclasse de `base` que mede a espera no checkout e a reporta em `nome`."""
+    return type(f"{base.__name__}Medido", (_MedirEspera, base), {'nome_metricas': nome})
+
+
+def instrumentar_engine(engine, nome: str):
+    """Liga os eventos de pool e de cursor da engine (síncrona) às métricas `nome`."""
+    metricas = MetricasEngine()
+    _engines[nome] = (engine, metricas)
+
+    @event.listens_for(engine, 'connect')
+    def _ao_conectar(dbapi_connection, connection_record):
+        metricas.incrementar('conexoes_abertas')
+
+    @event.listens_for(engine, 'close')
+    def _ao_fechar(dbapi_connection, connection_record):
+        metricas.incrementar('conexoes_abertas', -1)
+
+    @event.listens_for(engine, 'checkout')
+    def _ao_retirar(dbapi_connection, connection_record, connection_proxy):
+        metricas.incrementar('checkouts')
+
+    @event.listens_for(engine, 'checkin')
+    def _ao_devolver(dbapi_connection, connection_record):
+        metricas.incrementar('checkins')
+
+    @event.listens_for(engine, 'invalidate')
+    def _ao_invalidar(dbapi_connection, connection_record, exception):
+        metricas.incrementar('invalidadas')
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _ao_executar(conn, cursor, statement, parameters, context, executemany):
+        metricas.incrementar('consultas')
+        contador = _contador_atual.get()
+        if contador is not None:
+            contador.consultas += 1
+        conn.info.setdefault('inicio_consultas', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _ao_terminar(conn, cursor, statement, parameters, context, executemany):
+        inicio = conn.info['inicio_consultas'].pop()
+        contador = _contador_atual.get()
+        if contador is not None:
+            contador.tempo_banco_ms += (time.perf_counter() - inicio) * 1000
+
+    @event.listens_for(engine, 'handle_error')
+    def _ao_falhar(contexto):
+        inicios = contexto.connection.info.get('inicio_consultas') if contexto.connection is not None else None
+        if inicios:
+            inicios.pop()
+
+    return engine
+
+
+def registrar_cache(nome: str, cache):
+    _caches[nome] = cache
+    return cache
+
+
+def iniciar_contagem() -> tuple:
+    contador = ContadorConsultas()
+    return contador, _contador_atual.set(contador)
+
+
+def encerrar_contagem(contador: ContadorConsultas, token, duracao_ms: float):
+    _contador_atual.reset(token)
+    consultas_por_requisicao.registrar(contador.consultas)
+    duracao_requisicao_ms.registrar(duracao_ms)
+
+
+def estado_pool(engine, metricas: MetricasEngine) -> Dict[str, int]:
+    estado = {"em_uso": metricas.contadores["checkouts"] - metricas.contadores["checkins"]}
+    pool = engine.pool
+    if isinstance(pool, QueuePool):  # NullPool (pgbouncer) não guarda conexões
+        estado.update({"tamanho": pool.size(), "ociosas": pool.checkedin(), "overflow": max(0, pool.overflow())})
+    return estado
+
+
+def snapshot() -> Dict:
+    return {
+        "engines": {nome: {"pool": estado_pool(engine, metricas), "espera_checkout_ms": metricas.espera_checkout_ms.resumo(), **metricas.contadores} for nome, (engine, metricas) in _engines.items()},
+        "consultas_por_requisicao": consultas_por_requisicao.resumo(),
+        "duracao_requisicao_ms": duracao_requisicao_ms.resumo(),
+        "caches": {nome: cache.estatisticas() for nome, cache in _caches.items()},
+        "rotas": {f"{metodo} {rota}": metricas.resumo() for (metodo, rota), metricas in sorted(_rotas.items())},
+    }
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(**rotulos) -> str:
+    return "{" + ",".join(f'{nome}="{_escapar(valor)}"' for nome, valor in rotulos.items()) + "}"
+
+
+def exposicao_prometheus(prefixo: str = "escalas") -> str:
+    """Métricas no formato texto do Prometheus (versão 0.0.4)."""
+    linhas = []
+    def metrica(nome, tipo, ajuda, amostras):
+        linhas.append(f"# HELP {prefixo}_{nome} {ajuda}")
+        linhas.append(f"# TYPE {prefixo}_{nome} {tipo}")
+        for sufixo, rotulos, valor in amostras:
+            linhas.append(f"{prefixo}_{nome}{sufixo}{_rotulos(**rotulos)} {valor}")
+
+    rotas = sorted(_rotas.items())
+    metrica("http_requests_total", "counter", "Requisições por rota e status.", [
+        ("", {"method": metodo, "route": rota, "status": status}, total)
+        for (metodo, rota), metricas in rotas for status, total in sorted(metricas.por_status.items())
+    ])
+    duracoes = []
+    for (metodo, rota), metricas in rotas:
+        resumo = metricas.duracao_ms.resumo()
+        for quantil, chave in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99")):
+            duracoes.append(("", {"method": metodo, "route": rota, "quantile": quantil}, resumo[chave] / 1000))
+        duracoes.append(("_sum", {"method": metodo, "route": rota}, round(metricas.duracao_ms.soma / 1000, 6)))
+        duracoes.append(("_count", {"method": metodo, "route": rota}, metricas.duracao_ms.total))
+    metrica("http_request_duration_seconds", "summary", "Duração das requisições (quantis das últimas amostras).", duracoes)
+    for nome, atributo, escala, ajuda in (
+        ("db_statements_total", "consultas", 1, "Comandos SQL executados pela rota."),
+        ("db_time_seconds_total", "tempo_banco_ms", 1000, "Tempo gasto em comandos SQL pela rota."),
+        ("python_time_seconds_total", "tempo_python_ms", 1000, "Tempo da rota fora dos comandos SQL."),
+        ("http_response_bytes_total", "bytes_resposta", 1, "Bytes enviados no corpo das respostas da rota."),
+        ("query_budget_exceeded_total", "orcamento_excedido", 1, "Requisições que passaram do orçamento de consultas da rota."),
+    ):
+        metrica(nome, "counter", ajuda, [("", {"method": metodo, "route": rota}, round(getattr(metricas, atributo) / escala, 6) if escala != 1 else getattr(metricas, atributo)) for (metodo, rota), metricas in rotas])
+
+    engines = list(_engines.items())
+    metrica("db_pool_connections_in_use", "gauge", "Conexões retiradas do pool.", [("", {"engine": nome}, estado_pool(engine, metricas)["em_uso"]) for nome, (engine, metricas) in engines])
+    metrica("db_pool_connections_open", "gauge", "Conexões abertas pela engine.", [("", {"engine": nome}, metricas.contadores["conexoes_abertas"]) for nome, (engine, metricas) in engines])
+    metrica("db_pool_checkout_wait_seconds", "summary", "Espera por uma conexão livre do pool.", [
+        amostra for nome, (engine, metricas) in engines for amostra in (
+            ("_sum", {"engine": nome}, round(metricas.espera_checkout_ms.soma / 1000, 6)),
+            ("_count", {"engine": nome}, metricas.espera_checkout_ms.total),
+        )
+    ])
+    metrica("db_queries_total", "counter", "Comandos SQL executados pela engine.", [("", {"engine": nome}, metricas.contadores["consultas"]) for nome, (engine, metricas) in engines])
+
+    caches = [(nome, cache.estatisticas()) for nome, cache in _caches.items()]
+    metrica("cache_items", "gauge", "Itens nos caches em memória.", [("", {"cache": nome}, estatisticas["itens"]) for nome, estatisticas in caches])
+    metrica("cache_hits_total", "counter", "Acertos dos caches em memória.", [("", {"cache": nome}, estatisticas["acertos"]) for nome, estatisticas in caches])
+    metrica("cache_misses_total", "counter", "Falhas dos caches em memória.", [("", {"cache": nome}, estatisticas["falhas"]) for nome, estatisticas in caches])
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,37 @@
+"""
+Ambiente das migrações Alembic
+"""
+import sys
+from logging.config import fileConfig
+from pathlib import Path
+from alembic import context
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from database import DATABASE_URL, Base, engine
+import models  # noqa: F401  (registra as tabelas no metadata)
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    context.configure(url=DATABASE_URL, target_metadata=target_metadata, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
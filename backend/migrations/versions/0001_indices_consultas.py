@@ -0,0 +1,39 @@
+"""Índices compostos/parciais para os filtros mais usados e escala única por igreja/mês
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not context.is_offline_mode():
+        duplicadas = op.get_bind().execute(sa.text("SELECT count(*) FROM (SELECT 1 FROM escalas GROUP BY id_igreja, mes, ano HAVING count(*) > 1) AS d")).scalar()
+        if duplicadas:
+            raise RuntimeError(f"{duplicadas} igreja/mês com mais de uma escala; remova as duplicadas antes de aplicar esta migração")
+    op.create_unique_constraint('uq_escalas_igreja_mes_ano', 'escalas', ['id_igreja', 'mes', 'ano'])
+    op.create_index('ix_escalas_distrito_ano_mes', 'escalas', ['id_distrito', 'ano', 'mes'])
+    op.create_index('ix_itens_escala_id_escala', 'itens_escala', ['id_escala'])
+    op.create_index('ix_itens_escala_data_status', 'itens_escala', ['data', 'status'])
+    op.create_index('ix_notificacoes_usuario_status_criado', 'notificacoes', ['id_usuario', 'status', 'criado_em'])
+    op.create_index('ix_notificacoes_nao_lidas', 'notificacoes', ['id_usuario'], postgresql_where=sa.text("status = 'nao_lida'"))
+    op.create_index('ix_usuarios_distrito_pregador_ativo', 'usuarios', ['id_distrito', 'eh_pregador', 'ativo'])
+    op.create_index('ix_avaliacoes_id_usuario_avaliado', 'avaliacoes', ['id_usuario_avaliado'])
+
+
+def downgrade():
+    op.drop_index('ix_avaliacoes_id_usuario_avaliado', table_name='avaliacoes')
+    op.drop_index('ix_usuarios_distrito_pregador_ativo', table_name='usuarios')
+    op.drop_index('ix_notificacoes_nao_lidas', table_name='notificacoes')
+    op.drop_index('ix_notificacoes_usuario_status_criado', table_name='notificacoes')
+    op.drop_index('ix_itens_escala_data_status', table_name='itens_escala')
+    op.drop_index('ix_itens_escala_id_escala', table_name='itens_escala')
+    op.drop_index('ix_escalas_distrito_ano_mes', table_name='escalas')
+    op.drop_constraint('uq_escalas_igreja_mes_ano', 'escalas', type_='unique')
@@ -0,0 +1,52 @@
+"""Tabela atribuicoes: pregador e cantores de cada item em forma normalizada
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'atribuicoes',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('id_item_escala', sa.String(), sa.ForeignKey('itens_escala.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('id_usuario', sa.String(), sa.ForeignKey('usuarios.id'), nullable=False),
+        sa.Column('papel', sa.String(20), nullable=False),
+        sa.Column('data', sa.String(10), nullable=False),
+        sa.Column('criado_em', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint('id_item_escala', 'id_usuario', 'papel', name='uq_atribuicoes_item_usuario_papel'),
+    )
+    op.create_index('ix_atribuicoes_id_item_escala', 'atribuicoes', ['id_item_escala'])
+    op.create_index('ix_atribuicoes_usuario_data', 'atribuicoes', ['id_usuario', 'data'])
+
+    # Migração dos dados: id_pregador e cada elemento de ids_cantores viram uma linha
+    op.execute("""
+        INSERT INTO atribuicoes (id, id_item_escala, id_usuario, papel, data)
+        SELECT gen_random_uuid()::text, i.id, i.id_pregador, 'pregador', i.data
+        FROM itens_escala i
+        JOIN usuarios u ON u.id = i.id_pregador
+    """)
+    op.execute("""
+        INSERT INTO atribuicoes (id, id_item_escala, id_usuario, papel, data)
+        SELECT gen_random_uuid()::text, c.id, c.id_usuario, 'cantor', c.data
+        FROM (
+            SELECT DISTINCT i.id, i.data, cantor.valor AS id_usuario
+            FROM itens_escala i
+            CROSS JOIN LATERAL json_array_elements_text(COALESCE(i.ids_cantores::json, '[]'::json)) AS cantor(valor)
+        ) c
+        JOIN usuarios u ON u.id = c.id_usuario
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_atribuicoes_usuario_data', table_name='atribuicoes')
+    op.drop_index('ix_atribuicoes_id_item_escala', table_name='atribuicoes')
+    op.drop_table('atribuicoes')
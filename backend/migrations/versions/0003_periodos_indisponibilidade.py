@@ -0,0 +1,67 @@
+"""Tabela periodos_indisponibilidade com índice GiST em daterange
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+import json
+import uuid
+from datetime import date
+
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'periodos_indisponibilidade',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('id_usuario', sa.String(), sa.ForeignKey('usuarios.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('data_inicio', sa.Date(), nullable=False),
+        sa.Column('data_fim', sa.Date(), nullable=False),
+        sa.Column('criado_em', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_periodos_indisponibilidade_id_usuario', 'periodos_indisponibilidade', ['id_usuario'])
+    op.execute("CREATE INDEX ix_periodos_indisponibilidade_intervalo ON periodos_indisponibilidade USING gist (daterange(data_inicio, data_fim, '[]'))")
+
+    # Migração dos dados: o JSON tem datas em texto livre, então a conversão é feita
+    # em Python com a mesma regra de models.intervalos_de_periodos (no modo --sql
+    # não há conexão para ler os usuários, então a cópia exige a migração online)
+    if context.is_offline_mode():
+        return
+    bind = op.get_bind()
+    periodos = sa.table('periodos_indisponibilidade', sa.column('id', sa.String), sa.column('id_usuario', sa.String), sa.column('data_inicio', sa.Date), sa.column('data_fim', sa.Date))
+    linhas = []
+    for id_usuario, valor in bind.execute(sa.text("SELECT id, periodos_indisponibilidade FROM usuarios WHERE periodos_indisponibilidade IS NOT NULL")):
+        for inicio, fim in _intervalos(valor):
+            linhas.append({'id': str(uuid.uuid4()), 'id_usuario': id_usuario, 'data_inicio': inicio, 'data_fim': fim})
+    if linhas:
+        op.bulk_insert(periodos, linhas)
+
+
+def _intervalos(valor):
+    if isinstance(valor, str):
+        valor = json.loads(valor)
+    intervalos = []
+    for periodo in valor or []:
+        if not isinstance(periodo, dict):
+            continue
+        try:
+            inicio = date.fromisoformat(str(periodo.get('data_inicio') or date.min.isoformat())[:10])
+            fim = date.fromisoformat(str(periodo.get('data_fim') or '')[:10])
+        except ValueError:
+            continue
+        if inicio <= fim:
+            intervalos.append((inicio, fim))
+    return list(dict.fromkeys(intervalos))
+
+
+def downgrade():
+    op.drop_index('ix_periodos_indisponibilidade_intervalo', table_name='periodos_indisponibilidade')
+    op.drop_index('ix_periodos_indisponibilidade_id_usuario', table_name='periodos_indisponibilidade')
+    op.drop_table('periodos_indisponibilidade')
@@ -0,0 +1,36 @@
+"""Tabela mensagens_saida (fila de SMS/WhatsApp)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'mensagens_saida',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('chave_dedup', sa.String(200), nullable=False, unique=True),
+        sa.Column('canal', sa.String(20), nullable=False),
+        sa.Column('destino', sa.String(20), nullable=False),
+        sa.Column('mensagem', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('tentativas', sa.Integer(), nullable=False),
+        sa.Column('proxima_tentativa_em', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('ultimo_erro', sa.Text()),
+        sa.Column('criado_em', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('enviado_em', sa.DateTime(timezone=True)),
+    )
+    op.create_index('ix_mensagens_saida_fila', 'mensagens_saida', ['proxima_tentativa_em'], postgresql_where=sa.text("status IN ('pendente', 'enviando')"))
+
+
+def downgrade():
+    op.drop_index('ix_mensagens_saida_fila', table_name='mensagens_saida')
+    op.drop_table('mensagens_saida')
@@ -0,0 +1,78 @@
+"""Contador usuarios.notificacoes_nao_lidas e gatilhos de notificacoes (contagem + pg_notify)
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+# Cópia de models.GATILHOS_NOTIFICACOES no momento desta migração
+GATILHOS = """
+CREATE OR REPLACE FUNCTION notificacoes_apos_inserir() RETURNS trigger AS $$
+BEGIN
+    UPDATE usuarios u SET notificacoes_nao_lidas = u.notificacoes_nao_lidas + n.total
+    FROM (SELECT id_usuario, count(*) AS total FROM novas WHERE status = 'nao_lida' GROUP BY id_usuario) n
+    WHERE u.id = n.id_usuario;
+    PERFORM pg_notify('notificacoes', json_build_object('id', id, 'id_usuario', id_usuario, 'tipo', tipo, 'titulo', titulo, 'mensagem', left(mensagem, 1000), 'id_relacionado', id_relacionado, 'status', status, 'criado_em', criado_em)::text)
+    FROM novas;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notificacoes_apos_atualizar() RETURNS trigger AS $$
+BEGIN
+    UPDATE usuarios u SET notificacoes_nao_lidas = greatest(0, u.notificacoes_nao_lidas + d.delta)
+    FROM (
+        SELECT id_usuario, sum(delta) AS delta FROM (
+            SELECT id_usuario, 1 AS delta FROM novas WHERE status = 'nao_lida'
+            UNION ALL
+            SELECT id_usuario, -1 FROM antigas WHERE status = 'nao_lida'
+        ) alteracoes GROUP BY id_usuario
+    ) d
+    WHERE u.id = d.id_usuario AND d.delta <> 0;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notificacoes_apos_apagar() RETURNS trigger AS $$
+BEGIN
+    UPDATE usuarios u SET notificacoes_nao_lidas = greatest(0, u.notificacoes_nao_lidas - n.total)
+    FROM (SELECT id_usuario, count(*) AS total FROM antigas WHERE status = 'nao_lida' GROUP BY id_usuario) n
+    WHERE u.id = n.id_usuario;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE TRIGGER notificacoes_inserir AFTER INSERT ON notificacoes
+    REFERENCING NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION notificacoes_apos_inserir();
+CREATE TRIGGER notificacoes_atualizar AFTER UPDATE ON notificacoes
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION notificacoes_apos_atualizar();
+CREATE TRIGGER notificacoes_apagar AFTER DELETE ON notificacoes
+    REFERENCING OLD TABLE AS antigas FOR EACH STATEMENT EXECUTE FUNCTION notificacoes_apos_apagar();
+"""
+
+
+def upgrade():
+    op.add_column('usuarios', sa.Column('notificacoes_nao_lidas', sa.Integer(), nullable=False, server_default='0'))
+    # Gatilhos criados na mesma transação da contagem inicial: nada inserido
+    # entre as duas etapas fica de fora
+    op.execute("LOCK TABLE notificacoes IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("""
+        UPDATE usuarios u SET notificacoes_nao_lidas = n.total
+        FROM (SELECT id_usuario, count(*) AS total FROM notificacoes WHERE status = 'nao_lida' GROUP BY id_usuario) n
+        WHERE u.id = n.id_usuario
+    """)
+    op.execute(GATILHOS)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS notificacoes_inserir ON notificacoes")
+    op.execute("DROP TRIGGER IF EXISTS notificacoes_atualizar ON notificacoes")
+    op.execute("DROP TRIGGER IF EXISTS notificacoes_apagar ON notificacoes")
+    op.execute("DROP FUNCTION IF EXISTS notificacoes_apos_inserir()")
+    op.execute("DROP FUNCTION IF EXISTS notificacoes_apos_atualizar()")
+    op.execute("DROP FUNCTION IF EXISTS notificacoes_apos_apagar()")
+    op.drop_column('usuarios', 'notificacoes_nao_lidas')
@@ -0,0 +1,36 @@
+"""Tabela pontuacoes_membro (agregados das avaliações por membro)
+
+A tabela nasce vazia: depois do upgrade rode scripts/recompute_scores.py
+para preenchê-la (as pontuações dos usuários não mudam).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'pontuacoes_membro',
+        sa.Column('id_usuario', sa.String(), sa.ForeignKey('usuarios.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('tipo_membro', sa.String(20), primary_key=True),
+        sa.Column('total_avaliacoes', sa.Integer(), nullable=False),
+        sa.Column('soma_notas', sa.Integer(), nullable=False),
+        sa.Column('soma_quadrados', sa.Integer(), nullable=False),
+        sa.Column('ultimas_notas', postgresql.ARRAY(sa.Integer()), nullable=False),
+        sa.Column('soma_ponderada', sa.Float(), nullable=False),
+        sa.Column('soma_pesos', sa.Float(), nullable=False),
+        sa.Column('ultima_avaliacao_em', sa.DateTime(timezone=True)),
+    )
+
+
+def downgrade():
+    op.drop_table('pontuacoes_membro')
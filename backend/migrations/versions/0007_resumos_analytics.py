@@ -0,0 +1,49 @@
+"""Resumos do painel de analytics por distrito
+
+As tabelas nascem vazias: cada resumo é calculado na primeira leitura do
+painel do distrito, ou antes com scripts/refresh_analytics.py --todos.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'resumos_distrito',
+        sa.Column('id_distrito', sa.String(), sa.ForeignKey('distritos.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('total_igrejas', sa.Integer(), nullable=False),
+        sa.Column('total_pregadores', sa.Integer(), nullable=False),
+        sa.Column('total_cantores', sa.Integer(), nullable=False),
+        sa.Column('top_pregadores', sa.JSON(), nullable=False),
+        sa.Column('avaliacoes_recentes', sa.JSON(), nullable=False),
+        sa.Column('desatualizado', sa.Boolean(), nullable=False),
+        sa.Column('versao', sa.Integer(), nullable=False),
+        sa.Column('atualizado_em', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_table(
+        'resumos_distrito_mes',
+        sa.Column('id_distrito', sa.String(), sa.ForeignKey('distritos.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('ano', sa.Integer(), primary_key=True),
+        sa.Column('mes', sa.Integer(), primary_key=True),
+        sa.Column('total_itens', sa.Integer(), nullable=False),
+        sa.Column('recusados', sa.Integer(), nullable=False),
+        sa.Column('cancelados', sa.Integer(), nullable=False),
+        sa.Column('total_avaliacoes', sa.Integer(), nullable=False),
+        sa.Column('soma_notas', sa.Integer(), nullable=False),
+    )
+    op.create_index('ix_avaliacoes_igreja_criado', 'avaliacoes', ['id_igreja', 'criado_em'])
+
+
+def downgrade():
+    op.drop_index('ix_avaliacoes_igreja_criado', table_name='avaliacoes')
+    op.drop_table('resumos_distrito_mes')
+    op.drop_table('resumos_distrito')
@@ -0,0 +1,30 @@
+"""Versões da disponibilidade por distrito e mês
+
+A tabela nasce vazia: a versão de um distrito/mês sem linha é 0, e a primeira
+escrita que o afeta cria a linha.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'versoes_disponibilidade',
+        sa.Column('id_distrito', sa.String(), sa.ForeignKey('distritos.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('ano', sa.Integer(), primary_key=True),
+        sa.Column('mes', sa.Integer(), primary_key=True),
+        sa.Column('versao', sa.Integer(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table('versoes_disponibilidade')
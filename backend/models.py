@@ -2,10 +2,12 @@
 Modelos do Banco de Dados PostgreSQL
 Todos os atributos estão em português
 """
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, ForeignKey, JSON, Text, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import ARRAY, Column, String, Integer, Float, Boolean, Date, DateTime, ForeignKey, JSON, Text, Table, Index, UniqueConstraint, DDL, text, event, inspect
+from sqlalchemy.orm import relationship, Session
 from sqlalchemy.sql import func
 from database import Base
+from datetime import date
+from typing import List, Optional
 import uuid
 
 def gerar_uuid():
@@ -14,6 +16,9 @@ def gerar_uuid():
 # Tabela de Usuários
 class Usuario(Base):
     __tablename__ = "usuarios"
+    __table_args__ = (
+        Index('ix_usuarios_distrito_pregador_ativo', 'id_distrito', 'eh_pregador', 'ativo'),
+    )
     
     id = Column(String, primary_key=True, default=gerar_uuid)
     nome_usuario = Column(String(100), unique=True, nullable=False, index=True)
@@ -32,12 +37,70 @@ class Usuario(Base):
     criado_em = Column(DateTime(timezone=True), server_default=func.now())
     atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     ativo = Column(Boolean, default=True)
+    notificacoes_nao_lidas = Column(Integer, nullable=False, default=0, server_default='0')  # mantido pelos gatilhos de notificacoes
     
     # Relacionamentos
     distrito = relationship("Distrito", foreign_keys=[id_distrito], back_populates="usuarios")
     igreja = relationship("Igreja", foreign_keys=[id_igreja], back_populates="usuarios")
     avaliacoes_recebidas = relationship("Avaliacao", back_populates="usuario_avaliado", foreign_keys="Avaliacao.id_usuario_avaliado")
     notificacoes = relationship("Notificacao", back_populates="usuario")
+    intervalos_indisponibilidade = relationship("PeriodoIndisponibilidade", back_populates="usuario", cascade="all, delete-orphan", passive_deletes=True)
+
+
+# Tabela de Períodos de Indisponibilidade (forma indexável de Usuario.periodos_indisponibilidade)
+class PeriodoIndisponibilidade(Base):
+    __tablename__ = "periodos_indisponibilidade"
+    
+    id = Column(String, primary_key=True, default=gerar_uuid)
+    id_usuario = Column(String, ForeignKey('usuarios.id', ondelete='CASCADE'), nullable=False, index=True)
+    data_inicio = Column(Date, nullable=False)
+    data_fim = Column(Date, nullable=False)  # Inclusive
+    criado_em = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relacionamentos
+    usuario = relationship("Usuario", back_populates="intervalos_indisponibilidade")
+
+
+# Busca "quem está indisponível nestas datas" pelo operador @> do daterange
+Index('ix_periodos_indisponibilidade_intervalo', func.daterange(PeriodoIndisponibilidade.data_inicio, PeriodoIndisponibilidade.data_fim, text("'[]'")), postgresql_using='gist').ddl_if(dialect='postgresql')
+
+
+def intervalos_de_periodos(periodos):
+    """Converte a lista JSON de períodos em intervalos (início, fim) de datas.
+
+    Mantém a semântica da comparação antiga: sem data de início o período vale
+    desde sempre e sem data de fim (ou com fim inválido) ele é ignorado.
+    """
+    intervalos = []
+    for periodo in periodos or []:
+        if not isinstance(periodo, dict):
+            continue
+        try:
+            inicio = date.fromisoformat(str(periodo.get('data_inicio') or date.min.isoformat())[:10])
+            fim = date.fromisoformat(str(periodo.get('data_fim') or '')[:10])
+        except ValueError:
+            continue
+        if inicio <= fim:
+            intervalos.append((inicio, fim))
+    return list(dict.fromkeys(intervalos))
+
+
+@event.listens_for(Session, 'before_flush')
+def sincronizar_periodos_indisponibilidade(session, flush_context, instances):
+    # Mantém `periodos_indisponibilidade` (tabela) em dia com o JSON editado pela API
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Usuario):
+            continue
+        if obj not in session.new and not inspect(obj).attrs.periodos_indisponibilidade.history.has_changes():
+            continue
+        desejados = intervalos_de_periodos(obj.periodos_indisponibilidade)
+        atuais = {(p.data_inicio, p.data_fim): p for p in obj.intervalos_indisponibilidade}
+        for chave, periodo in atuais.items():
+            if chave not in desejados:
+                obj.intervalos_indisponibilidade.remove(periodo)
+        for inicio, fim in desejados:
+            if (inicio, fim) not in atuais:
+                obj.intervalos_indisponibilidade.append(PeriodoIndisponibilidade(data_inicio=inicio, data_fim=fim))
 
 
 # Tabela de Distritos
@@ -84,6 +147,10 @@ class Igreja(Base):
 # Tabela de Escalas
 class Escala(Base):
     __tablename__ = "escalas"
+    __table_args__ = (
+        UniqueConstraint('id_igreja', 'mes', 'ano', name='uq_escalas_igreja_mes_ano'),
+        Index('ix_escalas_distrito_ano_mes', 'id_distrito', 'ano', 'mes'),
+    )
     
     id = Column(String, primary_key=True, default=gerar_uuid)
     mes = Column(Integer, nullable=False)
@@ -106,9 +173,12 @@ class Escala(Base):
 # Tabela de Itens da Escala
 class ItemEscala(Base):
     __tablename__ = "itens_escala"
+    __table_args__ = (
+        Index('ix_itens_escala_data_status', 'data', 'status'),
+    )
     
     id = Column(String, primary_key=True, default=gerar_uuid)
-    id_escala = Column(String, ForeignKey('escalas.id', ondelete='CASCADE'), nullable=False)
+    id_escala = Column(String, ForeignKey('escalas.id', ondelete='CASCADE'), nullable=False, index=True)
     data = Column(String(10), nullable=False)  # YYYY-MM-DD
     horario = Column(String(5), nullable=False)  # HH:MM
     id_pregador = Column(String, ForeignKey('usuarios.id'))
@@ -124,17 +194,85 @@ class ItemEscala(Base):
     escala = relationship("Escala", back_populates="itens")
     pregador = relationship("Usuario", foreign_keys=[id_pregador])
     avaliacoes = relationship("Avaliacao", back_populates="item_escala")
+    atribuicoes = relationship("Atribuicao", back_populates="item_escala", cascade="all, delete-orphan", passive_deletes=True)
+
+
+# Tabela de Atribuições (forma normalizada de id_pregador/ids_cantores)
+class Atribuicao(Base):
+    __tablename__ = "atribuicoes"
+    __table_args__ = (
+        UniqueConstraint('id_item_escala', 'id_usuario', 'papel', name='uq_atribuicoes_item_usuario_papel'),
+        Index('ix_atribuicoes_usuario_data', 'id_usuario', 'data'),
+    )
+    
+    id = Column(String, primary_key=True, default=gerar_uuid)
+    id_item_escala = Column(String, ForeignKey('itens_escala.id', ondelete='CASCADE'), nullable=False, index=True)
+    id_usuario = Column(String, ForeignKey('usuarios.id'), nullable=False)
+    papel = Column(String(20), nullable=False)  # pregador, cantor
+    data = Column(String(10), nullable=False)  # Cópia de ItemEscala.data para a busca por (usuário, data)
+    criado_em = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relacionamentos
+    item_escala = relationship("ItemEscala", back_populates="atribuicoes")
+
+
+def atribuicoes_do_item(id_pregador, ids_cantores):
+    """Pares (id_usuario, papel) que um item de escala deve ter em `atribuicoes`."""
+    pares = [(id_pregador, 'pregador')] if id_pregador else []
+    pares.extend((id_cantor, 'cantor') for id_cantor in dict.fromkeys(ids_cantores or []) if id_cantor)
+    return pares
+
+
+@event.listens_for(Session, 'before_flush')
+def sincronizar_atribuicoes(session, flush_context, instances):
+    # Mantém `atribuicoes` em dia com id_pregador/ids_cantores em qualquer flush do ORM
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, ItemEscala):
+            continue
+        if obj not in session.new:
+            estado = inspect(obj)
+            if not any(estado.attrs[campo].history.has_changes() for campo in ('id_pregador', 'ids_cantores', 'data')):
+                continue
+        desejadas = atribuicoes_do_item(obj.id_pregador, obj.ids_cantores)
+        atuais = {(a.id_usuario, a.papel): a for a in obj.atribuicoes}
+        for chave, atribuicao in atuais.items():
+            if chave not in desejadas:
+                obj.atribuicoes.remove(atribuicao)
+            elif atribuicao.data != obj.data:
+                atribuicao.data = obj.data
+        for id_usuario, papel in desejadas:
+            if (id_usuario, papel) not in atuais:
+                obj.atribuicoes.append(Atribuicao(id_usuario=id_usuario, papel=papel, data=obj.data))
+
+
+def linhas_escrita_em_lote(estado) -> Optional[List[dict]]:
+    """Linhas de um INSERT em lote (do_orm_execute), para os caches restringirem a invalidação.
+
+    None quando a escrita não pode ser restringida pelos parâmetros (UPDATE ou
+    DELETE por filtro, valores embutidos no comando).
+    """
+    if not estado.is_insert:
+        return None
+    parametros = estado.parameters
+    if isinstance(parametros, dict):
+        return [parametros]
+    if isinstance(parametros, list) and parametros:
+        return parametros
+    return None
 
 
 # Tabela de Avaliações
 class Avaliacao(Base):
     __tablename__ = "avaliacoes"
+    __table_args__ = (
+        Index('ix_avaliacoes_igreja_criado', 'id_igreja', 'criado_em'),
+    )
     
     id = Column(String, primary_key=True, default=gerar_uuid)
     id_item_escala = Column(String, ForeignKey('itens_escala.id'), nullable=False)
     id_igreja = Column(String, ForeignKey('igrejas.id'), nullable=False)
     tipo_membro = Column(String(20), nullable=False)  # pregador, cantor
-    id_usuario_avaliado = Column(String, ForeignKey('usuarios.id'), nullable=False)
+    id_usuario_avaliado = Column(String, ForeignKey('usuarios.id'), nullable=False, index=True)
     nota = Column(Integer, nullable=False)  # 1 a 5
     comentario = Column(Text)
     criado_em = Column(DateTime(timezone=True), server_default=func.now())
@@ -144,9 +282,80 @@ class Avaliacao(Base):
     usuario_avaliado = relationship("Usuario", back_populates="avaliacoes_recebidas", foreign_keys=[id_usuario_avaliado])
 
 
+# Agregados das avaliações por membro e tipo (mantidos por scores.registrar_avaliacao)
+class PontuacaoMembro(Base):
+    __tablename__ = "pontuacoes_membro"
+
+    id_usuario = Column(String, ForeignKey('usuarios.id', ondelete='CASCADE'), primary_key=True)
+    tipo_membro = Column(String(20), primary_key=True)  # pregador, cantor
+    total_avaliacoes = Column(Integer, nullable=False, default=0)
+    soma_notas = Column(Integer, nullable=False, default=0)
+    soma_quadrados = Column(Integer, nullable=False, default=0)
+    ultimas_notas = Column(ARRAY(Integer), nullable=False, default=list)  # janela das mais recentes, da mais antiga para a mais nova
+    soma_ponderada = Column(Float, nullable=False, default=0.0)  # notas com decaimento exponencial até ultima_avaliacao_em
+    soma_pesos = Column(Float, nullable=False, default=0.0)
+    ultima_avaliacao_em = Column(DateTime(timezone=True))
+
+    @property
+    def media(self) -> float:
+        return self.soma_notas / self.total_avaliacoes if self.total_avaliacoes else 0.0
+
+    @property
+    def desvio_padrao(self) -> float:
+        if not self.total_avaliacoes:
+            return 0.0
+        return max(0.0, self.soma_quadrados / self.total_avaliacoes - self.media ** 2) ** 0.5
+
+    @property
+    def media_recente(self) -> float:
+        return self.soma_ponderada / self.soma_pesos if self.soma_pesos else 0.0
+
+
+# Resumos do painel de analytics por distrito (ver analytics.py)
+class ResumoDistrito(Base):
+    __tablename__ = "resumos_distrito"
+
+    id_distrito = Column(String, ForeignKey('distritos.id', ondelete='CASCADE'), primary_key=True)
+    total_igrejas = Column(Integer, nullable=False, default=0)
+    total_pregadores = Column(Integer, nullable=False, default=0)
+    total_cantores = Column(Integer, nullable=False, default=0)
+    top_pregadores = Column(JSON, nullable=False, default=list)
+    avaliacoes_recentes = Column(JSON, nullable=False, default=list)
+    desatualizado = Column(Boolean, nullable=False, default=True)  # marcado nas escritas, recalculado na leitura seguinte
+    versao = Column(Integer, nullable=False, default=0)  # muda a cada recálculo; compõe o ETag
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ResumoDistritoMes(Base):
+    __tablename__ = "resumos_distrito_mes"
+
+    id_distrito = Column(String, ForeignKey('distritos.id', ondelete='CASCADE'), primary_key=True)
+    ano = Column(Integer, primary_key=True)
+    mes = Column(Integer, primary_key=True)
+    total_itens = Column(Integer, nullable=False, default=0)
+    recusados = Column(Integer, nullable=False, default=0)
+    cancelados = Column(Integer, nullable=False, default=0)
+    total_avaliacoes = Column(Integer, nullable=False, default=0)
+    soma_notas = Column(Integer, nullable=False, default=0)
+
+
+# Versões da disponibilidade por distrito e mês (ver availability.py); ano = mes = 0 vale para todos os meses
+class VersaoDisponibilidade(Base):
+    __tablename__ = "versoes_disponibilidade"
+
+    id_distrito = Column(String, ForeignKey('distritos.id', ondelete='CASCADE'), primary_key=True)
+    ano = Column(Integer, primary_key=True)
+    mes = Column(Integer, primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)  # incrementada pelas escritas, em qualquer processo
+
+
 # Tabela de Notificações
 class Notificacao(Base):
     __tablename__ = "notificacoes"
+    __table_args__ = (
+        Index('ix_notificacoes_usuario_status_criado', 'id_usuario', 'status', 'criado_em'),
+        Index('ix_notificacoes_nao_lidas', 'id_usuario', postgresql_where=text("status = 'nao_lida'")),
+    )
     
     id = Column(String, primary_key=True, default=gerar_uuid)
     id_usuario = Column(String, ForeignKey('usuarios.id'), nullable=False)
@@ -161,6 +370,53 @@ class Notificacao(Base):
     usuario = relationship("Usuario", back_populates="notificacoes")
 
 
+# Gatilhos por comando (não por linha) em notificacoes: mantêm
+# usuarios.notificacoes_nao_lidas e avisam as conexões em LISTEN no canal
+# 'notificacoes' sobre cada linha nova (entregue só no commit)
+GATILHOS_NOTIFICACOES = """
+CREATE OR REPLACE FUNCTION notificacoes_apos_inserir() RETURNS trigger AS $$
+BEGIN
+    UPDATE usuarios u SET notificacoes_nao_lidas = u.notificacoes_nao_lidas + n.total
+    FROM (SELECT id_usuario, count(*) AS total FROM novas WHERE status = 'nao_lida' GROUP BY id_usuario) n
+    WHERE u.id = n.id_usuario;
+    PERFORM pg_notify('notificacoes', json_build_object('id', id, 'id_usuario', id_usuario, 'tipo', tipo, 'titulo', titulo, 'mensagem', left(mensagem, 1000), 'id_relacionado', id_relacionado, 'status', status, 'criado_em', criado_em)::text)
+    FROM novas;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notificacoes_apos_atualizar() RETURNS trigger AS $$
+BEGIN
+    UPDATE usuarios u SET notificacoes_nao_lidas = greatest(0, u.notificacoes_nao_lidas + d.delta)
+    FROM (
+        SELECT id_usuario, sum(delta) AS delta FROM (
+            SELECT id_usuario, 1 AS delta FROM novas WHERE status = 'nao_lida'
+            UNION ALL
+            SELECT id_usuario, -1 FROM antigas WHERE status = 'nao_lida'
+        ) alteracoes GROUP BY id_usuario
+    ) d
+    WHERE u.id = d.id_usuario AND d.delta <> 0;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notificacoes_apos_apagar() RETURNS trigger AS $$
+BEGIN
+    UPDATE usuarios u SET notificacoes_nao_lidas = greatest(0, u.notificacoes_nao_lidas - n.total)
+    FROM (SELECT id_usuario, count(*) AS total FROM antigas WHERE status = 'nao_lida' GROUP BY id_usuario) n
+    WHERE u.id = n.id_usuario;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE TRIGGER notificacoes_inserir AFTER INSERT ON notificacoes
+    REFERENCING NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION notificacoes_apos_inserir();
+CREATE TRIGGER notificacoes_atualizar AFTER UPDATE ON notificacoes
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION notificacoes_apos_atualizar();
+CREATE TRIGGER notificacoes_apagar AFTER DELETE ON notificacoes
+    REFERENCING OLD TABLE AS antigas FOR EACH STATEMENT EXECUTE FUNCTION notificacoes_apos_apagar();
+"""
+
+event.listen(Notificacao.__table__, 'after_create', DDL(GATILHOS_NOTIFICACOES).execute_if(dialect='postgresql'))
+
+
 # Tabela de Solicitações de Troca
 class SolicitacaoTroca(Base):
     __tablename__ = "solicitacoes_troca"
@@ -212,3 +468,23 @@ class LogAuditoria(Base):
     
     # Relacionamentos
     usuario = relationship("Usuario")
+
+
+# Fila de mensagens externas (SMS/WhatsApp) entregues pelo outbox_worker
+class MensagemSaida(Base):
+    __tablename__ = "mensagens_saida"
+    __table_args__ = (
+        Index('ix_mensagens_saida_fila', 'proxima_tentativa_em', postgresql_where=text("status IN ('pendente', 'enviando')")),
+    )
+
+    id = Column(String, primary_key=True, default=gerar_uuid)
+    chave_dedup = Column(String(200), unique=True, nullable=False)  # a mesma chave nunca é enfileirada duas vezes
+    canal = Column(String(20), nullable=False, default='sms')
+    destino = Column(String(20), nullable=False)
+    mensagem = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default='pendente')  # pendente, enviando, enviada, falhou
+    tentativas = Column(Integer, nullable=False, default=0)
+    proxima_tentativa_em = Column(DateTime(timezone=True), nullable=False, server_default=func.now())  # em 'enviando', fim da reserva
+    ultimo_erro = Column(Text)
+    criado_em = Column(DateTime(timezone=True), server_default=func.now())
+    enviado_em = Column(DateTime(timezone=True))
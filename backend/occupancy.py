@@ -0,0 +1,58 @@
+"""
+Índice de ocupação das escalas
+
+Responde "o usuário X já está escalado na data Y?" a partir de uma única
+consulta indexada em `atribuicoes` (usuário, data), cobrindo pregadores e
+cantores, em vez de varrer todas as escalas a cada chamada.
+"""
+from typing import Dict, Iterable, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+
+from models import Escala, ItemEscala, Atribuicao
+
+# Apenas escalas publicadas e itens ainda válidos ocupam o membro na data
+STATUS_ESCALA_OCUPA = ('confirmada', 'ativa')
+STATUS_ITEM_OCUPA = ('confirmado', 'pendente')
+
+
+class IndiceOcupacao:
+    """Mapa (id_usuario, data) -> ids dos itens de escala que ocupam o membro."""
+
+    def __init__(self):
+        self._slots: Dict[Tuple[str, str], Set[str]] = {}
+
+    def adicionar(self, id_usuario: Optional[str], data: str, id_item: str):
+        if not id_usuario:
+            return
+        self._slots.setdefault((id_usuario, data), set()).add(id_item)
+
+    def adicionar_item(self, id_item: str, data: str, id_pregador: Optional[str], ids_cantores: Optional[Iterable[str]]):
+        self.adicionar(id_pregador, data, id_item)
+        for id_cantor in (ids_cantores or []):
+            self.adicionar(id_cantor, data, id_item)
+
+    def ocupado(self, id_usuario: str, data: str, ignorar: Iterable[str] = ()) -> bool:
+        itens = self._slots.get((id_usuario, data))
+        if not itens:
+            return False
+        return bool(itens.difference(ignorar))
+
+    def __len__(self):
+        return len(self._slots)
+
+
+def carregar_ocupacao(db: Session, datas: Iterable[str], ids_usuarios: Optional[Iterable[str]] = None) -> IndiceOcupacao:
+    """Monta o índice de ocupação das datas (e, opcionalmente, usuários) com uma única consulta."""
+    indice = IndiceOcupacao()
+    datas = sorted(set(datas))
+    if not datas:
+        return indice
+    query = db.query(Atribuicao.id_item_escala, Atribuicao.data, Atribuicao.id_usuario).join(ItemEscala, ItemEscala.id == Atribuicao.id_item_escala).join(Escala, Escala.id == ItemEscala.id_escala).filter(Atribuicao.data.in_(datas), Escala.status.in_(STATUS_ESCALA_OCUPA), ItemEscala.status.in_(STATUS_ITEM_OCUPA))
+    if ids_usuarios is not None:
+        ids_usuarios = sorted(set(ids_usuarios))
+        if not ids_usuarios:
+            return indice
+        query = query.filter(Atribuicao.id_usuario.in_(ids_usuarios))
+    for id_item, data, id_usuario in query.all():
+        indice.adicionar(id_usuario, data, id_item)
+    return indice
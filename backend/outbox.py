@@ -0,0 +1,176 @@
+"""
+Fila de saída (outbox) de mensagens SMS/WhatsApp
+
+As rotas só gravam a mensagem em `mensagens_saida`, na mesma transação da
+alteração que a originou (`enfileirar`). A entrega fica com um processo
+separado (`scripts/outbox_worker.py`), que roda `TrabalhadorSaida`:
+
+- Reserva lotes com `FOR UPDATE SKIP LOCKED`, então vários workers podem
+  rodar ao mesmo tempo sem entregar a mesma mensagem. A reserva vale por
+  `reserva` segundos; se o worker morrer, a mensagem volta para a fila.
+- Entrega com no máximo `concorrencia` chamadas simultâneas ao provedor e
+  até `por_segundo` mensagens por segundo.
+- Em caso de falha, tenta de novo com espera exponencial (com jitter) até
+  `max_tentativas`; depois a mensagem fica como 'falhou'.
+- A deduplicação é pela `chave_dedup` única: reenfileirar a mesma
+  notificação (ex.: confirmar a escala de novo) não gera um segundo envio.
+
+Os provedores implementam `async enviar(destino, mensagem)`; `ProvedorLog`
+só registra no log (o antigo mock) e `ProvedorFake` simula latência e
+falhas para testes e benchmarks.
+"""
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import MensagemSaida
+
+logger = logging.getLogger(__name__)
+
+PENDENTE, ENVIANDO, ENVIADA, FALHOU = 'pendente', 'enviando', 'enviada', 'falhou'
+
+
+async def enfileirar(db: AsyncSession, mensagens: List[Dict[str, str]]):
+    """Grava mensagens {chave_dedup, destino, mensagem[, canal]} na transação corrente; chaves repetidas são ignoradas."""
+    if mensagens:
+        await db.execute(insert(MensagemSaida).values(mensagens).on_conflict_do_nothing(index_elements=['chave_dedup']))
+
+
+class ErroEntrega(Exception):
+    pass
+
+
+class ProvedorLog:
+    async def enviar(self, destino: str, mensagem: str):
+        logger.info(f"[MOCK SMS/WhatsApp para {destino}]: {mensagem}")
+
+
+class ProvedorFake:
+    """Provedor local: espera `latencia` segundos e falha com probabilidade `taxa_falha`."""
+
+    def __init__(self, latencia: float = 0.05, taxa_falha: float = 0.0, semente: Optional[int] = None):
+        self.latencia = latencia
+        self.taxa_falha = taxa_falha
+        self.enviadas: List[tuple] = []
+        self.falhas = 0
+        self._rng = random.Random(semente)
+
+    async def enviar(self, destino: str, mensagem: str):
+        await asyncio.sleep(self.latencia)
+        if self._rng.random() < self.taxa_falha:
+            self.falhas += 1
+            raise ErroEntrega("falha simulada do provedor")
+        self.enviadas.append((destino, mensagem))
+
+
+class LimiteTaxa:
+    """Espaça as chamadas para no máximo `por_segundo` por segundo (0 = sem limite)."""
+
+    def __init__(self, por_segundo: float = 0):
+        self.intervalo = 1 / por_segundo if por_segundo else 0.0
+        self._proxima = 0.0
+        self._lock = asyncio.Lock()
+
+    async def aguardar(self):
+        if not self.intervalo:
+            return
+        async with self._lock:
+            agora = time.monotonic()
+            espera = self._proxima - agora
+            self._proxima = max(agora, self._proxima) + self.intervalo
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+
+class TrabalhadorSaida:
+    def __init__(self, sessoes, provedor, concorrencia: int = 10, por_segundo: float = 0, lote: int = 100, max_tentativas: int = 5, espera_base: float = 2.0, espera_maxima: float = 600.0, reserva: float = 60.0, intervalo_ocioso: float = 1.0):
+        self.sessoes = sessoes
+        self.provedor = provedor
+        self.lote = max(lote, concorrencia)
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.reserva = reserva
+        self.intervalo_ocioso = intervalo_ocioso
+        self._semaforo = asyncio.Semaphore(concorrencia)
+        self._limite = LimiteTaxa(por_segundo)
+        self.contadores = {ENVIADA: 0, FALHOU: 0, 'retentativas': 0}
+
+    def espera(self, tentativas: int) -> float:
+        """Espera exponencial com jitter antes da tentativa seguinte."""
+        return min(self.espera_maxima, self.espera_base * 2 ** (tentativas - 1)) * random.uniform(0.5, 1.0)
+
+    async def reservar(self) -> list:
+        fila = (
+            select(MensagemSaida.id)
+            .where(MensagemSaida.status.in_([PENDENTE, ENVIANDO]), MensagemSaida.proxima_tentativa_em <= func.now())
+            .order_by(MensagemSaida.proxima_tentativa_em)
+            .limit(self.lote)
+            .with_for_update(skip_locked=True)
+        )
+        comando = (
+            update(MensagemSaida)
+            .where(MensagemSaida.id.in_(fila.scalar_subquery()))
+            .values(status=ENVIANDO, proxima_tentativa_em=func.now() + timedelta(seconds=self.reserva))
+            .returning(MensagemSaida.id, MensagemSaida.destino, MensagemSaida.mensagem, MensagemSaida.tentativas)
+            .execution_options(synchronize_session=False)
+        )
+        async with self.sessoes() as db:
+            mensagens = (await db.execute(comando)).all()
+            await db.commit()
+        return mensagens
+
+    async def _entregar(self, mensagem) -> Optional[str]:
+        async with self._semaforo:
+            await self._limite.aguardar()
+            try:
+                await self.provedor.enviar(mensagem.destino, mensagem.mensagem)
+                return None
+            except Exception as exc:
+                return f"{type(exc).__name__}: {exc}"
+
+    async def processar_lote(self) -> int:
+        mensagens = await self.reservar()
+        if not mensagens:
+            return 0
+        erros = await asyncio.gather(*(self._entregar(mensagem) for mensagem in mensagens))
+        agora = datetime.now(timezone.utc)
+        enviadas = [mensagem.id for mensagem, erro in zip(mensagens, erros) if erro is None]
+        async with self.sessoes() as db:
+            if enviadas:
+                await db.execute(update(MensagemSaida).where(MensagemSaida.id.in_(enviadas)).values(status=ENVIADA, enviado_em=agora, ultimo_erro=None).execution_options(synchronize_session=False))
+            for mensagem, erro in zip(mensagens, erros):
+                if erro is None:
+                    continue
+                tentativas = mensagem.tentativas + 1
+                if tentativas >= self.max_tentativas:
+                    valores = {"status": FALHOU}
+                    self.contadores[FALHOU] += 1
+                    logger.warning(f"Mensagem {mensagem.id} descartada após {tentativas} tentativas: {erro}")
+                else:
+                    valores = {"status": PENDENTE, "proxima_tentativa_em": agora + timedelta(seconds=self.espera(tentativas))}
+                    self.contadores['retentativas'] += 1
+                await db.execute(update(MensagemSaida).where(MensagemSaida.id == mensagem.id).values(tentativas=tentativas, ultimo_erro=erro, **valores).execution_options(synchronize_session=False))
+            await db.commit()
+        self.contadores[ENVIADA] += len(enviadas)
+        return len(mensagens)
+
+    async def executar(self, parar: Optional[asyncio.Event] = None, ate_esvaziar: bool = False):
+        """Processa lotes até `parar` ser sinalizado (ou, com `ate_esvaziar`, até não haver nada pronto)."""
+        parar = parar or asyncio.Event()
+        while not parar.is_set():
+            if await self.processar_lote():
+                continue
+            if ate_esvaziar:
+                return
+            try:
+                await asyncio.wait_for(parar.wait(), timeout=self.intervalo_ocioso)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,56 @@
+"""
+Hash e verificação de senhas (bcrypt) fora do event loop
+
+O bcrypt consome centenas de milissegundos de CPU por operação. As rotas
+assíncronas delegam esse trabalho a um pool de threads limitado (o bcrypt
+libera o GIL durante o cálculo), então uma rajada de logins ocupa no máximo
+`PASSWORD_WORKERS` núcleos e as demais requisições continuam sendo atendidas.
+
+O custo é configurável por `BCRYPT_ROUNDS`; hashes com outro custo são
+refeitos de forma transparente no próximo login bem-sucedido.
+
+Importações em lote (`hash_senhas`) usam um pool próprio de
+`IMPORT_HASH_WORKERS` threads, para não disputar o pool dos logins.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+PASSWORD_WORKERS = int(os.environ.get('PASSWORD_WORKERS', min(4, os.cpu_count() or 1)))
+IMPORT_HASH_WORKERS = int(os.environ.get('IMPORT_HASH_WORKERS', os.cpu_count() or 1))
+
+# min_rounds = max_rounds = rounds: qualquer hash com outro custo precisa de atualização
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=BCRYPT_ROUNDS, bcrypt__min_rounds=BCRYPT_ROUNDS, bcrypt__max_rounds=BCRYPT_ROUNDS)
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix='senhas')
+
+
+def hash_senha(senha: str) -> str:
+    return pwd_context.hash(senha)
+
+
+def hash_senhas(senhas: Sequence[str]) -> List[str]:
+    """Hashes de várias senhas em paralelo (o bcrypt libera o GIL), na mesma ordem."""
+    if len(senhas) <= 1:
+        return [hash_senha(senha) for senha in senhas]
+    with ThreadPoolExecutor(max_workers=min(IMPORT_HASH_WORKERS, len(senhas)), thread_name_prefix='senhas-importacao') as executor:
+        return list(executor.map(hash_senha, senhas))
+
+
+def verificar_e_atualizar(senha: str, senha_hash: str) -> Tuple[bool, Optional[str]]:
+    """(senha correta?, novo hash quando o custo do atual está desatualizado)."""
+    try:
+        return pwd_context.verify_and_update(senha, senha_hash)
+    except ValueError:  # hash inválido ou de esquema desconhecido
+        return False, None
+
+
+async def gerar_hash(senha: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_executor, hash_senha, senha)
+
+
+async def verificar_senha(senha: str, senha_hash: str) -> Tuple[bool, Optional[str]]:
+    return await asyncio.get_running_loop().run_in_executor(_executor, verificar_e_atualizar, senha, senha_hash)
@@ -0,0 +1,279 @@
+"""
+Planejador de escalas em memória
+
+Carrega igrejas, membros, períodos de indisponibilidade e ocupação do
+distrito/mês com um número constante de consultas, resolve o mês inteiro
+sem tocar no banco e grava todos os itens com um único insert em lote.
+"""
+import calendar
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import numpy as np
+from sqlalchemy import insert, or_
+from sqlalchemy.orm import Session
+
+from models import Usuario, Igreja, Escala, ItemEscala, Atribuicao, atribuicoes_do_item, gerar_uuid
+from occupancy import IndiceOcupacao, carregar_ocupacao
+from availability import carregar_indisponiveis
+from assignment import CUSTO_PROIBIDO, atribuicao_custo_minimo
+
+DIAS_SEMANA_PT = {'monday': 'segunda', 'tuesday': 'terca', 'wednesday': 'quarta', 'thursday': 'quinta', 'friday': 'sexta', 'saturday': 'sabado', 'sunday': 'domingo'}
+
+
+@dataclass
+class IgrejaPlano:
+    id: str
+    nome: str
+    horarios_culto: List[Dict] = field(default_factory=list)
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+@dataclass
+class MembroPlano:
+    id: str
+    id_igreja: Optional[str] = None
+    eh_pregador: bool = False
+    eh_cantor: bool = False
+    pontuacao_pregacao: float = 50.0
+    pontuacao_canto: float = 50.0
+
+
+@dataclass
+class PesosOtimizacao:
+    pontuacao: float = 1.0  # Preferência por membros melhor avaliados
+    equilibrio: float = 1.0  # Penalidade por participações acima da média
+    distancia: float = 0.5  # Penalidade pelo deslocamento até a igreja
+
+
+@dataclass
+class ProblemaEscala:
+    id_distrito: str
+    mes: int
+    ano: int
+    igrejas: List[IgrejaPlano]  # Apenas igrejas que ainda não têm escala no mês
+    pregadores: List[MembroPlano]  # Ordenados pela pontuação de pregação
+    cantores: List[MembroPlano] = field(default_factory=list)
+    ocupacao: IndiceOcupacao = field(default_factory=IndiceOcupacao)
+    indisponiveis: Set[Tuple[str, str]] = field(default_factory=set)  # (id_usuario, data)
+    coordenadas: Dict[str, Tuple[float, float]] = field(default_factory=dict)  # Todas as igrejas do distrito
+    pesos: PesosOtimizacao = field(default_factory=PesosOtimizacao)
+    cantores_por_culto: int = 1
+
+    def livre(self, id_membro: str, data: str) -> bool:
+        return (id_membro, data) not in self.indisponiveis and not self.ocupacao.ocupado(id_membro, data)
+
+
+@dataclass
+class ItemPlanejado:
+    id_igreja: str
+    data: str
+    horario: str
+    id_pregador: Optional[str] = None
+    ids_cantores: List[str] = field(default_factory=list)
+    id: str = field(default_factory=gerar_uuid)
+
+
+def cultos_do_mes(igreja: IgrejaPlano, ano: int, mes: int) -> List[Tuple[str, str]]:
+    """Lista (data, horário) de cada dia do mês em que a igreja tem culto."""
+    horarios_culto = igreja.horarios_culto or []
+    if not horarios_culto:
+        return []
+    cultos = []
+    _, num_dias = calendar.monthrange(ano, mes)
+    for dia in range(1, num_dias + 1):
+        date_obj = date(ano, mes, dia)
+        dia_semana = date_obj.strftime('%A').lower()
+        dia_semana_pt = DIAS_SEMANA_PT.get(dia_semana, dia_semana)
+        for horario in horarios_culto:
+            if horario.get('dia_semana', '').lower() in [dia_semana, dia_semana_pt]:
+                cultos.append((date_obj.strftime('%Y-%m-%d'), horario.get('horario', '')))
+                break
+    return cultos
+
+
+def resolver_round_robin(problema: ProblemaEscala) -> List[ItemPlanejado]:
+    """Rodízio pela ordem de pontuação, pulando quem está indisponível ou já escalado."""
+    pregadores = problema.pregadores
+    itens = []
+    for igreja in problema.igrejas:
+        pregador_index = 0
+        for data_str, horario in cultos_do_mes(igreja, problema.ano, problema.mes):
+            pregador = None
+            tentativas = 0
+            while tentativas < len(pregadores):
+                candidato = pregadores[pregador_index % len(pregadores)]
+                pregador_index += 1
+                tentativas += 1
+                if problema.livre(candidato.id, data_str):
+                    pregador = candidato
+                    break
+            if pregador:
+                item = ItemPlanejado(id_igreja=igreja.id, data=data_str, horario=horario, id_pregador=pregador.id)
+                problema.ocupacao.adicionar_item(item.id, item.data, item.id_pregador, item.ids_cantores)
+                itens.append(item)
+    return itens
+
+
+def distancias_km(origens: np.ndarray, destino: Tuple[float, float]) -> np.ndarray:
+    """Distância haversine de cada origem (lat, lon) até o destino; 0 quando desconhecida."""
+    if destino is None or len(origens) == 0:
+        return np.zeros(len(origens))
+    lat1, lon1 = np.radians(origens[:, 0]), np.radians(origens[:, 1])
+    lat2, lon2 = np.radians(destino[0]), np.radians(destino[1])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return np.nan_to_num(2 * 6371.0 * np.arcsin(np.sqrt(a)), nan=0.0)
+
+
+def _casas(problema: ProblemaEscala, membros: List[MembroPlano]) -> np.ndarray:
+    return np.array([problema.coordenadas.get(m.id_igreja, (np.nan, np.nan)) for m in membros], dtype=float).reshape(-1, 2)
+
+
+def _distancia_maxima(problema: ProblemaEscala) -> float:
+    pontos = np.array(list(problema.coordenadas.values()), dtype=float).reshape(-1, 2)
+    maxima = max((distancias_km(pontos, tuple(ponto)).max() for ponto in pontos), default=0.0)
+    return maxima or 1.0
+
+
+def _atribuir(problema: ProblemaEscala, data: str, destinos: List[str], membros: List[MembroPlano], base: np.ndarray, aparicoes: np.ndarray, esperado: float, casas: np.ndarray, distancia_maxima: float) -> np.ndarray:
+    """Resolve uma rodada de atribuição para os destinos (ids de igreja) de uma data."""
+    pesos = problema.pesos
+    viavel = np.array([problema.livre(m.id, data) for m in membros], dtype=bool)
+    custo_membro = base + pesos.equilibrio * aparicoes / esperado
+    custo = np.empty((len(destinos), len(membros)))
+    for linha, id_igreja in enumerate(destinos):
+        custo[linha] = custo_membro + pesos.distancia * distancias_km(casas, problema.coordenadas.get(id_igreja)) / distancia_maxima
+    custo[:, ~viavel] = CUSTO_PROIBIDO
+    return atribuicao_custo_minimo(custo)
+
+
+def resolver_otimizado(problema: ProblemaEscala) -> List[ItemPlanejado]:
+    """Atribuição de custo mínimo por data ponderando pontuação, equilíbrio e distância.
+
+    Também preenche `ids_cantores` com `cantores_por_culto` cantores por culto.
+    """
+    pregadores, cantores = problema.pregadores, problema.cantores
+    por_data = defaultdict(list)
+    for igreja in problema.igrejas:
+        for data_str, horario in cultos_do_mes(igreja, problema.ano, problema.mes):
+            por_data[data_str].append((igreja.id, horario))
+    total_cultos = sum(len(cultos) for cultos in por_data.values())
+    distancia_maxima = _distancia_maxima(problema)
+
+    base_pregadores = problema.pesos.pontuacao * (1 - np.array([p.pontuacao_pregacao for p in pregadores], dtype=float) / 100)
+    base_cantores = problema.pesos.pontuacao * (1 - np.array([c.pontuacao_canto for c in cantores], dtype=float) / 100)
+    aparicoes_pregadores = np.zeros(len(pregadores))
+    aparicoes_cantores = np.zeros(len(cantores))
+    esperado_pregadores = max(1.0, total_cultos / max(1, len(pregadores)))
+    esperado_cantores = max(1.0, total_cultos * problema.cantores_por_culto / max(1, len(cantores)))
+    casas_pregadores, casas_cantores = _casas(problema, pregadores), _casas(problema, cantores)
+
+    itens = []
+    for data_str in sorted(por_data):
+        cultos = por_data[data_str]
+        escolhidos = _atribuir(problema, data_str, [id_igreja for id_igreja, _ in cultos], pregadores, base_pregadores, aparicoes_pregadores, esperado_pregadores, casas_pregadores, distancia_maxima)
+        itens_dia = []
+        for (id_igreja, horario), coluna in zip(cultos, escolhidos):
+            if coluna < 0:
+                continue
+            item = ItemPlanejado(id_igreja=id_igreja, data=data_str, horario=horario, id_pregador=pregadores[coluna].id)
+            aparicoes_pregadores[coluna] += 1
+            problema.ocupacao.adicionar(item.id_pregador, data_str, item.id)
+            itens_dia.append(item)
+        if cantores and problema.cantores_por_culto > 0 and itens_dia:
+            vagas = [item for item in itens_dia for _ in range(problema.cantores_por_culto)]
+            escolhidos = _atribuir(problema, data_str, [item.id_igreja for item in vagas], cantores, base_cantores, aparicoes_cantores, esperado_cantores, casas_cantores, distancia_maxima)
+            for item, coluna in zip(vagas, escolhidos):
+                if coluna < 0:
+                    continue
+                item.ids_cantores.append(cantores[coluna].id)
+                aparicoes_cantores[coluna] += 1
+                problema.ocupacao.adicionar(cantores[coluna].id, data_str, item.id)
+        itens.extend(itens_dia)
+    return itens
+
+
+def avaliar_plano(problema: ProblemaEscala, itens: List[ItemPlanejado]) -> Dict[str, float]:
+    """Métricas de qualidade de um plano, usadas para comparar os solvers."""
+    total_cultos = sum(len(cultos_do_mes(igreja, problema.ano, problema.mes)) for igreja in problema.igrejas)
+    pontuacoes = {p.id: p.pontuacao_pregacao for p in problema.pregadores}
+    igreja_de = {m.id: m.id_igreja for m in problema.pregadores + problema.cantores}
+    aparicoes = defaultdict(int)
+    distancia_total = 0.0
+    vagas = defaultdict(int)
+    for item in itens:
+        destino = problema.coordenadas.get(item.id_igreja)
+        for id_membro in [item.id_pregador] + list(item.ids_cantores):
+            vagas[(id_membro, item.data)] += 1
+            origem = problema.coordenadas.get(igreja_de.get(id_membro))
+            if origem is not None:
+                distancia_total += float(distancias_km(np.array([origem], dtype=float), destino)[0])
+        aparicoes[item.id_pregador] += 1
+    contagens = np.array([aparicoes.get(p.id, 0) for p in problema.pregadores], dtype=float)
+    return {
+        'cultos': total_cultos,
+        'taxa_preenchimento': len(itens) / total_cultos if total_cultos else 1.0,
+        'pontuacao_media': float(np.mean([pontuacoes[item.id_pregador] for item in itens])) if itens else 0.0,
+        'desvio_aparicoes': float(contagens.std()) if len(contagens) else 0.0,
+        'max_aparicoes': int(contagens.max()) if len(contagens) else 0,
+        'distancia_total_km': round(distancia_total, 1),
+        'cantores_por_culto': sum(len(item.ids_cantores) for item in itens) / len(itens) if itens else 0.0,
+        'conflitos': sum(1 for n in vagas.values() if n > 1),
+    }
+
+
+SOLVERS: Dict[str, Callable[[ProblemaEscala], List[ItemPlanejado]]] = {
+    'round_robin': resolver_round_robin,
+    'otimizado': resolver_otimizado,
+}
+
+
+def resolver(problema: ProblemaEscala, modo: str = 'round_robin') -> List[ItemPlanejado]:
+    if modo not in SOLVERS:
+        raise ValueError(f"Unknown solver mode: {modo}")
+    return SOLVERS[modo](problema)
+
+
+def carregar_problema(db: Session, id_distrito: str, mes: int, ano: int) -> ProblemaEscala:
+    """Lê tudo o que o planejador precisa para o distrito/mês em cinco consultas."""
+    igrejas = db.query(Igreja).filter(Igreja.id_distrito == id_distrito, Igreja.ativo == True).all()
+    ids_igrejas = [igreja.id for igreja in igrejas]
+    com_escala = set()
+    if ids_igrejas:
+        com_escala = {id_igreja for (id_igreja,) in db.query(Escala.id_igreja).filter(Escala.id_igreja.in_(ids_igrejas), Escala.mes == mes, Escala.ano == ano).all()}
+    membros = db.query(Usuario).filter(Usuario.id_distrito == id_distrito, Usuario.ativo == True, or_(Usuario.eh_pregador == True, Usuario.eh_cantor == True)).order_by(Usuario.pontuacao_pregacao.desc()).all()
+    _, num_dias = calendar.monthrange(ano, mes)
+    datas = [f"{ano:04d}-{mes:02d}-{dia:02d}" for dia in range(1, num_dias + 1)]
+    ocupacao = carregar_ocupacao(db, datas, [m.id for m in membros])
+    indisponiveis = carregar_indisponiveis(db, [m.id for m in membros], datas)
+    planos = [MembroPlano(id=m.id, id_igreja=m.id_igreja, eh_pregador=bool(m.eh_pregador), eh_cantor=bool(m.eh_cantor), pontuacao_pregacao=m.pontuacao_pregacao if m.pontuacao_pregacao is not None else 50.0, pontuacao_canto=m.pontuacao_canto if m.pontuacao_canto is not None else 50.0) for m in membros]
+    return ProblemaEscala(
+        id_distrito=id_distrito,
+        mes=mes,
+        ano=ano,
+        igrejas=[IgrejaPlano(id=i.id, nome=i.nome, horarios_culto=list(i.horarios_culto or []), latitude=i.latitude, longitude=i.longitude) for i in igrejas if i.id not in com_escala],
+        pregadores=[p for p in planos if p.eh_pregador],
+        cantores=sorted((p for p in planos if p.eh_cantor), key=lambda p: p.pontuacao_canto, reverse=True),
+        ocupacao=ocupacao,
+        indisponiveis=indisponiveis,
+        coordenadas={i.id: (i.latitude, i.longitude) for i in igrejas if i.latitude is not None and i.longitude is not None},
+    )
+
+
+def gravar_plano(db: Session, problema: ProblemaEscala, itens: List[ItemPlanejado], id_gerado_por: Optional[str]) -> List[str]:
+    """Insere escalas e itens planejados em lote; não faz commit.
+
+    Retorna os ids das escalas das igrejas que têm horários de culto.
+    """
+    escalas = {igreja.id: gerar_uuid() for igreja in problema.igrejas}
+    if escalas:
+        db.execute(insert(Escala), [{'id': id_escala, 'mes': problema.mes, 'ano': problema.ano, 'id_igreja': id_igreja, 'id_distrito': problema.id_distrito, 'id_gerado_por': id_gerado_por, 'modo_geracao': 'automatico', 'status': 'rascunho'} for id_igreja, id_escala in escalas.items()])
+    if itens:
+        db.execute(insert(ItemEscala), [{'id': item.id, 'id_escala': escalas[item.id_igreja], 'data': item.data, 'horario': item.horario, 'id_pregador': item.id_pregador, 'ids_cantores': list(item.ids_cantores), 'status': 'pendente'} for item in itens])
+        # O insert em lote não passa pelo before_flush, então as atribuições são gravadas aqui
+        atribuicoes = [{'id': gerar_uuid(), 'id_item_escala': item.id, 'id_usuario': id_usuario, 'papel': papel, 'data': item.data} for item in itens for id_usuario, papel in atribuicoes_do_item(item.id_pregador, item.ids_cantores)]
+        if atribuicoes:
+            db.execute(insert(Atribuicao), atribuicoes)
+    return [escalas[igreja.id] for igreja in problema.igrejas if igreja.horarios_culto]
@@ -0,0 +1,163 @@
+"""
+Middleware de perfil das requisições
+
+`MiddlewarePerfil` (ASGI puro) envolve cada requisição HTTP:
+
+- Abre o contador de consultas (metrics.py), que soma os comandos SQL e o
+  tempo gasto neles; devolve o total no cabeçalho `X-Query-Count`.
+- Registra, por rota (método + caminho da rota, ex. `/api/schedules/{schedule_id}`),
+  status, duração, consultas, tempo no banco, tempo fora dele e bytes do corpo.
+- Orçamento de consultas: rotas marcadas com `@orcamento_consultas(n)` que
+  passarem de n comandos geram um aviso no log e contam em
+  `query_budget_exceeded_total`. Com `QUERY_BUDGET_STRICT=1` (testes e
+  benchmarks) a resposta vira um 500, para um N+1 novo não passar despercebido.
+- Requisições lentas: com `PROFILE_SLOW_MS` > 0, uma fração
+  (`PROFILE_SAMPLE_RATE`) das requisições roda sob um profiler, e o relatório
+  é guardado (os últimos `PROFILE_KEEP`) quando a requisição passa do limite.
+  Usa o pyinstrument, se instalado, que acompanha só a tarefa da requisição;
+  senão o cProfile, uma requisição por vez e vendo tudo o que roda na thread
+  do event loop nesse intervalo.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import metrics
+
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT', 'false').strip().lower() in ('1', 'true', 'sim', 'yes', 'on')
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', 0))
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 1.0))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 20))
+
+_perfis: deque = deque(maxlen=PROFILE_KEEP)
+
+
+def orcamento_consultas(maximo: int):
+    """Declara quantos comandos SQL a rota pode executar por requisição."""
+    def decorar(funcao):
+        funcao.orcamento_consultas = maximo
+        return funcao
+    return decorar
+
+
+def perfis_lentos() -> List[Dict]:
+    return list(_perfis)
+
+
+class _PerfilCProfile:
+    ativo = False  # o cProfile só aceita um perfil por vez
+
+    def __init__(self):
+        self._perfil = cProfile.Profile()
+
+    def iniciar(self) -> bool:
+        if _PerfilCProfile.ativo:
+            return False
+        _PerfilCProfile.ativo = True
+        self._perfil.enable()
+        return True
+
+    def parar(self):
+        self._perfil.disable()
+        _PerfilCProfile.ativo = False
+
+    def relatorio(self) -> str:
+        saida = io.StringIO()
+        pstats.Stats(self._perfil, stream=saida).sort_stats('cumulative').print_stats(40)
+        return saida.getvalue()
+
+
+class _PerfilPyinstrument:
+    def __init__(self):
+        self._perfil = Profiler(async_mode='enabled')
+
+    def iniciar(self) -> bool:
+        self._perfil.start()
+        return True
+
+    def parar(self):
+        self._perfil.stop()
+
+    def relatorio(self) -> str:
+        return self._perfil.output_text(unicode=True)
+
+
+def _novo_perfil():
+    if PROFILE_SLOW_MS <= 0 or random.random() >= PROFILE_SAMPLE_RATE:
+        return None
+    perfil = _PerfilPyinstrument() if Profiler is not None else _PerfilCProfile()
+    return perfil if perfil.iniciar() else None
+
+
+class MiddlewarePerfil:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        contador, token = metrics.iniciar_contagem()
+        perfil = _novo_perfil()
+        inicio = time.perf_counter()
+        estado = {'status': 500, 'bytes': 0, 'descartar': False}
+
+        def excedeu_orcamento() -> bool:
+            maximo = getattr(scope.get('endpoint'), 'orcamento_consultas', None)
+            return maximo is not None and contador.consultas > maximo
+
+        async def enviar(mensagem):
+            if estado['descartar']:
+                return
+            if mensagem['type'] == 'http.response.start':
+                if QUERY_BUDGET_STRICT and excedeu_orcamento():
+                    # O handler já terminou: troca a resposta pelo erro e ignora o resto
+                    estado['descartar'] = True
+                    corpo = json.dumps({"detail": f"Query budget exceeded: {contador.consultas} statements, budget {scope['endpoint'].orcamento_consultas}"}).encode()
+                    estado['status'], estado['bytes'] = 500, len(corpo)
+                    await send({'type': 'http.response.start', 'status': 500, 'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(corpo)).encode()), (b'x-query-count', str(contador.consultas).encode())]})
+                    await send({'type': 'http.response.body', 'body': corpo})
+                    return
+                estado['status'] = mensagem['status']
+                mensagem = {**mensagem, 'headers': [*mensagem.get('headers', []), (b'x-query-count', str(contador.consultas).encode())]}
+            elif mensagem['type'] == 'http.response.body':
+                estado['bytes'] += len(mensagem.get('body', b''))
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            if perfil is not None:
+                perfil.parar()
+            metrics.encerrar_contagem(contador, token, duracao_ms)
+            rota = getattr(scope.get('route'), 'path', None) or 'nao_encontrada'
+            excedeu = excedeu_orcamento()
+            metrics.metricas_rota(scope['method'], rota).registrar(estado['status'], duracao_ms, contador.consultas, contador.tempo_banco_ms, estado['bytes'], excedeu)
+            if excedeu:
+                logger.warning(f"{scope['method']} {rota} executou {contador.consultas} comandos SQL (orçamento: {scope['endpoint'].orcamento_consultas})")
+            if perfil is not None and duracao_ms >= PROFILE_SLOW_MS:
+                _perfis.append({
+                    "rota": f"{scope['method']} {rota}",
+                    "caminho": scope['path'],
+                    "duracao_ms": round(duracao_ms, 1),
+                    "consultas": contador.consultas,
+                    "tempo_banco_ms": round(contador.tempo_banco_ms, 1),
+                    "capturado_em": datetime.now(timezone.utc).isoformat(),
+                    "relatorio": perfil.relatorio(),
+                })
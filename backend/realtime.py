@@ -0,0 +1,95 @@
+"""
+Entrega em tempo real de notificações (Server-Sent Events)
+
+Cada notificação inserida dispara um `pg_notify('notificacoes', ...)` pelo
+gatilho da tabela (ver models.GATILHOS_NOTIFICACOES), com o registro em JSON.
+Cada processo da API mantém uma única conexão asyncpg em LISTEN nesse canal
+e repassa o evento para as filas dos clientes conectados daquele usuário; como
+o aviso sai no commit, notificações gravadas por outro processo (jobs,
+scripts, outros workers do uvicorn) também chegam.
+
+A conexão de LISTEN é aberta na primeira inscrição e fica fora do pool.
+Atrás do pgbouncer em modo transação o LISTEN não funciona: defina
+`NOTIFY_DATABASE_URL` apontando direto para o PostgreSQL.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from database import ASYNC_DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+CANAL = 'notificacoes'
+NOTIFY_DATABASE_URL = os.environ.get('NOTIFY_DATABASE_URL') or make_url(ASYNC_DATABASE_URL).set(drivername='postgresql').render_as_string(hide_password=False)
+
+
+class Difusor:
+    """Distribui os eventos do canal para as filas dos clientes, por usuário."""
+
+    def __init__(self, dsn: str, tamanho_fila: int = 100):
+        self.dsn = dsn
+        self.tamanho_fila = tamanho_fila
+        self._filas: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._conexao: Optional[asyncpg.Connection] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def conectados(self) -> int:
+        return sum(len(filas) for filas in self._filas.values())
+
+    async def garantir_conexao(self):
+        async with self._lock:
+            if self._conexao is not None and not self._conexao.is_closed():
+                return
+            self._conexao = await asyncpg.connect(self.dsn)
+            await self._conexao.add_listener(CANAL, self._ao_receber)
+            self._conexao.add_termination_listener(self._ao_perder_conexao)
+
+    def _ao_perder_conexao(self, conexao):
+        logger.warning("Conexão de LISTEN das notificações encerrada; será reaberta")
+        self._conexao = None
+
+    def _ao_receber(self, conexao, pid, canal, carga: str):
+        try:
+            evento = json.loads(carga)
+        except ValueError:
+            return
+        for fila in list(self._filas.get(evento.get('id_usuario'), ())):
+            if fila.full():  # cliente lento: descarta o evento mais antigo
+                fila.get_nowait()
+            fila.put_nowait(evento)
+
+    async def inscrever(self, id_usuario: str) -> asyncio.Queue:
+        await self.garantir_conexao()
+        fila = asyncio.Queue(maxsize=self.tamanho_fila)
+        self._filas[id_usuario].add(fila)
+        return fila
+
+    def cancelar(self, id_usuario: str, fila: asyncio.Queue):
+        filas = self._filas.get(id_usuario)
+        if filas is not None:
+            filas.discard(fila)
+            if not filas:
+                del self._filas[id_usuario]
+
+    async def fechar(self):
+        if self._conexao is not None and not self._conexao.is_closed():
+            self._conexao.remove_termination_listener(self._ao_perder_conexao)
+            await self._conexao.close()
+        self._conexao = None
+
+
+difusor = Difusor(NOTIFY_DATABASE_URL)
+
+
+def formatar_evento(evento: str, dados: dict, id_evento: Optional[str] = None) -> str:
+    linhas = [f"id: {id_evento}"] if id_evento else []
+    linhas += [f"event: {evento}", f"data: {json.dumps(dados, default=str)}"]
+    return "\n".join(linhas) + "\n\n"
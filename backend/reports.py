@@ -0,0 +1,175 @@
+"""
+Relatórios de analytics com pandas
+
+Cada relatório carrega o período do distrito em poucas consultas em lote
+(itens, atribuições, avaliações, usuários e igrejas) direto para DataFrames
+e calcula tudo com operações vetorizadas, sem laços por linha:
+
+- participacao: itens por membro e papel, por status, e taxas de confirmação
+  e de recusa.
+- latencia_confirmacao: horas entre a criação do item e a confirmação, por
+  pregador e no geral (média, mediana e p90).
+- distribuicao_notas: histograma das notas por tipo de membro e média/desvio
+  por membro avaliado.
+- cobertura: matriz igreja x mês com a fração dos itens que têm pregador e
+  não foram recusados nem cancelados.
+
+O cálculo roda fora do event loop (`run_in_threadpool`) e o resultado fica em
+cache por (distrito, período). A chave inclui a versão do resumo do distrito
+(ver analytics.py), então qualquer escrita que marque o resumo como
+desatualizado também invalida os relatórios daquele distrito; a primeira
+leitura da nova versão descarta as entradas das versões anteriores.
+"""
+import json
+import os
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from analytics import obter_resumo
+from cache import CacheTTL
+from metrics import registrar_cache
+from models import Atribuicao, Avaliacao, Escala, Igreja, ItemEscala, Usuario
+
+REPORT_CACHE_TTL = float(os.environ.get('REPORT_CACHE_TTL', 600))
+REPORT_CACHE_SIZE = int(os.environ.get('REPORT_CACHE_SIZE', 128))
+
+STATUS_ITEM = ['pendente', 'confirmado', 'recusado', 'cancelado', 'completado']
+NOTAS = [1, 2, 3, 4, 5]
+
+_relatorios = registrar_cache('relatorios', CacheTTL(max_itens=REPORT_CACHE_SIZE, ttl=REPORT_CACHE_TTL))
+
+
+@dataclass
+class DadosRelatorio:
+    itens: pd.DataFrame
+    atribuicoes: pd.DataFrame
+    avaliacoes: pd.DataFrame
+    usuarios: pd.DataFrame
+    igrejas: pd.DataFrame
+
+
+def _quadro(db: Session, consulta) -> pd.DataFrame:
+    resultado = db.execute(consulta)
+    return pd.DataFrame.from_records(resultado.all(), columns=list(resultado.keys()))
+
+
+def carregar_dados(db: Session, id_distrito: str, data_inicio: Optional[str] = None, data_fim: Optional[str] = None) -> DadosRelatorio:
+    """Itens (por `data`) e avaliações (por `criado_em`) do período [data_inicio, data_fim)."""
+    itens = select(ItemEscala.id, Escala.id_igreja, ItemEscala.data, ItemEscala.status, ItemEscala.id_pregador, ItemEscala.criado_em, ItemEscala.confirmado_em).join(Escala, Escala.id == ItemEscala.id_escala).where(Escala.id_distrito == id_distrito)
+    atribuicoes = select(Atribuicao.id_usuario, Atribuicao.papel, ItemEscala.status).join(ItemEscala, ItemEscala.id == Atribuicao.id_item_escala).join(Escala, Escala.id == ItemEscala.id_escala).where(Escala.id_distrito == id_distrito)
+    avaliacoes = select(Avaliacao.id_usuario_avaliado, Avaliacao.tipo_membro, Avaliacao.nota).join(Igreja, Igreja.id == Avaliacao.id_igreja).where(Igreja.id_distrito == id_distrito)
+    if data_inicio:
+        itens = itens.where(ItemEscala.data >= data_inicio)
+        atribuicoes = atribuicoes.where(Atribuicao.data >= data_inicio)
+        avaliacoes = avaliacoes.where(Avaliacao.criado_em >= date.fromisoformat(data_inicio))
+    if data_fim:
+        itens = itens.where(ItemEscala.data < data_fim)
+        atribuicoes = atribuicoes.where(Atribuicao.data < data_fim)
+        avaliacoes = avaliacoes.where(Avaliacao.criado_em < date.fromisoformat(data_fim))
+    return DadosRelatorio(
+        itens=_quadro(db, itens),
+        atribuicoes=_quadro(db, atribuicoes),
+        avaliacoes=_quadro(db, avaliacoes),
+        usuarios=_quadro(db, select(Usuario.id, Usuario.nome_completo).where(Usuario.id_distrito == id_distrito)),
+        igrejas=_quadro(db, select(Igreja.id, Igreja.nome).where(Igreja.id_distrito == id_distrito, Igreja.ativo == True).order_by(Igreja.nome)),
+    )
+
+
+def _registros(quadro: pd.DataFrame) -> list:
+    # to_json converte os tipos do NumPy e troca NaN por null
+    return json.loads(quadro.to_json(orient='records', double_precision=4))
+
+
+def _com_nomes(quadro: pd.DataFrame, usuarios: pd.DataFrame, coluna: str) -> pd.DataFrame:
+    nomes = usuarios.set_index('id')['nome_completo']
+    return quadro.assign(nome_completo=quadro[coluna].map(nomes))
+
+
+def participacao(dados: DadosRelatorio) -> list:
+    atribuicoes = dados.atribuicoes
+    if atribuicoes.empty:
+        return []
+    contagem = pd.crosstab([atribuicoes['id_usuario'], atribuicoes['papel']], atribuicoes['status']).reindex(columns=STATUS_ITEM, fill_value=0)
+    contagem['total'] = contagem.sum(axis=1)
+    contagem['taxa_confirmacao'] = (contagem['confirmado'] + contagem['completado']) / contagem['total']
+    contagem['taxa_recusa'] = contagem['recusado'] / contagem['total']
+    contagem = contagem.reset_index().sort_values(['total', 'id_usuario'], ascending=[False, True])
+    return _registros(_com_nomes(contagem, dados.usuarios, 'id_usuario'))
+
+
+def latencia_confirmacao(dados: DadosRelatorio) -> Dict:
+    itens = dados.itens.dropna(subset=['confirmado_em', 'id_pregador'])
+    horas = (pd.to_datetime(itens['confirmado_em'], utc=True) - pd.to_datetime(itens['criado_em'], utc=True)).dt.total_seconds() / 3600
+    geral = {'confirmados': int(horas.count()), 'media_horas': None, 'mediana_horas': None, 'p90_horas': None}
+    if horas.empty:
+        return {'geral': geral, 'por_pregador': []}
+    geral.update(media_horas=round(float(horas.mean()), 4), mediana_horas=round(float(horas.median()), 4), p90_horas=round(float(horas.quantile(0.9)), 4))
+    grupos = horas.groupby(itens['id_pregador'])
+    por_pregador = pd.DataFrame({'confirmados': grupos.count(), 'media_horas': grupos.mean(), 'mediana_horas': grupos.median(), 'p90_horas': grupos.quantile(0.9)})
+    por_pregador = por_pregador.rename_axis('id_pregador').reset_index().sort_values('media_horas')
+    return {'geral': geral, 'por_pregador': _registros(_com_nomes(por_pregador, dados.usuarios, 'id_pregador'))}
+
+
+def distribuicao_notas(dados: DadosRelatorio) -> Dict:
+    avaliacoes = dados.avaliacoes
+    if avaliacoes.empty:
+        return {'histograma': {}, 'por_membro': []}
+    histograma = pd.crosstab(avaliacoes['tipo_membro'], avaliacoes['nota']).reindex(columns=NOTAS, fill_value=0)
+    por_membro = avaliacoes.groupby(['id_usuario_avaliado', 'tipo_membro'])['nota'].agg(total='count', media='mean', desvio_padrao='std').reset_index()
+    por_membro = por_membro.sort_values(['media', 'total'], ascending=False)
+    return {
+        'histograma': {tipo: {str(nota): int(total) for nota, total in linha.items()} for tipo, linha in histograma.iterrows()},
+        'por_membro': _registros(_com_nomes(por_membro, dados.usuarios, 'id_usuario_avaliado')),
+    }
+
+
+def cobertura(dados: DadosRelatorio) -> Dict:
+    itens = dados.itens
+    if itens.empty:
+        return {'meses': [], 'igrejas': _registros(dados.igrejas), 'valores': [[] for _ in range(len(dados.igrejas))]}
+    coberto = itens['id_pregador'].notna() & ~itens['status'].isin(['recusado', 'cancelado'])
+    matriz = coberto.groupby([itens['id_igreja'], itens['data'].str[:7]]).mean().unstack()
+    matriz = matriz.reindex(index=dados.igrejas['id'], columns=sorted(matriz.columns))
+    valores = np.round(matriz.to_numpy(dtype=float), 4)
+    # None: igreja sem itens no mês
+    return {
+        'meses': list(matriz.columns),
+        'igrejas': _registros(dados.igrejas),
+        'valores': [[None if np.isnan(valor) else float(valor) for valor in linha] for linha in valores],
+    }
+
+
+def calcular(dados: DadosRelatorio) -> Dict:
+    return {
+        'participacao': participacao(dados),
+        'latencia_confirmacao': latencia_confirmacao(dados),
+        'distribuicao_notas': distribuicao_notas(dados),
+        'cobertura': cobertura(dados),
+    }
+
+
+async def gerar_relatorio(db, id_distrito: str, data_inicio: Optional[str] = None, data_fim: Optional[str] = None) -> Tuple[Optional[Dict], Optional[str]]:
+    """Relatório do distrito no período e seu ETag (AsyncSession); (None, None) se o distrito não existe."""
+    resumo, recalculou = await db.run_sync(obter_resumo, id_distrito)
+    if resumo is None:
+        return None, None
+    versao = resumo.versao
+    if recalculou:
+        await db.commit()
+    chave = (id_distrito, data_inicio, data_fim, versao)
+    etag = f'W/"{id_distrito}-{versao}-{data_inicio or ""}-{data_fim or ""}"'
+    relatorio = _relatorios.obter(chave)
+    if relatorio is None:
+        _relatorios.remover_se(lambda outra, _: outra[0] == id_distrito and outra[3] != versao)
+        geracao = _relatorios.geracao
+        dados = await db.run_sync(carregar_dados, id_distrito, data_inicio, data_fim)
+        relatorio = await run_in_threadpool(calcular, dados)
+        _relatorios.guardar(chave, relatorio, geracao)
+    return relatorio, etag
@@ -0,0 +1,218 @@
+"""
+Cache das respostas das listas de referência
+
+`/districts`, `/churches`, `/users/preachers` e `/users/singers` são pedidas
+em quase toda tela e mudam pouco. A resposta já serializada (JSON) fica em
+cache pela rota e pelo escopo de quem pede (o pastor distrital vê todos os
+distritos, os demais só o próprio), com um ETag do conteúdo:
+`If-None-Match` igual devolve 304 sem tocar no banco nem reenviar o corpo.
+
+Invalidação por namespace: cada lista depende de um namespace ('distritos',
+'igrejas', 'usuarios') com um número de versão que entra na chave. Quando uma
+sessão que alterou Distrito, Igreja ou Usuario (pelo flush ou por escrita em
+lote) faz commit, a versão do namespace é incrementada e as entradas antigas
+simplesmente deixam de ser usadas. Quem altera por SQL direto marca o
+namespace com `marcar_alterado`.
+
+Backends (`RESPONSE_CACHE_BACKEND`):
+
+- 'memoria' (padrão): CacheTTL por processo. Com vários workers, cada um
+  invalida o seu; alterações feitas por outro processo aparecem em até
+  `RESPONSE_CACHE_TTL` segundos.
+- 'redis': servidor Redis (ou compatível) local em `RESPONSE_CACHE_URL`,
+  compartilhado entre os workers, incluindo as versões dos namespaces.
+  Exige o pacote `redis`; sem ele, ou com o servidor fora do ar, a lista é
+  lida do banco normalmente. As rotas usam o cliente assíncrono
+  (`redis.asyncio`), sem bloquear o event loop.
+
+O commit (`after_commit`) é síncrono. Dentro do event loop (sessões
+assíncronas das rotas) o incremento das versões vira uma tarefa, que
+`resposta_cacheada` aguarda antes de ler as versões: o mesmo processo nunca
+serve uma lista anterior à própria escrita. Fora do loop (scripts, jobs em
+threads) o incremento usa um cliente síncrono.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+from itertools import chain
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+from starlette.responses import Response
+
+from cache import CacheTTL
+from metrics import registrar_cache
+from models import Distrito, Igreja, Usuario
+
+try:
+    import redis
+    import redis.asyncio
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memoria')
+RESPONSE_CACHE_URL = os.environ.get('RESPONSE_CACHE_URL', 'redis://localhost:6379/0')
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 512))
+
+NAMESPACES = {Distrito: 'distritos', Igreja: 'igrejas', Usuario: 'usuarios'}
+
+
+class BackendMemoria:
+    def __init__(self, max_itens: int, ttl: float):
+        self._respostas = registrar_cache('respostas', CacheTTL(max_itens=max_itens, ttl=ttl))
+        self._versoes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def versoes(self, namespaces: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._versoes.get(namespace, 0) for namespace in namespaces)
+
+    async def incrementar(self, namespaces: Iterable[str]):
+        self.incrementar_sync(namespaces)
+
+    def incrementar_sync(self, namespaces: Iterable[str]):
+        with self._lock:
+            for namespace in namespaces:
+                self._versoes[namespace] = self._versoes.get(namespace, 0) + 1
+
+    async def obter(self, chave: str) -> Optional[Tuple[str, bytes]]:
+        return self._respostas.obter(chave)
+
+    async def guardar(self, chave: str, etag: str, corpo: bytes):
+        self._respostas.guardar(chave, (etag, corpo))
+
+
+class BackendRedis:
+    """Chaves `respostas:<chave>` (ETag + corpo) e `respostas:versao:<namespace>`."""
+
+    def __init__(self, url: str, ttl: int):
+        self.url = url
+        self.ttl = ttl
+        self._cliente = redis.asyncio.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        self._cliente_sync = None  # criado no primeiro commit fora do event loop
+
+    async def versoes(self, namespaces: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(int(valor or 0) for valor in await self._cliente.mget([f"respostas:versao:{namespace}" for namespace in namespaces]))
+
+    async def incrementar(self, namespaces: Iterable[str]):
+        async with self._cliente.pipeline(transaction=False) as pipe:
+            for namespace in namespaces:
+                pipe.incr(f"respostas:versao:{namespace}")
+            await pipe.execute()
+
+    def incrementar_sync(self, namespaces: Iterable[str]):
+        if self._cliente_sync is None:
+            self._cliente_sync = redis.Redis.from_url(self.url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        with self._cliente_sync.pipeline(transaction=False) as pipe:
+            for namespace in namespaces:
+                pipe.incr(f"respostas:versao:{namespace}")
+            pipe.execute()
+
+    async def obter(self, chave: str) -> Optional[Tuple[str, bytes]]:
+        valor = await self._cliente.get(f"respostas:{chave}")
+        if valor is None:
+            return None
+        etag, _, corpo = valor.partition(b"\n")
+        return etag.decode(), corpo
+
+    async def guardar(self, chave: str, etag: str, corpo: bytes):
+        await self._cliente.set(f"respostas:{chave}", etag.encode() + b"\n" + corpo, ex=self.ttl)
+
+
+def _criar_backend():
+    if RESPONSE_CACHE_BACKEND == 'redis':
+        if redis is not None:
+            return BackendRedis(RESPONSE_CACHE_URL, RESPONSE_CACHE_TTL)
+        logger.warning("RESPONSE_CACHE_BACKEND=redis, mas o pacote redis não está instalado; usando o cache em memória")
+    return BackendMemoria(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+
+
+backend = _criar_backend()
+_erros_backend = (redis.RedisError,) if redis is not None else ()
+_invalidacoes: Set[asyncio.Task] = set()  # incrementos agendados pelos commits no event loop
+
+
+def _cabecalhos(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+async def resposta_cacheada(request: Request, rota: str, escopo: str, namespaces: Tuple[str, ...], carregar: Callable[[], Awaitable[bytes]]) -> Response:
+    """Resposta JSON de `carregar()` em cache por (rota, escopo, versões dos namespaces), com ETag/304."""
+    if _invalidacoes:
+        await asyncio.gather(*_invalidacoes)
+    try:
+        versoes = await backend.versoes(namespaces)
+        chave = f"{rota}:{escopo}:" + ".".join(map(str, versoes))
+        entrada = await backend.obter(chave)
+    except _erros_backend as exc:
+        logger.warning(f"Cache de respostas indisponível: {exc}")
+        chave, entrada = None, None
+    if entrada is None:
+        corpo = await carregar()
+        entrada = (f'W/"{hashlib.blake2b(corpo, digest_size=12).hexdigest()}"', corpo)
+        if chave is not None:
+            try:
+                await backend.guardar(chave, *entrada)
+            except _erros_backend as exc:
+                logger.warning(f"Cache de respostas indisponível: {exc}")
+    etag, corpo = entrada
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers=_cabecalhos(etag))
+    return Response(content=corpo, media_type="application/json", headers=_cabecalhos(etag))
+
+
+def marcar_alterado(session, namespace: str):
+    """Invalida o namespace quando `session` fizer commit."""
+    session.info.setdefault('respostas_alteradas', set()).add(namespace)
+
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_alteracoes(session, flush_context):
+    for obj in chain(session.new, session.dirty, session.deleted):
+        namespace = NAMESPACES.get(type(obj))
+        if namespace is not None and (obj not in session.dirty or session.is_modified(obj)):
+            marcar_alterado(session, namespace)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _registrar_escrita_em_lote(estado):
+    if (estado.is_insert or estado.is_update or estado.is_delete) and estado.bind_mapper is not None and estado.bind_mapper.class_ in NAMESPACES:
+        marcar_alterado(estado.session, NAMESPACES[estado.bind_mapper.class_])
+
+
+async def _incrementar(namespaces: Set[str]):
+    try:
+        await backend.incrementar(namespaces)
+    except _erros_backend as exc:
+        logger.warning(f"Não foi possível invalidar o cache de respostas {sorted(namespaces)}: {exc}")
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar(session):
+    namespaces = session.info.pop('respostas_alteradas', None)
+    if not namespaces:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop is not None:
+        tarefa = loop.create_task(_incrementar(namespaces))
+        _invalidacoes.add(tarefa)
+        tarefa.add_done_callback(_invalidacoes.discard)
+        return
+    try:
+        backend.incrementar_sync(namespaces)
+    except _erros_backend as exc:
+        logger.warning(f"Não foi possível invalidar o cache de respostas {sorted(namespaces)}: {exc}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_alteracoes(session):
+    session.info.pop('respostas_alteradas', None)
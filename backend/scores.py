@@ -0,0 +1,138 @@
+"""
+Pontuação dos membros a partir das avaliações
+
+Cada avaliação atualiza, em um único UPSERT, a linha de `pontuacoes_membro`
+do avaliado (total, soma, soma dos quadrados, janela das últimas notas e a
+média com decaimento exponencial) e em seguida a pontuação em `usuarios`.
+Tudo é calculado no banco, na transação da avaliação: avaliações simultâneas
+do mesmo membro esperam o lock da linha em vez de sobrescrever umas às outras.
+
+A pontuação segue a regra de sempre: cada avaliação soma 2 * (nota - 3) à
+pontuação atual, limitada a [0, 100], no mesmo UPDATE (sem ler o valor em
+Python). A pontuação atual pode não vir das avaliações (valor inicial do
+cadastro, edição em `update_user`, pontuações anteriores aos agregados), então
+ela nunca é refeita só a partir do agregado.
+
+`recalcular_pontuacoes` reconstrói os agregados a partir de `avaliacoes` em um
+único INSERT ... SELECT agregado. Só com `redefinir_pontuacoes=True` (dados
+sintéticos, em que todos partem de 50) as pontuações dos avaliados são
+substituídas por 50 + 2 * Σ(nota - 3).
+"""
+import os
+from typing import Dict
+
+from sqlalchemy import Integer, delete, func, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by, insert
+from sqlalchemy.orm import Session
+
+from auth_cache import marcar_alterado
+from response_cache import marcar_alterado as marcar_respostas_alteradas
+from models import Avaliacao, PontuacaoMembro, Usuario
+
+JANELA_NOTAS = int(os.environ.get('SCORE_WINDOW', 10))
+MEIA_VIDA_DIAS = float(os.environ.get('SCORE_HALF_LIFE_DAYS', 180))
+
+COLUNA_PONTUACAO = {'pregador': 'pontuacao_pregacao', 'cantor': 'pontuacao_canto'}
+
+
+def _limitar(expressao):
+    return func.least(100.0, func.greatest(0.0, expressao))
+
+
+def expressao_pontuacao(total, soma):
+    """Pontuação de quem partiu de 50 e só foi avaliado (ver `recalcular_pontuacoes`)."""
+    return _limitar(50.0 + 2.0 * (soma - 3 * total))
+
+
+def _decaimento(desde, ate):
+    segundos = func.greatest(0.0, func.extract('epoch', ate - desde))
+    return func.power(0.5, segundos / (MEIA_VIDA_DIAS * 86400.0))
+
+
+def comando_registrar(id_usuario: str, tipo_membro: str, nota: int):
+    agregado = PontuacaoMembro.__table__.c
+    comando = insert(PontuacaoMembro).values(
+        id_usuario=id_usuario, tipo_membro=tipo_membro, total_avaliacoes=1, soma_notas=nota, soma_quadrados=nota * nota,
+        ultimas_notas=[nota], soma_ponderada=float(nota), soma_pesos=1.0, ultima_avaliacao_em=func.now(),
+    )
+    novo = comando.excluded
+    fator = _decaimento(func.coalesce(agregado.ultima_avaliacao_em, novo.ultima_avaliacao_em), novo.ultima_avaliacao_em)
+    janela = agregado.ultimas_notas.op('||', return_type=ARRAY(Integer))(novo.ultimas_notas)
+    tamanho = func.cardinality(agregado.ultimas_notas) + 1
+    return comando.on_conflict_do_update(
+        index_elements=['id_usuario', 'tipo_membro'],
+        set_={
+            'total_avaliacoes': agregado.total_avaliacoes + 1,
+            'soma_notas': agregado.soma_notas + novo.soma_notas,
+            'soma_quadrados': agregado.soma_quadrados + novo.soma_quadrados,
+            'ultimas_notas': janela[func.greatest(1, tamanho - JANELA_NOTAS + 1):tamanho],
+            'soma_ponderada': agregado.soma_ponderada * fator + novo.soma_ponderada,
+            'soma_pesos': agregado.soma_pesos * fator + 1.0,
+            'ultima_avaliacao_em': func.greatest(agregado.ultima_avaliacao_em, novo.ultima_avaliacao_em),
+        },
+    )
+
+
+def comando_atualizar_usuario(id_usuario: str, tipo_membro: str, nota: int):
+    # Sobre a tabela (não a entidade): só este usuário sai do cache de autenticação
+    usuarios = Usuario.__table__
+    coluna = usuarios.c[COLUNA_PONTUACAO[tipo_membro]]
+    return update(usuarios).where(usuarios.c.id == id_usuario).values({coluna: _limitar(func.coalesce(coluna, 50.0) + 2.0 * (nota - 3))})
+
+
+async def registrar_avaliacao(db, avaliacao: Avaliacao):
+    """Atualiza o agregado e a pontuação do avaliado na transação corrente (AsyncSession)."""
+    if avaliacao.tipo_membro not in COLUNA_PONTUACAO:
+        return
+    await db.execute(comando_registrar(avaliacao.id_usuario_avaliado, avaliacao.tipo_membro, avaliacao.nota))
+    await db.execute(comando_atualizar_usuario(avaliacao.id_usuario_avaliado, avaliacao.tipo_membro, avaliacao.nota))
+    marcar_alterado(db.sync_session, avaliacao.id_usuario_avaliado)
+    marcar_respostas_alteradas(db.sync_session, 'usuarios')
+
+
+def recalcular_pontuacoes(db: Session, redefinir_pontuacoes: bool = False) -> Dict[str, int]:
+    """Reconstrói `pontuacoes_membro` a partir de `avaliacoes`.
+
+    Com `redefinir_pontuacoes`, também substitui as pontuações dos usuários
+    avaliados por 50 + 2 * Σ(nota - 3), descartando a pontuação atual; devolve
+    quantos usuários foram atualizados por tipo de membro.
+    """
+    chave = (Avaliacao.id_usuario_avaliado, Avaliacao.tipo_membro)
+    base = select(
+        Avaliacao.id_usuario_avaliado.label('id_usuario'),
+        Avaliacao.tipo_membro,
+        Avaliacao.nota,
+        Avaliacao.criado_em,
+        func.max(Avaliacao.criado_em).over(partition_by=chave).label('ultima'),
+        func.row_number().over(partition_by=chave, order_by=(Avaliacao.criado_em.desc(), Avaliacao.id.desc())).label('ordem'),
+    ).where(Avaliacao.tipo_membro.in_(list(COLUNA_PONTUACAO))).subquery()
+    peso = _decaimento(base.c.criado_em, base.c.ultima)
+    agregados = select(
+        base.c.id_usuario,
+        base.c.tipo_membro,
+        func.count(),
+        func.sum(base.c.nota),
+        func.sum(base.c.nota * base.c.nota),
+        func.array_agg(aggregate_order_by(base.c.nota, base.c.ordem.desc())).filter(base.c.ordem <= JANELA_NOTAS),
+        func.sum(base.c.nota * peso),
+        func.sum(peso),
+        func.max(base.c.criado_em),
+    ).group_by(base.c.id_usuario, base.c.tipo_membro)
+
+    db.execute(delete(PontuacaoMembro))
+    db.execute(insert(PontuacaoMembro).from_select(
+        ['id_usuario', 'tipo_membro', 'total_avaliacoes', 'soma_notas', 'soma_quadrados', 'ultimas_notas', 'soma_ponderada', 'soma_pesos', 'ultima_avaliacao_em'],
+        agregados,
+    ))
+    atualizados = {tipo_membro: 0 for tipo_membro in COLUNA_PONTUACAO}
+    if not redefinir_pontuacoes:
+        return atualizados
+    for tipo_membro, coluna in COLUNA_PONTUACAO.items():
+        resultado = db.execute(
+            update(Usuario)
+            .where(Usuario.id == PontuacaoMembro.id_usuario, PontuacaoMembro.tipo_membro == tipo_membro)
+            .values({coluna: expressao_pontuacao(PontuacaoMembro.total_avaliacoes, PontuacaoMembro.soma_notas)})
+            .execution_options(synchronize_session=False)
+        )
+        atualizados[tipo_membro] = resultado.rowcount
+    return atualizados
@@ -1,22 +1,44 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, File, Form, Query, Request, Response, UploadFile, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, tuple_, select, func, insert, update, delete
 import os
+import asyncio
+import base64
 import logging
+import time
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, TypeAdapter
 from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
-from passlib.context import CryptContext
 import calendar
 
-from database import get_db
-from models import Usuario, Distrito, Igreja, Escala, ItemEscala, Avaliacao, Notificacao, SolicitacaoTroca, Delegacao
+from database import AsyncSessionLocal, SessionLocal, get_db
+from models import Usuario, Distrito, Igreja, Escala, ItemEscala, Atribuicao, Avaliacao, Notificacao, SolicitacaoTroca, Delegacao, PontuacaoMembro, gerar_uuid
+from occupancy import STATUS_ITEM_OCUPA, IndiceOcupacao, carregar_ocupacao
+from availability import LEGENDA, carregar_indisponiveis, disponibilidade_do_mes
+from planner import SOLVERS, carregar_problema, resolver, gravar_plano
+from jobs import JobGeracao, encerrar_pool, iniciar_job, obter_job, meses_no_intervalo
+from exports import FORMATOS, exportar, consulta_itens_escala, consulta_avaliacoes
+from imports import ErroImportacao, formato_do_arquivo, importar_usuarios
+from passwords import gerar_hash, verificar_senha
+from outbox import enfileirar
+from realtime import difusor, formatar_evento
+from scores import registrar_avaliacao
+from analytics import painel
+from reports import gerar_relatorio
+from auth_cache import decodificar_token, carregar_usuario_ativo
+import metrics
+from profiling import MiddlewarePerfil, orcamento_consultas, perfis_lentos
+from response_cache import resposta_cacheada
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -24,13 +46,17 @@ load_dotenv(ROOT_DIR / '.env')
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'postgres')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7
+STREAM_TOKEN_EXPIRE_SECONDS = int(os.environ.get('STREAM_TOKEN_EXPIRE_SECONDS', 60))
+ESCOPO_STREAM = 'notifications_stream'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # se definido, exigido em GET /metrics
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
 app = FastAPI(title="Sistema de Escalas Distritais")
 api_router = APIRouter(prefix="/api")
 
+app.add_middleware(MiddlewarePerfil)
+
 # Pydantic Models
 class HorarioCulto(BaseModel):
     dia_semana: str
@@ -140,6 +166,22 @@ class EscalaResponse(BaseModel):
     criado_em: datetime
     atualizado_em: datetime
 
+class AtribuicaoItemUpdate(BaseModel):
+    id: str
+    id_pregador: Optional[str] = None
+    ids_cantores: Optional[List[str]] = None
+
+class AtribuicoesLoteUpdate(BaseModel):
+    itens: List[AtribuicaoItemUpdate] = Field(..., min_length=1, max_length=500)
+
+class GeracaoLoteCreate(BaseModel):
+    ids_distritos: List[str]
+    mes_inicio: int
+    ano_inicio: int
+    mes_fim: int
+    ano_fim: int
+    modo: str = 'round_robin'
+
 class AvaliacaoCreate(BaseModel):
     id_item_escala: str
     id_igreja: str
@@ -182,262 +224,338 @@ class DelegacaoCreate(BaseModel):
     permissoes: List[str]
 
 # Auth utilities
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-def create_access_token(data: dict) -> str:
+def create_access_token(data: dict, validade: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    expire = datetime.now(timezone.utc) + (validade or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_usuario_atual(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)) -> Usuario:
+async def get_usuario_atual(credentials: HTTPAuthorizationCredentials = Depends(security), db: AsyncSession = Depends(get_db)) -> Usuario:
+    return await autenticar(credentials.credentials, db)
+
+async def autenticar(token: str, db: AsyncSession, escopo: Optional[str] = None) -> Usuario:
+    """Usuário do token; tokens de uso restrito (`escopo`) só valem onde o escopo é exigido."""
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decodificar_token(token, SECRET_KEY, ALGORITHM)
         user_id: str = payload.get("sub")
-        if user_id is None:
+        if user_id is None or payload.get("escopo") != escopo:
             raise HTTPException(status_code=401, detail="Invalid token")
-        user = db.query(Usuario).filter(Usuario.id == user_id, Usuario.ativo == True).first()
+        user = await carregar_usuario_ativo(db, user_id)
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
         return user
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 # Helper functions
-def criar_notificacao(db: Session, id_usuario: str, tipo: str, titulo: str, mensagem: str, id_relacionado: Optional[str] = None):
-    notificacao = Notificacao(id_usuario=id_usuario, tipo=tipo, titulo=titulo, mensagem=mensagem, id_relacionado=id_relacionado)
+def criar_notificacao(db: AsyncSession, id_usuario: str, tipo: str, titulo: str, mensagem: str, id_relacionado: Optional[str] = None) -> Notificacao:
+    """Adiciona a notificação à sessão; ela é gravada no commit da rota."""
+    notificacao = Notificacao(id=gerar_uuid(), id_usuario=id_usuario, tipo=tipo, titulo=titulo, mensagem=mensagem, id_relacionado=id_relacionado)
     db.add(notificacao)
-    db.commit()
+    return notificacao
 
-def enviar_notificacao_mock(telefone: str, mensagem: str):
-    logging.info(f"[MOCK SMS/WhatsApp para {telefone}]: {mensagem}")
+async def criar_notificacoes(db: AsyncSession, notificacoes: List[Dict[str, Any]]):
+    """Insere várias notificações em um único INSERT em lote, na transação corrente."""
+    if notificacoes:
+        await db.execute(insert(Notificacao), notificacoes)
 
 def usuario_disponivel(db: Session, id_usuario: str, data: str) -> bool:
-    user = db.query(Usuario).filter(Usuario.id == id_usuario).first()
-    if not user or not user.periodos_indisponibilidade:
-        return True
-    for periodo in user.periodos_indisponibilidade:
-        if periodo.get('data_inicio', '') <= data <= periodo.get('data_fim', ''):
-            return False
-    return True
+    return (id_usuario, data) not in carregar_indisponiveis(db, [id_usuario], [data])
 
 def slot_ocupado(db: Session, id_usuario: str, data: str) -> bool:
-    escalas = db.query(Escala).filter(Escala.status.in_(['confirmada', 'ativa'])).all()
-    for escala in escalas:
-        itens = db.query(ItemEscala).filter(ItemEscala.id_escala == escala.id, ItemEscala.data == data, ItemEscala.status.in_(['confirmado', 'pendente'])).all()
-        for item in itens:
-            if item.id_pregador == id_usuario or id_usuario in (item.ids_cantores or []):
-                return True
-    return False
+    return carregar_ocupacao(db, [data], [id_usuario]).ocupado(id_usuario, data)
+
+def escala_para_resposta(escala: Escala, itens: List[ItemEscala]) -> EscalaResponse:
+    return EscalaResponse(id=escala.id, mes=escala.mes, ano=escala.ano, id_igreja=escala.id_igreja, id_distrito=escala.id_distrito, id_gerado_por=escala.id_gerado_por, modo_geracao=escala.modo_geracao, status=escala.status, criado_em=escala.criado_em, atualizado_em=escala.atualizado_em, itens=[ItemEscalaData(id=item.id, data=item.data, horario=item.horario, id_pregador=item.id_pregador, ids_cantores=item.ids_cantores or [], status=item.status, motivo_recusa=item.motivo_recusa, confirmado_em=item.confirmado_em, cancelado_em=item.cancelado_em) for item in itens])
+
+def codificar_cursor(escala: Escala) -> str:
+    return base64.urlsafe_b64encode(f"{escala.ano}:{escala.mes}:{escala.id}".encode()).decode()
+
+def decodificar_cursor(cursor: str):
+    try:
+        ano, mes, id_escala = base64.urlsafe_b64decode(cursor.encode()).decode().split(':', 2)
+        return int(ano), int(mes), id_escala
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+COLUNAS_ESCALA = ['id', 'mes', 'ano', 'id_igreja', 'id_distrito', 'id_gerado_por', 'modo_geracao', 'status', 'criado_em', 'atualizado_em']
+COLUNAS_ITEM = ['id', 'id_escala', 'data', 'horario', 'id_pregador', 'ids_cantores', 'status', 'motivo_recusa', 'confirmado_em', 'cancelado_em']
+
+def escalas_colunares(escalas: List[Escala], proximo_cursor: Optional[str]) -> Dict[str, Any]:
+    """Formato compacto: uma lista por coluna em vez de um objeto por linha."""
+    itens = [item for escala in escalas for item in escala.itens]
+    return {
+        "escalas": {coluna: [getattr(escala, coluna) for escala in escalas] for coluna in COLUNAS_ESCALA},
+        "itens": {coluna: [(getattr(item, coluna) or []) if coluna == 'ids_cantores' else getattr(item, coluna) for item in itens] for coluna in COLUNAS_ITEM},
+        "proximo_cursor": proximo_cursor,
+    }
 
 # AUTH ROUTES
 @api_router.post('/auth/register', response_model=UsuarioResponse)
-async def register(user_data: UsuarioCreate, db: Session = Depends(get_db)):
-    existing = db.query(Usuario).filter(Usuario.nome_usuario == user_data.nome_usuario).first()
+async def register(user_data: UsuarioCreate, db: AsyncSession = Depends(get_db)):
+    existing = await db.scalar(select(Usuario).where(Usuario.nome_usuario == user_data.nome_usuario))
     if existing:
         raise HTTPException(status_code=400, detail="Username already exists")
     user_dict = user_data.model_dump()
     senha = user_dict.pop('senha')
-    user = Usuario(**user_dict, senha_hash=hash_password(senha))
+    user = Usuario(**user_dict, senha_hash=await gerar_hash(senha))
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 @api_router.post('/auth/login')
-async def login(credentials: UsuarioLogin, db: Session = Depends(get_db)):
-    user = db.query(Usuario).filter(Usuario.nome_usuario == credentials.nome_usuario, Usuario.ativo == True).first()
+async def login(credentials: UsuarioLogin, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(Usuario).where(Usuario.nome_usuario == credentials.nome_usuario, Usuario.ativo == True))
 
-    if not user or not verify_password(credentials.senha, user.senha_hash):
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    senha_valida, novo_hash = await verificar_senha(credentials.senha, user.senha_hash)
+    if not senha_valida:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if novo_hash:
+        user.senha_hash = novo_hash
+        await db.commit()
     token = create_access_token({"sub": user.id})
     user_dict = {"id": user.id, "nome_usuario": user.nome_usuario, "nome_completo": user.nome_completo, "email": user.email, "telefone": user.telefone, "funcao": user.funcao, "id_distrito": user.id_distrito, "id_igreja": user.id_igreja, "eh_pregador": user.eh_pregador, "eh_cantor": user.eh_cantor, "pontuacao_pregacao": user.pontuacao_pregacao, "pontuacao_canto": user.pontuacao_canto}
     return {"access_token": token, "token_type": "bearer", "user": user_dict}
 
 @api_router.get('/auth/me', response_model=UsuarioResponse)
+@orcamento_consultas(2)
 async def get_me(usuario_atual: Usuario = Depends(get_usuario_atual)):
     return usuario_atual
 
 @api_router.put('/auth/me', response_model=UsuarioResponse)
-async def update_me(updates: Dict[str, Any], usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+async def update_me(updates: Dict[str, Any], usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     allowed_fields = ['nome_completo', 'email', 'telefone', 'periodos_indisponibilidade']
     for key, value in updates.items():
         if key in allowed_fields:
             setattr(usuario_atual, key, value)
     usuario_atual.atualizado_em = datetime.now(timezone.utc)
-    db.commit()
-    db.refresh(usuario_atual)
+    await db.commit()
+    await db.refresh(usuario_atual)
     return usuario_atual
 
+# Listas de referência (cache de respostas, ver response_cache.py)
+LISTA_DISTRITOS = TypeAdapter(List[DistritoResponse])
+LISTA_IGREJAS = TypeAdapter(List[IgrejaResponse])
+LISTA_USUARIOS = TypeAdapter(List[UsuarioResponse])
+
+def serializar(adaptador: TypeAdapter, objetos) -> bytes:
+    return adaptador.dump_json(adaptador.validate_python(objetos, from_attributes=True))
+
+def escopo_distrito(usuario: Usuario, id_distrito: Optional[str]) -> str:
+    # Sem filtro explícito, o pastor distrital vê todos os distritos e os demais só o próprio
+    if id_distrito:
+        return id_distrito
+    return 'todos' if usuario.funcao == 'pastor_distrital' else f"{usuario.id_distrito}"
+
 # DISTRICTS
 @api_router.get('/districts', response_model=List[DistritoResponse])
-async def get_districts(usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    if usuario_atual.funcao == 'pastor_distrital':
-        return db.query(Distrito).filter(Distrito.ativo == True).all()
-    return db.query(Distrito).filter(Distrito.id == usuario_atual.id_distrito, Distrito.ativo == True).all()
+@orcamento_consultas(3)
+async def get_districts(request: Request, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    async def carregar():
+        query = select(Distrito).where(Distrito.ativo == True)
+        if usuario_atual.funcao != 'pastor_distrital':
+            query = query.where(Distrito.id == usuario_atual.id_distrito)
+        return serializar(LISTA_DISTRITOS, (await db.scalars(query)).all())
+    escopo = 'todos' if usuario_atual.funcao == 'pastor_distrital' else usuario_atual.id_distrito
+    return await resposta_cacheada(request, 'districts', escopo, ('distritos',), carregar)
 
 @api_router.post('/districts', response_model=DistritoResponse)
-async def create_district(district_data: DistritoCreate, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+async def create_district(district_data: DistritoCreate, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     if usuario_atual.funcao != 'pastor_distrital':
         raise HTTPException(status_code=403, detail="Only Pastor Distrital can create districts")
     district = Distrito(**district_data.model_dump())
     db.add(district)
-    db.commit()
-    db.refresh(district)
+    await db.commit()
+    await db.refresh(district)
     return district
 
 @api_router.get('/districts/{district_id}', response_model=DistritoResponse)
-async def get_district(district_id: str, db: Session = Depends(get_db)):
-    district = db.query(Distrito).filter(Distrito.id == district_id, Distrito.ativo == True).first()
+async def get_district(district_id: str, db: AsyncSession = Depends(get_db)):
+    district = await db.scalar(select(Distrito).where(Distrito.id == district_id, Distrito.ativo == True))
     if not district:
         raise HTTPException(status_code=404, detail="District not found")
     return district
 
 @api_router.put('/districts/{district_id}', response_model=DistritoResponse)
-async def update_district(district_id: str, updates: Dict[str, Any], usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+async def update_district(district_id: str, updates: Dict[str, Any], usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     if usuario_atual.funcao != 'pastor_distrital':
         raise HTTPException(status_code=403, detail="Permission denied")
-    district = db.query(Distrito).filter(Distrito.id == district_id).first()
+    district = await db.scalar(select(Distrito).where(Distrito.id == district_id))
     if not district:
         raise HTTPException(status_code=404, detail="District not found")
     for key, value in updates.items():
         if hasattr(district, key):
             setattr(district, key, value)
     district.atualizado_em = datetime.now(timezone.utc)
-    db.commit()
-    db.refresh(district)
+    await db.commit()
+    await db.refresh(district)
     return district
 
 @api_router.delete('/districts/{district_id}')
-async def delete_district(district_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+async def delete_district(district_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     if usuario_atual.funcao != 'pastor_distrital':
         raise HTTPException(status_code=403, detail="Permission denied")
-    district = db.query(Distrito).filter(Distrito.id == district_id).first()
+    district = await db.scalar(select(Distrito).where(Distrito.id == district_id))
     if district:
         district.ativo = False
-        db.commit()
+        await db.commit()
     return {"message": "District deleted successfully"}
 
 # CHURCHES
 @api_router.get('/churches', response_model=List[IgrejaResponse])
-async def get_churches(id_distrito: Optional[str] = None, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    query = db.query(Igreja).filter(Igreja.ativo == True)
-    if id_distrito:
-        query = query.filter(Igreja.id_distrito == id_distrito)
-    elif usuario_atual.funcao != 'pastor_distrital':
-        query = query.filter(Igreja.id_distrito == usuario_atual.id_distrito)
-    return query.all()
+@orcamento_consultas(3)
+async def get_churches(request: Request, id_distrito: Optional[str] = None, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    async def carregar():
+        query = select(Igreja).where(Igreja.ativo == True)
+        if id_distrito:
+            query = query.where(Igreja.id_distrito == id_distrito)
+        elif usuario_atual.funcao != 'pastor_distrital':
+            query = query.where(Igreja.id_distrito == usuario_atual.id_distrito)
+        return serializar(LISTA_IGREJAS, (await db.scalars(query)).all())
+    return await resposta_cacheada(request, 'churches', escopo_distrito(usuario_atual, id_distrito), ('igrejas',), carregar)
 
 @api_router.post('/churches', response_model=IgrejaResponse)
-async def create_church(church_data: IgrejaCreate, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+async def create_church(church_data: IgrejaCreate, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     if usuario_atual.funcao not in ['pastor_distrital', 'lider_igreja']:
         raise HTTPException(status_code=403, detail="Permission denied")
     church = Igreja(**church_data.model_dump())
     db.add(church)
-    db.commit()
-    db.refresh(church)
+    await db.commit()
+    await db.refresh(church)
     return church
 
 @api_router.get('/churches/{church_id}', response_model=IgrejaResponse)
-async def get_church(church_id: str, db: Session = Depends(get_db)):
-    church = db.query(Igreja).filter(Igreja.id == church_id, Igreja.ativo == True).first()
+async def get_church(church_id: str, db: AsyncSession = Depends(get_db)):
+    church = await db.scalar(select(Igreja).where(Igreja.id == church_id, Igreja.ativo == True))
     if not church:
         raise HTTPException(status_code=404, detail="Church not found")
     return church
 
 @api_router.put('/churches/{church_id}', response_model=IgrejaResponse)
-async def update_church(church_id: str, updates: Dict[str, Any], usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+async def update_church(church_id: str, updates: Dict[str, Any], usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     if usuario_atual.funcao not in ['pastor_distrital', 'lider_igreja']:
         raise HTTPException(status_code=403, detail="Permission denied")
-    church = db.query(Igreja).filter(Igreja.id == church_id).first()
+    church = await db.scalar(select(Igreja).where(Igreja.id == church_id))
     if not church:
         raise HTTPException(status_code=404, detail="Church not found")
     for key, value in updates.items():
         if hasattr(church, key):
             setattr(church, key, value)
     church.atualizado_em = datetime.now(timezone.utc)
-    db.commit()
-    db.refresh(church)
+    await db.commit()
+    await db.refresh(church)
     return church
 
 @api_router.delete('/churches/{church_id}')
-async def delete_church(church_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+async def delete_church(church_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     if usuario_atual.funcao not in ['pastor_distrital', 'lider_igreja']:
         raise HTTPException(status_code=403, detail="Permission denied")
-    church = db.query(Igreja).filter(Igreja.id == church_id).first()
+    church = await db.scalar(select(Igreja).where(Igreja.id == church_id))
     if church:
         church.ativo = False
-        db.commit()
+        await db.commit()
     return {"message": "Church deleted successfully"}
 
 # USERS
 @api_router.get('/users', response_model=List[UsuarioResponse])
-async def get_users(id_distrito: Optional[str] = None, id_igreja: Optional[str] = None, eh_pregador: Optional[bool] = None, eh_cantor: Optional[bool] = None, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    query = db.query(Usuario).filter(Usuario.ativo == True)
+async def get_users(id_distrito: Optional[str] = None, id_igreja: Optional[str] = None, eh_pregador: Optional[bool] = None, eh_cantor: Optional[bool] = None, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    query = select(Usuario).where(Usuario.ativo == True)
     if usuario_atual.funcao != 'pastor_distrital':
-        query = query.filter(Usuario.id_distrito == usuario_atual.id_distrito)
+        query = query.where(Usuario.id_distrito == usuario_atual.id_distrito)
     if id_distrito:
-        query = query.filter(Usuario.id_distrito == id_distrito)
+        query = query.where(Usuario.id_distrito == id_distrito)
     if id_igreja:
-        query = query.filter(Usuario.id_igreja == id_igreja)
+        query = query.where(Usuario.id_igreja == id_igreja)
     if eh_pregador is not None:
-        query = query.filter(Usuario.eh_pregador == eh_pregador)
+        query = query.where(Usuario.eh_pregador == eh_pregador)
     if eh_cantor is not None:
-        query = query.filter(Usuario.eh_cantor == eh_cantor)
-    return query.all()
+        query = query.where(Usuario.eh_cantor == eh_cantor)
+    return (await db.scalars(query)).all()
 
 @api_router.get('/users/preachers', response_model=List[UsuarioResponse])
-async def get_preachers(id_distrito: Optional[str] = None, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    query = db.query(Usuario).filter(Usuario.ativo == True, Usuario.eh_pregador == True)
-    if id_distrito:
-        query = query.filter(Usuario.id_distrito == id_distrito)
-    elif usuario_atual.funcao != 'pastor_distrital':
-        query = query.filter(Usuario.id_distrito == usuario_atual.id_distrito)
-    return query.all()
+@orcamento_consultas(3)
+async def get_preachers(request: Request, id_distrito: Optional[str] = None, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    async def carregar():
+        query = select(Usuario).where(Usuario.ativo == True, Usuario.eh_pregador == True)
+        if id_distrito:
+            query = query.where(Usuario.id_distrito == id_distrito)
+        elif usuario_atual.funcao != 'pastor_distrital':
+            query = query.where(Usuario.id_distrito == usuario_atual.id_distrito)
+        return serializar(LISTA_USUARIOS, (await db.scalars(query)).all())
+    return await resposta_cacheada(request, 'preachers', escopo_distrito(usuario_atual, id_distrito), ('usuarios',), carregar)
 
 @api_router.get('/users/singers', response_model=List[UsuarioResponse])
-async def get_singers(id_distrito: Optional[str] = None, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    query = db.query(Usuario).filter(Usuario.ativo == True, Usuario.eh_cantor == True)
-    if id_distrito:
-        query = query.filter(Usuario.id_distrito == id_distrito)
-    elif usuario_atual.funcao != 'pastor_distrital':
-        query = query.filter(Usuario.id_distrito == usuario_atual.id_distrito)
-    return query.all()
+@orcamento_consultas(3)
+async def get_singers(request: Request, id_distrito: Optional[str] = None, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    async def carregar():
+        query = select(Usuario).where(Usuario.ativo == True, Usuario.eh_cantor == True)
+        if id_distrito:
+            query = query.where(Usuario.id_distrito == id_distrito)
+        elif usuario_atual.funcao != 'pastor_distrital':
+            query = query.where(Usuario.id_distrito == usuario_atual.id_distrito)
+        return serializar(LISTA_USUARIOS, (await db.scalars(query)).all())
+    return await resposta_cacheada(request, 'singers', escopo_distrito(usuario_atual, id_distrito), ('usuarios',), carregar)
 
 @api_router.post('/users', response_model=UsuarioResponse)
-async def create_user(user_data: UsuarioCreate, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+async def create_user(user_data: UsuarioCreate, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     if usuario_atual.funcao not in ['pastor_distrital', 'lider_igreja']:
         raise HTTPException(status_code=403, detail="Permission denied")
-    existing = db.query(Usuario).filter(Usuario.nome_usuario == user_data.nome_usuario).first()
+    existing = await db.scalar(select(Usuario).where(Usuario.nome_usuario == user_data.nome_usuario))
     if existing:
         raise HTTPException(status_code=400, detail="Username already exists")
     user_dict = user_data.model_dump()
     senha = user_dict.pop('senha')
-    user = Usuario(**user_dict, senha_hash=hash_password(senha))
+    user = Usuario(**user_dict, senha_hash=await gerar_hash(senha))
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
+@api_router.post('/users/import')
+async def import_users(arquivo: UploadFile = File(...), id_distrito: Optional[str] = Form(None), senha_padrao: Optional[str] = Form(None), simulacao: bool = Form(False), usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    if usuario_atual.funcao not in ['pastor_distrital', 'lider_igreja']:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    id_distrito = id_distrito or usuario_atual.id_distrito
+    if usuario_atual.funcao != 'pastor_distrital' and id_distrito != usuario_atual.id_distrito:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    if not id_distrito or not await db.scalar(select(Distrito.id).where(Distrito.id == id_distrito)):
+        raise HTTPException(status_code=404, detail="District not found")
+    formato = formato_do_arquivo(arquivo.filename or '')
+    if formato is None:
+        raise HTTPException(status_code=400, detail="Unsupported file format (use .csv or .xlsx)")
+
+    def executar():
+        # Sessão síncrona em uma thread: leitura, hash e gravação não bloqueiam o event loop
+        sessao = SessionLocal()
+        try:
+            return importar_usuarios(sessao, arquivo.file, formato, id_distrito, senha_padrao=senha_padrao, simulacao=simulacao)
+        finally:
+            sessao.close()
+    try:
+        resultado = await run_in_threadpool(executar)
+    except ErroImportacao as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if resultado["erros"] and not simulacao:
+        raise HTTPException(status_code=400, detail={"message": "No users were imported", **resultado})
+    return resultado
+
 @api_router.get('/users/{user_id}', response_model=UsuarioResponse)
-async def get_user(user_id: str, db: Session = Depends(get_db)):
-    user = db.query(Usuario).filter(Usuario.id == user_id, Usuario.ativo == True).first()
+async def get_user(user_id: str, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(Usuario).where(Usuario.id == user_id, Usuario.ativo == True))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 @api_router.put('/users/{user_id}', response_model=UsuarioResponse)
-async def update_user(user_id: str, updates: Dict[str, Any], usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+async def update_user(user_id: str, updates: Dict[str, Any], usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     if usuario_atual.funcao not in ['pastor_distrital', 'lider_igreja'] and usuario_atual.id != user_id:
         raise HTTPException(status_code=403, detail="Permission denied")
-    user = db.query(Usuario).filter(Usuario.id == user_id).first()
+    user = await db.scalar(select(Usuario).where(Usuario.id == user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     updates.pop('senha', None)
@@ -446,101 +564,102 @@ async def update_user(user_id: str, updates: Dict[str, Any], usuario_atual: Usua
         if hasattr(user, key):
             setattr(user, key, value)
     user.atualizado_em = datetime.now(timezone.utc)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 @api_router.delete('/users/{user_id}')
-async def delete_user(user_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+async def delete_user(user_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     if usuario_atual.funcao not in ['pastor_distrital', 'lider_igreja']:
         raise HTTPException(status_code=403, detail="Permission denied")
-    user = db.query(Usuario).filter(Usuario.id == user_id).first()
+    user = await db.scalar(select(Usuario).where(Usuario.id == user_id))
     if user:
         user.ativo = False
-        db.commit()
+        await db.commit()
     return {"message": "User deleted successfully"}
 
 # SCHEDULES
 @api_router.get('/schedules', response_model=List[EscalaResponse])
-async def get_schedules(mes: Optional[int] = None, ano: Optional[int] = None, id_igreja: Optional[str] = None, id_distrito: Optional[str] = None, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    query = db.query(Escala)
+@orcamento_consultas(4)
+async def get_schedules(response: Response, mes: Optional[int] = None, ano: Optional[int] = None, id_igreja: Optional[str] = None, id_distrito: Optional[str] = None, cursor: Optional[str] = None, limite: Optional[int] = Query(None, ge=1, le=500), formato: str = 'completo', usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    query = select(Escala).options(selectinload(Escala.itens))
     if usuario_atual.funcao != 'pastor_distrital':
-        query = query.filter(Escala.id_distrito == usuario_atual.id_distrito)
+        query = query.where(Escala.id_distrito == usuario_atual.id_distrito)
     if mes:
-        query = query.filter(Escala.mes == mes)
+        query = query.where(Escala.mes == mes)
     if ano:
-        query = query.filter(Escala.ano == ano)
+        query = query.where(Escala.ano == ano)
     if id_igreja:
-        query = query.filter(Escala.id_igreja == id_igreja)
+        query = query.where(Escala.id_igreja == id_igreja)
     if id_distrito:
-        query = query.filter(Escala.id_distrito == id_distrito)
-    escalas = query.all()
-    result = []
-    for escala in escalas:
-        itens = db.query(ItemEscala).filter(ItemEscala.id_escala == escala.id).all()
-        result.append(EscalaResponse(id=escala.id, mes=escala.mes, ano=escala.ano, id_igreja=escala.id_igreja, id_distrito=escala.id_distrito, id_gerado_por=escala.id_gerado_por, modo_geracao=escala.modo_geracao, status=escala.status, criado_em=escala.criado_em, atualizado_em=escala.atualizado_em, itens=[ItemEscalaData(id=item.id, data=item.data, horario=item.horario, id_pregador=item.id_pregador, ids_cantores=item.ids_cantores or [], status=item.status, motivo_recusa=item.motivo_recusa, confirmado_em=item.confirmado_em, cancelado_em=item.cancelado_em) for item in itens]))
-    return result
+        query = query.where(Escala.id_distrito == id_distrito)
+    if cursor:
+        query = query.where(tuple_(Escala.ano, Escala.mes, Escala.id) > decodificar_cursor(cursor))
+    query = query.order_by(Escala.ano, Escala.mes, Escala.id)
+    escalas = (await db.scalars(query.limit(limite + 1) if limite else query)).all()
+    proximo_cursor = None
+    if limite and len(escalas) > limite:
+        escalas = escalas[:limite]
+        proximo_cursor = codificar_cursor(escalas[-1])
+    headers = {"X-Next-Cursor": proximo_cursor} if proximo_cursor else {}
+    if formato == 'colunar':
+        return JSONResponse(content=jsonable_encoder(escalas_colunares(escalas, proximo_cursor)), headers=headers)
+    if formato != 'completo':
+        raise HTTPException(status_code=400, detail="Unknown format")
+    response.headers.update(headers)
+    return [escala_para_resposta(escala, escala.itens) for escala in escalas]
 
 @api_router.post('/schedules/generate-auto')
-async def generate_schedule_auto(mes: int, ano: int, id_distrito: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+@orcamento_consultas(15)
+async def generate_schedule_auto(mes: int, ano: int, id_distrito: str, modo: str = 'round_robin', usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     if usuario_atual.funcao not in ['pastor_distrital', 'lider_igreja']:
         raise HTTPException(status_code=403, detail="Permission denied")
-    igrejas = db.query(Igreja).filter(Igreja.id_distrito == id_distrito, Igreja.ativo == True).all()
-    pregadores = db.query(Usuario).filter(Usuario.id_distrito == id_distrito, Usuario.eh_pregador == True, Usuario.ativo == True).order_by(Usuario.pontuacao_pregacao.desc()).all()
-    escalas_geradas = []
-    for igreja in igrejas:
-        existing = db.query(Escala).filter(Escala.id_igreja == igreja.id, Escala.mes == mes, Escala.ano == ano).first()
-        if existing:
-            continue
-        escala = Escala(mes=mes, ano=ano, id_igreja=igreja.id, id_distrito=id_distrito, id_gerado_por=usuario_atual.id, modo_geracao='automatico', status='rascunho')
-        db.add(escala)
-        db.flush()
-        horarios_culto = igreja.horarios_culto or []
-        if not horarios_culto:
-            continue
-        _, num_dias = calendar.monthrange(ano, mes)
-        pregador_index = 0
-        for dia in range(1, num_dias + 1):
-            date_obj = datetime(ano, mes, dia)
-            dia_semana = date_obj.strftime('%A').lower()
-            dia_semana_map = {'monday': 'segunda', 'tuesday': 'terca', 'wednesday': 'quarta', 'thursday': 'quinta', 'friday': 'sexta', 'saturday': 'sabado', 'sunday': 'domingo'}
-            dia_semana_pt = dia_semana_map.get(dia_semana, dia_semana)
-            horario_encontrado = None
-            for horario in horarios_culto:
-                if horario.get('dia_semana', '').lower() in [dia_semana, dia_semana_pt]:
-                    horario_encontrado = horario
-                    break
-            if horario_encontrado:
-                data_str = date_obj.strftime('%Y-%m-%d')
-                pregador = None
-                tentativas = 0
-                while tentativas < len(pregadores):
-                    candidato = pregadores[pregador_index % len(pregadores)]
-                    pregador_index += 1
-                    tentativas += 1
-                    if usuario_disponivel(db, candidato.id, data_str) and not slot_ocupado(db, candidato.id, data_str):
-                        pregador = candidato
-                        break
-                if pregador:
-                    item = ItemEscala(id_escala=escala.id, data=data_str, horario=horario_encontrado.get('horario', ''), id_pregador=pregador.id, ids_cantores=[], status='pendente')
-                    db.add(item)
-        escalas_geradas.append(escala)
-    db.commit()
-    return {"message": f"Geradas {len(escalas_geradas)} escalas", "escalas": [e.id for e in escalas_geradas]}
+    if modo not in SOLVERS:
+        raise HTTPException(status_code=400, detail=f"Unknown solver mode: {modo}")
+    problema = await db.run_sync(carregar_problema, id_distrito, mes, ano)
+    itens = await run_in_threadpool(resolver, problema, modo)
+    escalas_geradas = await db.run_sync(gravar_plano, problema, itens, usuario_atual.id)
+    await db.commit()
+    return {"message": f"Geradas {len(escalas_geradas)} escalas", "escalas": escalas_geradas}
+
+@api_router.post('/schedules/generate-batch')
+async def generate_schedules_batch(lote: GeracaoLoteCreate, usuario_atual: Usuario = Depends(get_usuario_atual)):
+    if usuario_atual.funcao not in ['pastor_distrital', 'lider_igreja']:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    if lote.modo not in SOLVERS:
+        raise HTTPException(status_code=400, detail=f"Unknown solver mode: {lote.modo}")
+    if usuario_atual.funcao != 'pastor_distrital' and any(id_distrito != usuario_atual.id_distrito for id_distrito in lote.ids_distritos):
+        raise HTTPException(status_code=403, detail="Permission denied")
+    try:
+        meses = meses_no_intervalo(lote.mes_inicio, lote.ano_inicio, lote.mes_fim, lote.ano_fim)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    job = iniciar_job(JobGeracao(ids_distritos=list(dict.fromkeys(lote.ids_distritos)), meses=meses, modo=lote.modo, id_gerado_por=usuario_atual.id))
+    return job.para_dict()
+
+@api_router.get('/schedules/jobs/{job_id}')
+async def get_generation_job(job_id: str, usuario_atual: Usuario = Depends(get_usuario_atual)):
+    job = obter_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    # Mesma regra do início do job: o autor, um pastor distrital ou o líder do(s) distrito(s) do job
+    if job.id_gerado_por != usuario_atual.id and usuario_atual.funcao != 'pastor_distrital' and not (usuario_atual.funcao == 'lider_igreja' and all(id_distrito == usuario_atual.id_distrito for id_distrito in job.ids_distritos)):
+        raise HTTPException(status_code=403, detail="Permission denied")
+    return job.para_dict()
 
 @api_router.post('/schedules/manual', response_model=EscalaResponse)
-async def create_manual_schedule(schedule_data: EscalaCreate, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+async def create_manual_schedule(schedule_data: EscalaCreate, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     if usuario_atual.funcao not in ['pastor_distrital', 'lider_igreja']:
         raise HTTPException(status_code=403, detail="Permission denied")
-    existing = db.query(Escala).filter(Escala.id_igreja == schedule_data.id_igreja, Escala.mes == schedule_data.mes, Escala.ano == schedule_data.ano).first()
+    existing = await db.scalar(select(Escala).where(Escala.id_igreja == schedule_data.id_igreja, Escala.mes == schedule_data.mes, Escala.ano == schedule_data.ano))
     if existing:
         raise HTTPException(status_code=400, detail="Schedule already exists for this month/year")
-    igreja = db.query(Igreja).filter(Igreja.id == schedule_data.id_igreja).first()
+    igreja = await db.scalar(select(Igreja).where(Igreja.id == schedule_data.id_igreja))
     if not igreja:
         raise HTTPException(status_code=404, detail="Church not found")
     escala = Escala(mes=schedule_data.mes, ano=schedule_data.ano, id_igreja=schedule_data.id_igreja, id_distrito=igreja.id_distrito, id_gerado_por=usuario_atual.id, modo_geracao='manual', status='rascunho')
     db.add(escala)
-    db.flush()
+    await db.flush()
     horarios_culto = igreja.horarios_culto or []
     _, num_dias = calendar.monthrange(schedule_data.ano, schedule_data.mes)
     for dia in range(1, num_dias + 1):
@@ -554,112 +673,200 @@ async def create_manual_schedule(schedule_data: EscalaCreate, usuario_atual: Usu
         if horario_encontrado:
             item = ItemEscala(id_escala=escala.id, data=date_obj.strftime('%Y-%m-%d'), horario=horario_encontrado.get('horario', ''), id_pregador=None, ids_cantores=[], status='pendente')
             db.add(item)
-    db.commit()
-    db.refresh(escala)
-    itens = db.query(ItemEscala).filter(ItemEscala.id_escala == escala.id).all()
-    return EscalaResponse(id=escala.id, mes=escala.mes, ano=escala.ano, id_igreja=escala.id_igreja, id_distrito=escala.id_distrito, id_gerado_por=escala.id_gerado_por, modo_geracao=escala.modo_geracao, status=escala.status, criado_em=escala.criado_em, atualizado_em=escala.atualizado_em, itens=[ItemEscalaData(id=item.id, data=item.data, horario=item.horario, id_pregador=item.id_pregador, ids_cantores=item.ids_cantores or [], status=item.status, motivo_recusa=item.motivo_recusa, confirmado_em=item.confirmado_em, cancelado_em=item.cancelado_em) for item in itens])
+    await db.commit()
+    await db.refresh(escala)
+    itens = (await db.scalars(select(ItemEscala).where(ItemEscala.id_escala == escala.id))).all()
+    return escala_para_resposta(escala, itens)
 
 @api_router.get('/schedules/{schedule_id}')
-async def get_schedule(schedule_id: str, db: Session = Depends(get_db)):
-    escala = db.query(Escala).filter(Escala.id == schedule_id).first()
+async def get_schedule(schedule_id: str, db: AsyncSession = Depends(get_db)):
+    escala = await db.scalar(select(Escala).where(Escala.id == schedule_id))
     if not escala:
         raise HTTPException(status_code=404, detail="Schedule not found")
-    itens = db.query(ItemEscala).filter(ItemEscala.id_escala == escala.id).all()
-    return EscalaResponse(id=escala.id, mes=escala.mes, ano=escala.ano, id_igreja=escala.id_igreja, id_distrito=escala.id_distrito, id_gerado_por=escala.id_gerado_por, modo_geracao=escala.modo_geracao, status=escala.status, criado_em=escala.criado_em, atualizado_em=escala.atualizado_em, itens=[ItemEscalaData(id=item.id, data=item.data, horario=item.horario, id_pregador=item.id_pregador, ids_cantores=item.ids_cantores or [], status=item.status, motivo_recusa=item.motivo_recusa, confirmado_em=item.confirmado_em, cancelado_em=item.cancelado_em) for item in itens])
+    itens = (await db.scalars(select(ItemEscala).where(ItemEscala.id_escala == escala.id))).all()
+    return escala_para_resposta(escala, itens)
+
+@api_router.get('/schedules/{schedule_id}/availability')
+async def get_schedule_availability(schedule_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    if usuario_atual.funcao not in ['pastor_distrital', 'lider_igreja']:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    escala = await db.scalar(select(Escala).where(Escala.id == schedule_id))
+    if not escala:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    itens_por_data: Dict[str, set] = {}
+    for id_item, data in await db.execute(select(ItemEscala.id, ItemEscala.data).where(ItemEscala.id_escala == schedule_id)):
+        itens_por_data.setdefault(data, set()).add(id_item)
+    datas = sorted(itens_por_data)
+    disponibilidade = await db.run_sync(disponibilidade_do_mes, escala.id_distrito, escala.ano, escala.mes)
+    return {
+        "id_escala": escala.id,
+        "mes": escala.mes,
+        "ano": escala.ano,
+        "datas": datas,
+        "legenda": LEGENDA,
+        "usuarios": disponibilidade.membros,
+        "matriz": [disponibilidade.linha(membro["id"], datas, itens_por_data) for membro in disponibilidade.membros],
+    }
 
 @api_router.put('/schedules/{schedule_id}/items/{item_id}')
-async def update_schedule_item(schedule_id: str, item_id: str, id_pregador: Optional[str] = None, ids_cantores: Optional[List[str]] = None, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    item = db.query(ItemEscala).filter(ItemEscala.id == item_id, ItemEscala.id_escala == schedule_id).first()
+async def update_schedule_item(schedule_id: str, item_id: str, id_pregador: Optional[str] = None, ids_cantores: Optional[List[str]] = None, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    item = await db.scalar(select(ItemEscala).where(ItemEscala.id == item_id, ItemEscala.id_escala == schedule_id))
     if not item:
         raise HTTPException(status_code=404, detail="Schedule item not found")
+    ocupacao = await db.run_sync(carregar_ocupacao, [item.data], ([id_pregador] if id_pregador is not None else []) + (ids_cantores or []))
     if id_pregador is not None:
-        if slot_ocupado(db, id_pregador, item.data):
+        if ocupacao.ocupado(id_pregador, item.data):
             raise HTTPException(status_code=400, detail="Preacher already scheduled on this date")
         item.id_pregador = id_pregador
     if ids_cantores is not None:
         for cantor_id in ids_cantores:
-            if slot_ocupado(db, cantor_id, item.data):
+            if ocupacao.ocupado(cantor_id, item.data):
                 raise HTTPException(status_code=400, detail=f"Singer {cantor_id} already scheduled on this date")
         item.ids_cantores = ids_cantores
     item.atualizado_em = datetime.now(timezone.utc)
-    db.commit()
+    await db.commit()
     return {"message": "Schedule item updated"}
 
+@api_router.patch('/schedules/{schedule_id}/items')
+@orcamento_consultas(14)
+async def update_schedule_items(schedule_id: str, lote: AtribuicoesLoteUpdate, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    """Atualiza vários itens de uma vez: valida tudo antes e só grava se nenhum item tiver erro."""
+    if usuario_atual.funcao not in ['pastor_distrital', 'lider_igreja']:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    escala = await db.scalar(select(Escala).where(Escala.id == schedule_id))
+    if not escala:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    if usuario_atual.funcao != 'pastor_distrital' and escala.id_distrito != usuario_atual.id_distrito:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    # atribuicoes já carregadas: a sincronização no flush não consulta item por item
+    itens = {item.id: item for item in (await db.scalars(select(ItemEscala).options(selectinload(ItemEscala.atribuicoes)).where(ItemEscala.id_escala == schedule_id))).all()}
+    ids_pregadores = {alteracao.id_pregador for alteracao in lote.itens if alteracao.id_pregador is not None}
+    ids_cantores = {cantor_id for alteracao in lote.itens for cantor_id in (alteracao.ids_cantores or [])}
+    membros = {linha.id: linha for linha in (await db.execute(select(Usuario.id, Usuario.eh_pregador, Usuario.eh_cantor).where(Usuario.id.in_(ids_pregadores | ids_cantores), Usuario.ativo == True))).all()} if ids_pregadores or ids_cantores else {}
+
+    erros, alteracoes = [], {}
+    for alteracao in lote.itens:
+        if alteracao.id not in itens:
+            erros.append({"id_item": alteracao.id, "erro": "Schedule item not found"})
+        elif alteracao.id in alteracoes:
+            erros.append({"id_item": alteracao.id, "erro": "Item appears more than once in the batch"})
+        else:
+            alteracoes[alteracao.id] = alteracao
+
+    # Estado final dos itens da escala nas datas afetadas, para achar o mesmo membro duas vezes no mesmo dia
+    # (itens recusados ou cancelados não ocupam ninguém, como em carregar_ocupacao)
+    datas = {itens[id_item].data for id_item in alteracoes}
+    final = IndiceOcupacao()
+    for item in itens.values():
+        if item.data in datas and item.status in STATUS_ITEM_OCUPA:
+            alteracao = alteracoes.get(item.id)
+            id_pregador = alteracao.id_pregador if alteracao and alteracao.id_pregador is not None else item.id_pregador
+            cantores = alteracao.ids_cantores if alteracao and alteracao.ids_cantores is not None else item.ids_cantores
+            final.adicionar_item(item.id, item.data, id_pregador, cantores)
+    # Os itens do lote são reatribuídos: a atribuição atual deles não conta como conflito
+    ocupacao = await db.run_sync(carregar_ocupacao, datas, ids_pregadores | ids_cantores)
+    for id_item, alteracao in alteracoes.items():
+        data = itens[id_item].data
+        if alteracao.id_pregador is not None:
+            membro = membros.get(alteracao.id_pregador)
+            if membro is None or not membro.eh_pregador:
+                erros.append({"id_item": id_item, "erro": f"User {alteracao.id_pregador} is not an active preacher"})
+            elif ocupacao.ocupado(alteracao.id_pregador, data, ignorar=alteracoes) or final.ocupado(alteracao.id_pregador, data, ignorar=[id_item]):
+                erros.append({"id_item": id_item, "erro": "Preacher already scheduled on this date"})
+        for cantor_id in dict.fromkeys(alteracao.ids_cantores or []):
+            membro = membros.get(cantor_id)
+            if membro is None or not membro.eh_cantor:
+                erros.append({"id_item": id_item, "erro": f"User {cantor_id} is not an active singer"})
+            elif alteracao.ids_cantores.count(cantor_id) > 1 or ocupacao.ocupado(cantor_id, data, ignorar=alteracoes) or final.ocupado(cantor_id, data, ignorar=[id_item]) or cantor_id == (alteracao.id_pregador or itens[id_item].id_pregador):
+                erros.append({"id_item": id_item, "erro": f"Singer {cantor_id} already scheduled on this date"})
+    if erros:
+        raise HTTPException(status_code=400, detail={"message": "No items were updated", "erros": erros})
+
+    agora = datetime.now(timezone.utc)
+    for id_item, alteracao in alteracoes.items():
+        item = itens[id_item]
+        if alteracao.id_pregador is not None:
+            item.id_pregador = alteracao.id_pregador
+        if alteracao.ids_cantores is not None:
+            item.ids_cantores = alteracao.ids_cantores
+        item.atualizado_em = agora
+    escala.atualizado_em = agora
+    await db.commit()
+    return {"message": "Schedule items updated", "atualizados": len(alteracoes)}
+
 @api_router.post('/schedules/{schedule_id}/confirm')
-async def confirm_schedule(schedule_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    escala = db.query(Escala).filter(Escala.id == schedule_id).first()
+@orcamento_consultas(10)
+async def confirm_schedule(schedule_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    escala = await db.scalar(select(Escala).where(Escala.id == schedule_id))
     if not escala:
         raise HTTPException(status_code=404, detail="Schedule not found")
-    itens = db.query(ItemEscala).filter(ItemEscala.id_escala == schedule_id).all()
+    itens = (await db.scalars(select(ItemEscala).where(ItemEscala.id_escala == schedule_id))).all()
     for item in itens:
         if not item.id_pregador:
             raise HTTPException(status_code=400, detail=f"Item on {item.data} has no preacher assigned")
+    igreja = await db.scalar(select(Igreja).where(Igreja.id == escala.id_igreja))
+    ids_destinatarios = {item.id_pregador for item in itens} | {cantor_id for item in itens for cantor_id in (item.ids_cantores or [])}
+    telefones = dict((await db.execute(select(Usuario.id, Usuario.telefone).where(Usuario.id.in_(ids_destinatarios)))).all())
+    notificacoes, envios = [], []
+    for item in itens:
+        destinatarios = [(item.id_pregador, 'Nova Escala de Pregação', f"Você foi escalado para pregar em {igreja.nome} no dia {item.data} às {item.horario}")]
+        destinatarios += [(cantor_id, 'Nova Escala de Louvor', f"Você foi escalado para Louvor Especial em {igreja.nome} no dia {item.data} às {item.horario}") for cantor_id in (item.ids_cantores or [])]
+        for id_usuario, titulo, mensagem in destinatarios:
+            if id_usuario not in telefones:
+                continue
+            notificacoes.append({"id_usuario": id_usuario, "tipo": 'atribuicao_escala', "titulo": titulo, "mensagem": mensagem, "id_relacionado": item.id})
+            if telefones[id_usuario]:
+                envios.append({"chave_dedup": f"atribuicao_escala:{item.id}:{id_usuario}:{item.data}:{item.horario}", "destino": telefones[id_usuario], "mensagem": mensagem})
     escala.status = 'confirmada'
     escala.atualizado_em = datetime.now(timezone.utc)
-    db.commit()
-    igreja = db.query(Igreja).filter(Igreja.id == escala.id_igreja).first()
-    for item in itens:
-        if item.id_pregador:
-            pregador = db.query(Usuario).filter(Usuario.id == item.id_pregador).first()
-            if pregador:
-                mensagem = f"Você foi escalado para pregar em {igreja.nome} no dia {item.data} às {item.horario}"
-                criar_notificacao(db, pregador.id, 'atribuicao_escala', 'Nova Escala de Pregação', mensagem, item.id)
-                if pregador.telefone:
-                    enviar_notificacao_mock(pregador.telefone, mensagem)
-        for cantor_id in (item.ids_cantores or []):
-            cantor = db.query(Usuario).filter(Usuario.id == cantor_id).first()
-            if cantor:
-                mensagem = f"Você foi escalado para Louvor Especial em {igreja.nome} no dia {item.data} às {item.horario}"
-                criar_notificacao(db, cantor.id, 'atribuicao_escala', 'Nova Escala de Louvor', mensagem, item.id)
-                if cantor.telefone:
-                    enviar_notificacao_mock(cantor.telefone, mensagem)
+    await criar_notificacoes(db, notificacoes)
+    await enfileirar(db, envios)
+    await db.commit()
     return {"message": "Schedule confirmed and notifications sent"}
 
 @api_router.post('/schedule-items/{item_id}/confirm')
-async def confirm_participation(item_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    item = db.query(ItemEscala).filter(ItemEscala.id == item_id).first()
+async def confirm_participation(item_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    item = await db.scalar(select(ItemEscala).where(ItemEscala.id == item_id))
     if not item:
         raise HTTPException(status_code=404, detail="Schedule item not found")
     if item.id_pregador != usuario_atual.id and usuario_atual.id not in (item.ids_cantores or []):
         raise HTTPException(status_code=403, detail="You are not assigned to this schedule")
     item.status = 'confirmado'
     item.confirmado_em = datetime.now(timezone.utc)
-    db.commit()
+    await db.commit()
     return {"message": "Participation confirmed"}
 
 @api_router.post('/schedule-items/{item_id}/refuse')
-async def refuse_participation(item_id: str, motivo: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    item = db.query(ItemEscala).filter(ItemEscala.id == item_id).first()
+async def refuse_participation(item_id: str, motivo: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    item = await db.scalar(select(ItemEscala).where(ItemEscala.id == item_id))
     if not item:
         raise HTTPException(status_code=404, detail="Schedule item not found")
-    escala = db.query(Escala).filter(Escala.id == item.id_escala).first()
-    igreja = db.query(Igreja).filter(Igreja.id == escala.id_igreja).first()
-    distrito = db.query(Distrito).filter(Distrito.id == escala.id_distrito).first()
+    escala = await db.scalar(select(Escala).where(Escala.id == item.id_escala))
+    igreja = await db.scalar(select(Igreja).where(Igreja.id == escala.id_igreja))
+    distrito = await db.scalar(select(Distrito).where(Distrito.id == escala.id_distrito))
     tipo_membro = 'pregador' if item.id_pregador == usuario_atual.id else 'cantor'
     if item.id_pregador == usuario_atual.id:
         item.id_pregador = None
     elif usuario_atual.id in (item.ids_cantores or []):
-        item.ids_cantores.remove(usuario_atual.id)
+        item.ids_cantores = [id_cantor for id_cantor in item.ids_cantores if id_cantor != usuario_atual.id]
     else:
         raise HTTPException(status_code=403, detail="You are not assigned to this schedule")
     item.status = 'recusado'
     item.motivo_recusa = motivo
-    db.commit()
-    pastor = db.query(Usuario).filter(Usuario.id == distrito.id_pastor).first()
-    if pastor:
-        mensagem = f"{usuario_atual.nome_completo} ({tipo_membro}) recusou a escala em {igreja.nome} no dia {item.data} às {item.horario}. Motivo: {motivo}"
-        criar_notificacao(db, pastor.id, 'recusa_escala', 'Recusa de Escala', mensagem, item_id)
-        if pastor.telefone:
-            enviar_notificacao_mock(pastor.telefone, mensagem)
-    if igreja.id_lider:
-        lider = db.query(Usuario).filter(Usuario.id == igreja.id_lider).first()
-        if lider:
-            criar_notificacao(db, lider.id, 'recusa_escala', 'Recusa de Escala', mensagem, item_id)
+    mensagem = f"{usuario_atual.nome_completo} ({tipo_membro}) recusou a escala em {igreja.nome} no dia {item.data} às {item.horario}. Motivo: {motivo}"
+    telefones = dict((await db.execute(select(Usuario.id, Usuario.telefone).where(Usuario.id.in_([distrito.id_pastor, igreja.id_lider])))).all())
+    if distrito.id_pastor in telefones:
+        criar_notificacao(db, distrito.id_pastor, 'recusa_escala', 'Recusa de Escala', mensagem, item_id)
+        if telefones[distrito.id_pastor]:
+            await enfileirar(db, [{"chave_dedup": f"recusa:{item.id}:{usuario_atual.id}", "destino": telefones[distrito.id_pastor], "mensagem": mensagem}])
+    if igreja.id_lider in telefones:
+        criar_notificacao(db, igreja.id_lider, 'recusa_escala', 'Recusa de Escala', mensagem, item_id)
+    await db.commit()
     return {"message": "Participation refused"}
 
 @api_router.post('/schedule-items/{item_id}/cancel')
-async def cancel_participation(item_id: str, motivo: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    item = db.query(ItemEscala).filter(ItemEscala.id == item_id).first()
+async def cancel_participation(item_id: str, motivo: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    item = await db.scalar(select(ItemEscala).where(ItemEscala.id == item_id))
     if not item:
         raise HTTPException(status_code=404, detail="Schedule item not found")
     item_date = datetime.fromisoformat(item.data)
@@ -674,162 +881,296 @@ async def cancel_participation(item_id: str, motivo: str, usuario_atual: Usuario
     if item.id_pregador == usuario_atual.id:
         item.id_pregador = None
     elif usuario_atual.id in (item.ids_cantores or []):
-        item.ids_cantores.remove(usuario_atual.id)
-    db.commit()
+        item.ids_cantores = [id_cantor for id_cantor in item.ids_cantores if id_cantor != usuario_atual.id]
+    await db.commit()
     return {"message": "Participation cancelled"}
 
 @api_router.post('/schedule-items/{item_id}/volunteer')
-async def volunteer_for_slot(item_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    item = db.query(ItemEscala).filter(ItemEscala.id == item_id).first()
+async def volunteer_for_slot(item_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    item = await db.scalar(select(ItemEscala).where(ItemEscala.id == item_id))
     if not item:
         raise HTTPException(status_code=404, detail="Schedule item not found")
     if item.id_pregador:
         raise HTTPException(status_code=400, detail="Slot is already filled")
-    if not usuario_disponivel(db, usuario_atual.id, item.data):
+    if not await db.run_sync(usuario_disponivel, usuario_atual.id, item.data):
         raise HTTPException(status_code=400, detail="You are not available on this date")
-    if slot_ocupado(db, usuario_atual.id, item.data):
+    if await db.run_sync(slot_ocupado, usuario_atual.id, item.data):
         raise HTTPException(status_code=400, detail="You are already scheduled on this date")
     if usuario_atual.eh_pregador:
         item.id_pregador = usuario_atual.id
         item.status = 'confirmado'
-        db.commit()
+        await db.commit()
     else:
         raise HTTPException(status_code=400, detail="You must be a preacher to volunteer")
     return {"message": "Successfully volunteered for slot"}
 
 @api_router.delete('/schedules/{schedule_id}')
-async def delete_schedule(schedule_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+async def delete_schedule(schedule_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     if usuario_atual.funcao not in ['pastor_distrital', 'lider_igreja']:
         raise HTTPException(status_code=403, detail="Permission denied")
-    escala = db.query(Escala).filter(Escala.id == schedule_id).first()
+    escala = await db.scalar(select(Escala).where(Escala.id == schedule_id))
     if escala:
-        db.query(ItemEscala).filter(ItemEscala.id_escala == schedule_id).delete()
-        db.delete(escala)
-        db.commit()
+        # Alcance da exclusão em lote para o cache de disponibilidade e os resumos de analytics
+        escalados = (await db.scalars(select(Atribuicao.id_usuario).join(ItemEscala, ItemEscala.id == Atribuicao.id_item_escala).where(ItemEscala.id_escala == schedule_id).distinct())).all()
+        await db.execute(delete(ItemEscala).where(ItemEscala.id_escala == schedule_id).execution_options(id_distrito=escala.id_distrito, ids_usuarios=escalados))
+        await db.delete(escala)
+        await db.commit()
     return {"message": "Schedule deleted successfully"}
 
 # EVALUATIONS
 @api_router.post('/evaluations', response_model=AvaliacaoResponse)
-async def create_evaluation(eval_data: AvaliacaoCreate, db: Session = Depends(get_db)):
+async def create_evaluation(eval_data: AvaliacaoCreate, db: AsyncSession = Depends(get_db)):
     evaluation = Avaliacao(**eval_data.model_dump())
     db.add(evaluation)
-    db.commit()
-    user = db.query(Usuario).filter(Usuario.id == eval_data.id_usuario_avaliado).first()
-    if user:
-        score_field = 'pontuacao_pregacao' if eval_data.tipo_membro == 'pregador' else 'pontuacao_canto'
-        current_score = getattr(user, score_field, 50.0)
-        rating_impact = (eval_data.nota - 3) * 2
-        new_score = max(0, min(100, current_score + rating_impact))
-        setattr(user, score_field, new_score)
-        db.commit()
-    db.refresh(evaluation)
+    await db.flush()
+    await registrar_avaliacao(db, evaluation)
+    await db.commit()
+    await db.refresh(evaluation)
     return evaluation
 
+@api_router.get('/evaluations/summary/{user_id}')
+async def get_evaluation_summary(user_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    agregados = (await db.scalars(select(PontuacaoMembro).where(PontuacaoMembro.id_usuario == user_id))).all()
+    return [{"tipo_membro": a.tipo_membro, "total_avaliacoes": a.total_avaliacoes, "media": round(a.media, 3), "desvio_padrao": round(a.desvio_padrao, 3), "media_recente": round(a.media_recente, 3), "ultimas_notas": a.ultimas_notas, "ultima_avaliacao_em": a.ultima_avaliacao_em} for a in agregados]
+
 @api_router.get('/evaluations/by-user/{user_id}', response_model=List[AvaliacaoResponse])
-async def get_evaluations_by_user(user_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    return db.query(Avaliacao).filter(Avaliacao.id_usuario_avaliado == user_id).all()
+async def get_evaluations_by_user(user_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(select(Avaliacao).where(Avaliacao.id_usuario_avaliado == user_id))).all()
 
 # NOTIFICATIONS
 @api_router.get('/notifications', response_model=List[NotificacaoResponse])
-async def get_notifications(usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    return db.query(Notificacao).filter(Notificacao.id_usuario == usuario_atual.id).order_by(Notificacao.criado_em.desc()).limit(100).all()
+@orcamento_consultas(3)
+async def get_notifications(usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(select(Notificacao).where(Notificacao.id_usuario == usuario_atual.id).order_by(Notificacao.criado_em.desc()).limit(100))).all()
 
 @api_router.put('/notifications/{notification_id}/read')
-async def mark_notification_read(notification_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    notif = db.query(Notificacao).filter(Notificacao.id == notification_id, Notificacao.id_usuario == usuario_atual.id).first()
+async def mark_notification_read(notification_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    notif = await db.scalar(select(Notificacao).where(Notificacao.id == notification_id, Notificacao.id_usuario == usuario_atual.id))
     if notif:
         notif.status = "lida"
-        db.commit()
+        await db.commit()
     return {"message": "Notification marked as read"}
 
 @api_router.put('/notifications/mark-all-read')
-async def mark_all_notifications_read(usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    db.query(Notificacao).filter(Notificacao.id_usuario == usuario_atual.id, Notificacao.status == "nao_lida").update({"status": "lida"})
-    db.commit()
+async def mark_all_notifications_read(usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    await db.execute(update(Notificacao).where(Notificacao.id_usuario == usuario_atual.id, Notificacao.status == "nao_lida").values(status="lida"))
+    await db.commit()
     return {"message": "All notifications marked as read"}
 
+@api_router.get('/notifications/unread-count')
+@orcamento_consultas(3)
+async def get_unread_notifications_count(usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    return {"nao_lidas": await db.scalar(select(Usuario.notificacoes_nao_lidas).where(Usuario.id == usuario_atual.id))}
+
+@api_router.post('/notifications/stream-token')
+async def create_stream_token(usuario_atual: Usuario = Depends(get_usuario_atual)):
+    # EventSource não envia cabeçalhos: o stream recebe na query string este token
+    # de vida curta, que só serve para abrir o stream, e não o token de acesso
+    token = create_access_token({"sub": usuario_atual.id, "escopo": ESCOPO_STREAM}, timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS))
+    return {"token": token, "expira_em": STREAM_TOKEN_EXPIRE_SECONDS}
+
+@api_router.get('/notifications/stream')
+async def stream_notifications(request: Request, token: str):
+    # `token` vem de POST /notifications/stream-token. A sessão é fechada antes
+    # do stream para não prender uma conexão do pool
+    async with AsyncSessionLocal() as db:
+        usuario = await autenticar(token, db, escopo=ESCOPO_STREAM)
+        id_usuario = usuario.id
+        nao_lidas = await db.scalar(select(Usuario.notificacoes_nao_lidas).where(Usuario.id == id_usuario))
+    fila = await difusor.inscrever(id_usuario)
+
+    async def eventos():
+        try:
+            yield formatar_evento('contagem', {"nao_lidas": nao_lidas})
+            while not await request.is_disconnected():
+                try:
+                    notificacao = await asyncio.wait_for(fila.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    await difusor.garantir_conexao()
+                    yield ": keep-alive\n\n"
+                    continue
+                yield formatar_evento('notificacao', notificacao, notificacao.get('id'))
+        finally:
+            difusor.cancelar(id_usuario, fila)
+
+    return StreamingResponse(eventos(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # SUBSTITUTIONS
 @api_router.post('/substitutions')
-async def create_substitution_request(sub_data: SolicitacaoTrocaCreate, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+async def create_substitution_request(sub_data: SolicitacaoTrocaCreate, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     substitution = SolicitacaoTroca(**sub_data.model_dump(), id_solicitante=usuario_atual.id)
     db.add(substitution)
-    db.commit()
+    await db.flush()
     criar_notificacao(db, sub_data.id_usuario_alvo, 'solicitacao_troca', 'Solicitação de Troca de Escala', f"{usuario_atual.nome_completo} solicitou trocar a escala com você. Motivo: {sub_data.motivo}", substitution.id)
+    await db.commit()
     return {"message": "Substitution request created"}
 
 @api_router.post('/substitutions/{sub_id}/accept')
-async def accept_substitution(sub_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    sub = db.query(SolicitacaoTroca).filter(SolicitacaoTroca.id == sub_id).first()
+async def accept_substitution(sub_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    sub = await db.scalar(select(SolicitacaoTroca).where(SolicitacaoTroca.id == sub_id))
     if not sub or sub.id_usuario_alvo != usuario_atual.id:
         raise HTTPException(status_code=403, detail="Permission denied")
     sub.status = "aceita"
     sub.respondido_em = datetime.now(timezone.utc)
-    item = db.query(ItemEscala).filter(ItemEscala.id == sub.id_item_escala_original).first()
+    item = await db.scalar(select(ItemEscala).where(ItemEscala.id == sub.id_item_escala_original))
     if item:
         if item.id_pregador == sub.id_solicitante:
             item.id_pregador = usuario_atual.id
         elif sub.id_solicitante in (item.ids_cantores or []):
-            item.ids_cantores.remove(sub.id_solicitante)
-            item.ids_cantores.append(usuario_atual.id)
-    db.commit()
+            item.ids_cantores = [usuario_atual.id if id_cantor == sub.id_solicitante else id_cantor for id_cantor in item.ids_cantores]
     criar_notificacao(db, sub.id_solicitante, 'troca_aceita', 'Troca Aceita', f"Sua solicitação de troca foi aceita por {usuario_atual.nome_completo}", sub_id)
+    await db.commit()
     return {"message": "Substitution accepted"}
 
 @api_router.post('/substitutions/{sub_id}/reject')
-async def reject_substitution(sub_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    sub = db.query(SolicitacaoTroca).filter(SolicitacaoTroca.id == sub_id).first()
+async def reject_substitution(sub_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    sub = await db.scalar(select(SolicitacaoTroca).where(SolicitacaoTroca.id == sub_id))
     if not sub or sub.id_usuario_alvo != usuario_atual.id:
         raise HTTPException(status_code=403, detail="Permission denied")
     sub.status = "rejeitada"
     sub.respondido_em = datetime.now(timezone.utc)
-    db.commit()
     criar_notificacao(db, sub.id_solicitante, 'troca_rejeitada', 'Troca Recusada', f"Sua solicitação de troca foi recusada por {usuario_atual.nome_completo}", sub_id)
+    await db.commit()
     return {"message": "Substitution rejected"}
 
 @api_router.get('/substitutions/pending')
-async def get_pending_substitutions(usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    return db.query(SolicitacaoTroca).filter(SolicitacaoTroca.id_usuario_alvo == usuario_atual.id, SolicitacaoTroca.status == "pendente").all()
+async def get_pending_substitutions(usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(select(SolicitacaoTroca).where(SolicitacaoTroca.id_usuario_alvo == usuario_atual.id, SolicitacaoTroca.status == "pendente"))).all()
 
 # DELEGATIONS
 @api_router.post('/delegations')
-async def create_delegation(delegation_data: DelegacaoCreate, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+async def create_delegation(delegation_data: DelegacaoCreate, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     if usuario_atual.funcao != 'pastor_distrital':
         raise HTTPException(status_code=403, detail="Only Pastor Distrital can delegate")
     delegation = Delegacao(**delegation_data.model_dump(), id_delegado_por=usuario_atual.id)
     db.add(delegation)
-    db.commit()
+    await db.commit()
     return {"message": "Delegation created"}
 
 @api_router.get('/delegations')
-async def get_delegations(id_distrito: Optional[str] = None, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
-    query = db.query(Delegacao).filter(Delegacao.ativo == True)
+async def get_delegations(id_distrito: Optional[str] = None, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    query = select(Delegacao).where(Delegacao.ativo == True)
     if id_distrito:
-        query = query.filter(Delegacao.id_distrito == id_distrito)
-    return query.all()
+        query = query.where(Delegacao.id_distrito == id_distrito)
+    return (await db.scalars(query)).all()
 
 @api_router.delete('/delegations/{delegation_id}')
-async def delete_delegation(delegation_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+async def delete_delegation(delegation_id: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     if usuario_atual.funcao != 'pastor_distrital':
         raise HTTPException(status_code=403, detail="Permission denied")
-    delegation = db.query(Delegacao).filter(Delegacao.id == delegation_id).first()
+    delegation = await db.scalar(select(Delegacao).where(Delegacao.id == delegation_id))
     if delegation:
         delegation.ativo = False
-        db.commit()
+        await db.commit()
     return {"message": "Delegation deleted"}
 
+# EXPORTS
+def distrito_da_exportacao(usuario_atual: Usuario, id_distrito: Optional[str]) -> Optional[str]:
+    if usuario_atual.funcao not in ['pastor_distrital', 'lider_igreja']:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    if usuario_atual.funcao != 'pastor_distrital':
+        return usuario_atual.id_distrito
+    return id_distrito
+
+def validar_periodo(data_inicio: Optional[str], data_fim: Optional[str]):
+    try:
+        for valor in (data_inicio, data_fim):
+            if valor:
+                datetime.strptime(valor, '%Y-%m-%d')
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+
+def resposta_exportacao(consulta, formato: str, nome: str) -> StreamingResponse:
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail="Unknown format")
+    extensao = 'csv' if formato == 'csv' else 'ndjson'
+    return StreamingResponse(exportar(consulta, formato), media_type=FORMATOS[formato], headers={"Content-Disposition": f'attachment; filename="{nome}.{extensao}"'})
+
+@api_router.get('/export/schedules')
+async def export_schedules(formato: str = 'ndjson', ano: Optional[int] = None, mes: Optional[int] = None, id_distrito: Optional[str] = None, usuario_atual: Usuario = Depends(get_usuario_atual)):
+    id_distrito = distrito_da_exportacao(usuario_atual, id_distrito)
+    return resposta_exportacao(consulta_itens_escala(id_distrito, ano, mes), formato, 'escalas')
+
+@api_router.get('/export/evaluations')
+async def export_evaluations(formato: str = 'ndjson', data_inicio: Optional[str] = None, data_fim: Optional[str] = None, id_distrito: Optional[str] = None, usuario_atual: Usuario = Depends(get_usuario_atual)):
+    id_distrito = distrito_da_exportacao(usuario_atual, id_distrito)
+    # Validar antes do streaming: depois do status 200 um erro do banco só truncaria o arquivo
+    validar_periodo(data_inicio, data_fim)
+    return resposta_exportacao(consulta_avaliacoes(id_distrito, data_inicio, data_fim), formato, 'avaliacoes')
+
 # ANALYTICS
+def resposta_com_etag(request: Request, dados, etag: str) -> Response:
+    cabecalhos = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers=cabecalhos)
+    return JSONResponse(jsonable_encoder(dados), headers=cabecalhos)
+
 @api_router.get('/analytics/dashboard')
-async def get_analytics_dashboard(id_distrito: str, usuario_atual: Usuario = Depends(get_usuario_atual), db: Session = Depends(get_db)):
+@orcamento_consultas(20)
+async def get_analytics_dashboard(id_distrito: str, request: Request, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
     if usuario_atual.funcao != 'pastor_distrital':
         raise HTTPException(status_code=403, detail="Permission denied")
-    total_igrejas = db.query(Igreja).filter(Igreja.id_distrito == id_distrito, Igreja.ativo == True).count()
-    total_pregadores = db.query(Usuario).filter(Usuario.id_distrito == id_distrito, Usuario.eh_pregador == True, Usuario.ativo == True).count()
-    total_cantores = db.query(Usuario).filter(Usuario.id_distrito == id_distrito, Usuario.eh_cantor == True, Usuario.ativo == True).count()
-    pregadores = db.query(Usuario).filter(Usuario.id_distrito == id_distrito, Usuario.eh_pregador == True, Usuario.ativo == True).order_by(Usuario.pontuacao_pregacao.desc()).limit(10).all()
-    avaliacoes = db.query(Avaliacao).order_by(Avaliacao.criado_em.desc()).limit(20).all()
-    return {"total_igrejas": total_igrejas, "total_pregadores": total_pregadores, "total_cantores": total_cantores, "top_pregadores": pregadores, "avaliacoes_recentes": avaliacoes}
+    dados, etag, recalculou = await db.run_sync(painel, id_distrito)
+    if dados is None:
+        raise HTTPException(status_code=404, detail="District not found")
+    if recalculou:
+        await db.commit()
+    return resposta_com_etag(request, dados, etag)
+
+RELATORIOS = {'participation': 'participacao', 'confirmation-latency': 'latencia_confirmacao', 'scores': 'distribuicao_notas', 'coverage': 'cobertura'}
+
+@api_router.get('/analytics/report')
+@orcamento_consultas(25)
+async def get_analytics_report(id_distrito: str, request: Request, data_inicio: Optional[str] = None, data_fim: Optional[str] = None, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    if usuario_atual.funcao != 'pastor_distrital':
+        raise HTTPException(status_code=403, detail="Permission denied")
+    validar_periodo(data_inicio, data_fim)
+    relatorio, etag = await gerar_relatorio(db, id_distrito, data_inicio, data_fim)
+    if relatorio is None:
+        raise HTTPException(status_code=404, detail="District not found")
+    return resposta_com_etag(request, relatorio, etag)
+
+@api_router.get('/analytics/report/{secao}')
+@orcamento_consultas(25)
+async def get_analytics_report_section(secao: str, id_distrito: str, request: Request, data_inicio: Optional[str] = None, data_fim: Optional[str] = None, usuario_atual: Usuario = Depends(get_usuario_atual), db: AsyncSession = Depends(get_db)):
+    if usuario_atual.funcao != 'pastor_distrital':
+        raise HTTPException(status_code=403, detail="Permission denied")
+    if secao not in RELATORIOS:
+        raise HTTPException(status_code=404, detail="Unknown report")
+    validar_periodo(data_inicio, data_fim)
+    relatorio, etag = await gerar_relatorio(db, id_distrito, data_inicio, data_fim)
+    if relatorio is None:
+        raise HTTPException(status_code=404, detail="District not found")
+    return resposta_com_etag(request, relatorio[RELATORIOS[secao]], etag)
+
+# METRICS
+@api_router.get('/metrics/db')
+async def get_db_metrics(usuario_atual: Usuario = Depends(get_usuario_atual)):
+    if usuario_atual.funcao != 'pastor_distrital':
+        raise HTTPException(status_code=403, detail="Permission denied")
+    return {**metrics.snapshot(), "sse_conectados": difusor.conectados}
+
+@api_router.get('/metrics/profiles')
+async def get_slow_profiles(usuario_atual: Usuario = Depends(get_usuario_atual)):
+    if usuario_atual.funcao != 'pastor_distrital':
+        raise HTTPException(status_code=403, detail="Permission denied")
+    return perfis_lentos()
+
+@app.get('/metrics', include_in_schema=False)
+async def get_prometheus_metrics(request: Request):
+    if METRICS_TOKEN and request.headers.get('authorization') != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.exposicao_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.on_event('shutdown')
+async def fechar_difusor():
+    await difusor.fechar()
+
+@app.on_event('shutdown')
+async def fechar_pool_geracao():
+    encerrar_pool()
 
 app.include_router(api_router)
-app.add_middleware(CORSMiddleware, allow_credentials=True, allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','), allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(CORSMiddleware, allow_credentials=True, allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','), allow_methods=["*"], allow_headers=["*"], expose_headers=["X-Next-Cursor", "X-Query-Count", "ETag"])
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -0,0 +1,234 @@
+"""
+Dados sintéticos em grande volume
+
+Cria N distritos com M igrejas cada e K membros por igreja (pregadores e
+cantores em proporções realistas), períodos de indisponibilidade e anos de
+escalas, itens, atribuições, avaliações e notificações, tudo carregado com
+COPY. Um distrito por vez, para a memória não crescer com o volume.
+
+Cada distrito ganha um pastor '<prefixo>.pastor<N>' e cada igreja um líder
+'<prefixo>.lider<N>.<M>', todos com a mesma senha (um único hash). Ao final
+as pontuações são recalculadas a partir das avaliações geradas.
+
+Usado por scripts/generate_synthetic_data.py e pelos benchmarks de
+tests/benchmarks.
+"""
+import csv
+import io
+import json
+import random
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from sqlalchemy.engine import Engine
+
+from database import SessionLocal
+from models import atribuicoes_do_item, gerar_uuid
+from passwords import pwd_context
+from planner import IgrejaPlano, cultos_do_mes
+from scores import recalcular_pontuacoes
+
+HORARIOS_CULTO = [
+    [{"dia_semana": "quarta", "horario": "19:30"}, {"dia_semana": "sabado", "horario": "09:00"}],
+    [{"dia_semana": "sabado", "horario": "10:00"}, {"dia_semana": "domingo", "horario": "19:00"}],
+    [{"dia_semana": "quarta", "horario": "20:00"}, {"dia_semana": "sabado", "horario": "09:30"}, {"dia_semana": "domingo", "horario": "18:30"}],
+]
+NOMES = ["Ana", "Bruno", "Carla", "Daniel", "Elisa", "Fábio", "Gabriela", "Hugo", "Isabel", "João", "Karina", "Lucas", "Marta", "Nelson", "Olívia", "Paulo", "Raquel", "Samuel", "Tânia", "Vítor"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Lima", "Costa", "Ferreira", "Alves", "Pereira", "Rodrigues", "Martins", "Araújo"]
+PESOS_NOTAS = [2, 5, 18, 40, 35]  # notas 1 a 5
+
+
+@dataclass
+class ParametrosSinteticos:
+    distritos: int = 5
+    igrejas: int = 10  # por distrito
+    membros: int = 30  # por igreja, além do líder
+    anos: int = 2
+    ano_inicial: int = field(default_factory=lambda: date.today().year - 1)
+    prefixo: str = 'sint'  # nomes de usuário precisam ser únicos no banco
+    senha: str = 'senha123'
+    semente: int = 42
+
+
+class Tabela:
+    """Linhas de uma tabela acumuladas em CSV para um COPY."""
+
+    def __init__(self, nome: str, colunas: list):
+        self.nome = nome
+        self.colunas = colunas
+        self.total = 0
+        self._buffer = io.StringIO()
+        self._escritor = csv.writer(self._buffer)
+
+    def adicionar(self, **valores):
+        self._escritor.writerow([_valor_csv(valores.get(coluna)) for coluna in self.colunas])
+        self.total += 1
+
+    def copiar(self, cursor):
+        self._buffer.seek(0)
+        cursor.copy_expert(f"COPY {self.nome} ({', '.join(self.colunas)}) FROM STDIN WITH (FORMAT csv)", self._buffer)
+        self._buffer = io.StringIO()
+        self._escritor = csv.writer(self._buffer)
+
+
+def _valor_csv(valor):
+    if isinstance(valor, (list, dict)):
+        return json.dumps(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return valor  # None vira campo vazio sem aspas, que o COPY lê como NULL
+
+
+def novas_tabelas() -> dict:
+    return {
+        'distritos': Tabela('distritos', ['id', 'nome', 'ativo']),
+        'igrejas': Tabela('igrejas', ['id', 'nome', 'id_distrito', 'endereco', 'latitude', 'longitude', 'horarios_culto', 'ativo']),
+        'usuarios': Tabela('usuarios', ['id', 'nome_usuario', 'senha_hash', 'nome_completo', 'email', 'telefone', 'funcao', 'id_distrito', 'id_igreja', 'eh_pregador', 'eh_cantor', 'pontuacao_pregacao', 'pontuacao_canto', 'periodos_indisponibilidade', 'ativo']),
+        'periodos_indisponibilidade': Tabela('periodos_indisponibilidade', ['id', 'id_usuario', 'data_inicio', 'data_fim']),
+        'escalas': Tabela('escalas', ['id', 'mes', 'ano', 'id_igreja', 'id_distrito', 'modo_geracao', 'status', 'criado_em']),
+        'itens_escala': Tabela('itens_escala', ['id', 'id_escala', 'data', 'horario', 'id_pregador', 'ids_cantores', 'status', 'motivo_recusa', 'confirmado_em', 'cancelado_em', 'criado_em']),
+        'atribuicoes': Tabela('atribuicoes', ['id', 'id_item_escala', 'id_usuario', 'papel', 'data']),
+        'avaliacoes': Tabela('avaliacoes', ['id', 'id_item_escala', 'id_igreja', 'tipo_membro', 'id_usuario_avaliado', 'nota', 'criado_em']),
+        'notificacoes': Tabela('notificacoes', ['id', 'id_usuario', 'tipo', 'titulo', 'mensagem', 'id_relacionado', 'status', 'criado_em']),
+    }
+
+
+def gerar_distrito(tabelas: dict, args: ParametrosSinteticos, indice: int, senha_hash: str, rng: random.Random, hoje: date) -> str:
+    id_distrito = gerar_uuid()
+    tabelas['distritos'].adicionar(id=id_distrito, nome=f"Distrito Sintético {indice}", ativo=True)
+
+    membros = []
+    def novo_usuario(nome_usuario, funcao, id_igreja, eh_pregador, eh_cantor):
+        usuario = {
+            'id': gerar_uuid(), 'nome_usuario': nome_usuario, 'senha_hash': senha_hash,
+            'nome_completo': f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}", 'email': f"{nome_usuario}@example.com",
+            'telefone': f"+55{rng.randint(11, 99)}9{rng.randint(10000000, 99999999)}", 'funcao': funcao,
+            'id_distrito': id_distrito, 'id_igreja': id_igreja, 'eh_pregador': eh_pregador, 'eh_cantor': eh_cantor,
+            'pontuacao_pregacao': 50.0, 'pontuacao_canto': 50.0, 'periodos_indisponibilidade': [], 'ativo': rng.random() > 0.02 or funcao != 'membro',
+        }
+        tabelas['usuarios'].adicionar(**usuario)
+        membros.append(usuario)
+        return usuario
+
+    novo_usuario(f"{args.prefixo}.pastor{indice}", 'pastor_distrital', None, True, False)
+    igrejas = []
+    for i in range(args.igrejas):
+        igreja = {'id': gerar_uuid(), 'nome': f"Igreja Sintética {indice}-{i}", 'horarios_culto': rng.choice(HORARIOS_CULTO)}
+        tabelas['igrejas'].adicionar(**igreja, id_distrito=id_distrito, endereco=f"Rua {rng.choice(SOBRENOMES)}, {rng.randint(1, 2000)}", latitude=round(-23.5 + rng.uniform(-0.5, 0.5), 6), longitude=round(-46.6 + rng.uniform(-0.5, 0.5), 6), ativo=True)
+        igrejas.append(igreja)
+        novo_usuario(f"{args.prefixo}.lider{indice}.{i}", 'lider_igreja', igreja['id'], rng.random() < 0.7, rng.random() < 0.3)
+        for m in range(args.membros):
+            eh_pregador = rng.random() < 0.3
+            eh_cantor = rng.random() < (0.15 if eh_pregador else 0.25)
+            funcao = 'pregador' if eh_pregador else 'cantor' if eh_cantor else 'membro'
+            novo_usuario(f"{args.prefixo}.m{indice}.{i}.{m}", funcao, igreja['id'], eh_pregador, eh_cantor)
+
+    inicio = date(args.ano_inicial, 1, 1)
+    fim = date(args.ano_inicial + args.anos, 1, 1)
+    indisponivel = {}
+    for membro in membros:
+        if rng.random() < 0.35:
+            for _ in range(rng.randint(1, 2 * args.anos)):
+                comeco = inicio + timedelta(days=rng.randrange((fim - inicio).days))
+                termino = comeco + timedelta(days=rng.randint(2, 21))
+                tabelas['periodos_indisponibilidade'].adicionar(id=gerar_uuid(), id_usuario=membro['id'], data_inicio=comeco, data_fim=termino)
+                indisponivel.setdefault(membro['id'], []).append((comeco.isoformat(), termino.isoformat()))
+
+    ativos = [membro for membro in membros if membro['ativo']]
+    pregadores = [membro['id'] for membro in ativos if membro['eh_pregador']] or [ativos[0]['id']]
+    cantores = [membro['id'] for membro in ativos if membro['eh_cantor']]
+    habilidade = {membro['id']: rng.gauss(0, 0.8) for membro in ativos}  # desloca as notas de cada membro
+
+    def disponivel(id_usuario, data):
+        return not any(comeco <= data <= termino for comeco, termino in indisponivel.get(id_usuario, ()))
+
+    for ano in range(args.ano_inicial, args.ano_inicial + args.anos):
+        for mes in range(1, 13):
+            criado_em = datetime(ano, mes, 1, 9, tzinfo=timezone.utc) - timedelta(days=rng.randint(5, 20))
+            passado = date(ano, mes, 1) < hoje.replace(day=1)
+            for igreja in igrejas:
+                id_escala = gerar_uuid()
+                status_escala = rng.choice(['confirmada', 'ativa']) if passado else rng.choice(['rascunho', 'confirmada'])
+                tabelas['escalas'].adicionar(id=id_escala, mes=mes, ano=ano, id_igreja=igreja['id'], id_distrito=id_distrito, modo_geracao='automatico', status=status_escala, criado_em=criado_em)
+                for data, horario in cultos_do_mes(IgrejaPlano(id=igreja['id'], nome=igreja['nome'], horarios_culto=igreja['horarios_culto']), ano, mes):
+                    candidatos = [id_usuario for id_usuario in rng.sample(pregadores, min(5, len(pregadores))) if disponivel(id_usuario, data)]
+                    id_pregador = candidatos[0] if candidatos else None
+                    ids_cantores = [id_usuario for id_usuario in rng.sample(cantores, min(rng.randint(0, 2), len(cantores))) if disponivel(id_usuario, data)]
+                    if passado:
+                        status = rng.choices(['completado', 'confirmado', 'recusado', 'cancelado'], weights=[80, 8, 8, 4])[0]
+                    else:
+                        status = rng.choices(['pendente', 'confirmado', 'recusado'], weights=[60, 35, 5])[0] if status_escala != 'rascunho' else 'pendente'
+                    confirmado_em = criado_em + timedelta(hours=rng.expovariate(1 / 30)) if status in ('confirmado', 'completado') else None
+                    cancelado_em = criado_em + timedelta(days=rng.randint(1, 20)) if status == 'cancelado' else None
+                    id_item = gerar_uuid()
+                    tabelas['itens_escala'].adicionar(id=id_item, id_escala=id_escala, data=data, horario=horario, id_pregador=id_pregador, ids_cantores=ids_cantores, status=status, motivo_recusa='Compromisso pessoal' if status == 'recusado' else None, confirmado_em=confirmado_em, cancelado_em=cancelado_em, criado_em=criado_em)
+                    for id_usuario, papel in atribuicoes_do_item(id_pregador, ids_cantores):
+                        tabelas['atribuicoes'].adicionar(id=gerar_uuid(), id_item_escala=id_item, id_usuario=id_usuario, papel=papel, data=data)
+                        if status_escala != 'rascunho':
+                            tabelas['notificacoes'].adicionar(id=gerar_uuid(), id_usuario=id_usuario, tipo='atribuicao_escala', titulo='Nova Escala de Pregação' if papel == 'pregador' else 'Nova Escala de Louvor', mensagem=f"Você foi escalado para {data} às {horario}", id_relacionado=id_item, status='lida' if passado or rng.random() < 0.5 else 'nao_lida', criado_em=criado_em)
+                        if status == 'completado' and rng.random() < (0.6 if papel == 'pregador' else 0.3):
+                            nota = min(5, max(1, rng.choices(range(1, 6), weights=PESOS_NOTAS)[0] + round(habilidade[id_usuario])))
+                            tabelas['avaliacoes'].adicionar(id=gerar_uuid(), id_item_escala=id_item, id_igreja=igreja['id'], tipo_membro=papel, id_usuario_avaliado=id_usuario, nota=nota, criado_em=datetime.fromisoformat(data).replace(hour=21, tzinfo=timezone.utc) + timedelta(days=rng.randint(0, 3)))
+    return id_distrito
+
+
+def carregar(conexao, tabelas: dict, ids_distritos: list):
+    cursor = conexao.cursor()
+    # Os gatilhos de notificacoes disparariam um pg_notify por linha; o contador é recalculado abaixo
+    cursor.execute("ALTER TABLE notificacoes DISABLE TRIGGER notificacoes_inserir")
+    for tabela in tabelas.values():
+        tabela.copiar(cursor)
+    cursor.execute("ALTER TABLE notificacoes ENABLE TRIGGER notificacoes_inserir")
+    cursor.execute("""
+        UPDATE distritos d SET id_pastor = u.id FROM usuarios u
+        WHERE u.id_distrito = d.id AND u.funcao = 'pastor_distrital' AND d.id = ANY(%(ids)s)
+    """, {'ids': ids_distritos})
+    cursor.execute("""
+        UPDATE igrejas i SET id_lider = u.id FROM usuarios u
+        WHERE u.id_igreja = i.id AND u.funcao = 'lider_igreja' AND i.id_distrito = ANY(%(ids)s)
+    """, {'ids': ids_distritos})
+    cursor.execute("""
+        UPDATE usuarios u SET notificacoes_nao_lidas = coalesce((
+            SELECT count(*) FROM notificacoes n WHERE n.id_usuario = u.id AND n.status = 'nao_lida'
+        ), 0)
+        WHERE u.id_distrito = ANY(%(ids)s)
+    """, {'ids': ids_distritos})
+    conexao.commit()
+
+
+def gerar_dados(engine: Engine, parametros: ParametrosSinteticos, ao_carregar: Optional[Callable[[int, str], None]] = None) -> Dict[str, int]:
+    """Gera e carrega os distritos; devolve o total de linhas por tabela.
+
+    `ao_carregar(indice, id_distrito)` é chamado depois do COPY de cada distrito.
+    """
+    rng = random.Random(parametros.semente)
+    hoje = date.today()
+    senha_hash = pwd_context.hash(parametros.senha)
+    totais: Dict[str, int] = {}
+    conexao = engine.raw_connection()
+    try:
+        for indice in range(parametros.distritos):
+            tabelas = novas_tabelas()
+            id_distrito = gerar_distrito(tabelas, parametros, indice, senha_hash, rng, hoje)
+            carregar(conexao, tabelas, [id_distrito])
+            for nome, tabela in tabelas.items():
+                totais[nome] = totais.get(nome, 0) + tabela.total
+            if ao_carregar:
+                ao_carregar(indice, id_distrito)
+    except Exception:
+        conexao.rollback()
+        raise
+    finally:
+        conexao.close()
+
+    db = SessionLocal()
+    try:
+        recalcular_pontuacoes(db, redefinir_pontuacoes=True)  # todos os membros gerados partem de 50
+        db.commit()
+    finally:
+        db.close()
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+        conn.commit()
+    return totais
@@ -18,6 +18,45 @@ export default function Notifications() {
     loadNotifications();
   }, []);
 
+  // Novas notificações chegam pelo stream SSE, sem recarregar a lista. O
+  // EventSource não envia cabeçalhos: o stream é aberto com um token de vida
+  // curta, pedido de novo a cada reconexão, e nunca com o token de acesso
+  useEffect(() => {
+    if (!localStorage.getItem('token')) return;
+    let source = null;
+    let retry = null;
+    let closed = false;
+
+    const connect = async () => {
+      try {
+        const response = await axios.post(`${API}/notifications/stream-token`);
+        if (closed) return;
+        source = new EventSource(`${API}/notifications/stream?token=${encodeURIComponent(response.data.token)}`);
+        source.addEventListener('notificacao', (event) => {
+          const notification = JSON.parse(event.data);
+          setNotifications((current) =>
+            current.some(n => n.id === notification.id) ? current : [notification, ...current]
+          );
+        });
+        source.onerror = () => {
+          // Com o token vencido o navegador desiste de reconectar sozinho
+          if (source.readyState === EventSource.CLOSED && !closed) {
+            retry = setTimeout(connect, 5000);
+          }
+        };
+      } catch (error) {
+        if (!closed) retry = setTimeout(connect, 30000);
+      }
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      if (source) source.close();
+    };
+  }, []);
+
   const loadNotifications = async () => {
     try {
       const response = await axios.get(`${API}/notifications`);
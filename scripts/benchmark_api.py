@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark das rotas principais da API
+
+Atalho para a suíte de tests/benchmarks (pytest-benchmark): carrega dados
+sintéticos no banco de teste (TEST_DATABASE_URL, recriado a cada execução)
+e mede, com o número de consultas de cada rota:
+
+- login               POST /api/auth/login
+- listar_escalas      GET  /api/schedules?id_distrito=...&limite=50
+- gerar_escala        POST /api/schedules/generate-auto (um mês novo por rodada)
+- confirmar_escala    POST /api/schedules/{id}/confirm (uma escala gerada por rodada)
+- notificacoes        GET  /api/notifications (o membro com mais notificações)
+- painel              GET  /api/analytics/dashboard
+- painel_304          o mesmo com If-None-Match
+
+Os resultados podem ser salvos e comparados entre execuções; com --limite, a
+comparação termina com erro se a mediana de algum cenário piorar mais que o
+limite:
+
+    python scripts/benchmark_api.py --salvar antes
+    python scripts/benchmark_api.py --comparar --limite 20
+
+Argumentos não reconhecidos são repassados ao pytest.
+
+Uso: python scripts/benchmark_api.py --distritos 5 --igrejas 20 --json resultados.json
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).parent.parent
+CENARIOS = {
+    'login': 'test_login',
+    'listar_escalas': 'test_listar_escalas',
+    'gerar_escala': 'test_gerar_escala',
+    'confirmar_escala': 'test_confirmar_escala',
+    'notificacoes': 'test_listar_notificacoes',
+    'painel': 'test_painel_de_analytics and not 304',
+    'painel_304': 'test_painel_de_analytics_304',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cenario', action='append', choices=list(CENARIOS), help="Cenário a executar (repita para vários; padrão: todos)")
+    parser.add_argument('--distritos', type=int, help="Distritos sintéticos (BENCHMARK_DISTRITOS)")
+    parser.add_argument('--igrejas', type=int, help="Igrejas por distrito (BENCHMARK_IGREJAS)")
+    parser.add_argument('--membros', type=int, help="Membros por igreja (BENCHMARK_MEMBROS)")
+    parser.add_argument('--anos', type=int, help="Anos de escalas (BENCHMARK_ANOS)")
+    parser.add_argument('--json', help="Arquivo para salvar os resultados")
+    parser.add_argument('--salvar', metavar='NOME', help="Guardar a execução em .benchmarks para comparar depois")
+    parser.add_argument('--comparar', nargs='?', const='', metavar='ID', help="Comparar com uma execução guardada (padrão: a última)")
+    parser.add_argument('--limite', type=float, help="Com --comparar: piora máxima aceita na mediana (%%)")
+    args, extras = parser.parse_known_args()
+
+    ambiente = dict(os.environ)
+    for nome in ('distritos', 'igrejas', 'membros', 'anos'):
+        if getattr(args, nome) is not None:
+            ambiente[f'BENCHMARK_{nome.upper()}'] = str(getattr(args, nome))
+
+    comando = [sys.executable, '-m', 'pytest', 'tests/benchmarks', '--benchmarks', '-q']
+    if args.cenario:
+        comando += ['-k', ' or '.join(f'({CENARIOS[cenario]})' for cenario in args.cenario)]
+    if args.json:
+        comando.append(f'--benchmark-json={args.json}')
+    if args.salvar:
+        comando.append(f'--benchmark-save={args.salvar}')
+    if args.comparar is not None:
+        comando.append(f'--benchmark-compare={args.comparar}' if args.comparar else '--benchmark-compare')
+        if args.limite is not None:
+            comando.append(f'--benchmark-compare-fail=median:{args.limite:g}%')
+    comando += extras
+
+    print(f"⏱️  {' '.join(comando[1:])}")
+    codigo = subprocess.call(comando, cwd=RAIZ, env=ambiente)
+    if codigo != 0:
+        print("❌ Benchmark falhou ou houve regressão acima do limite")
+    sys.exit(codigo)
+
+
+if __name__ == "__main__":
+    main()
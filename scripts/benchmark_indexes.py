@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos índices das consultas mais usadas
+
+Popula o banco com um volume grande de dados sintéticos, mede as consultas
+quentes sem os índices da migração 0001 e depois com eles, mostrando o
+plano (EXPLAIN ANALYZE) e o tempo mediano de cada consulta.
+
+Use um banco dedicado: os dados gerados são adicionados ao DATABASE_URL.
+
+Uso: python scripts/benchmark_indexes.py --distritos 20 --igrejas 25 --membros 300 --meses 24
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / 'backend'))
+
+from sqlalchemy import insert, text
+from database import engine, Base
+from models import Usuario, Distrito, Igreja, Escala, ItemEscala, Avaliacao, Notificacao, gerar_uuid
+from planner import IgrejaPlano, cultos_do_mes
+
+INDICES = ['ix_escalas_distrito_ano_mes', 'ix_itens_escala_id_escala', 'ix_itens_escala_data_status', 'ix_notificacoes_usuario_status_criado', 'ix_notificacoes_nao_lidas', 'ix_usuarios_distrito_pregador_ativo', 'ix_avaliacoes_id_usuario_avaliado']
+RESTRICOES = {'uq_escalas_igreja_mes_ano': 'escalas'}
+
+CONSULTAS = {
+    'ocupacao_por_data': ("SELECT i.id, i.id_pregador, i.ids_cantores FROM itens_escala i JOIN escalas e ON e.id = i.id_escala WHERE e.status IN ('confirmada', 'ativa') AND i.status IN ('confirmado', 'pendente') AND i.data = :data", 'data'),
+    'escala_da_igreja': ("SELECT id FROM escalas WHERE id_igreja = :id_igreja AND mes = :mes AND ano = :ano", 'igreja'),
+    'itens_da_escala': ("SELECT * FROM itens_escala WHERE id_escala = :id_escala", 'escala'),
+    'notificacoes_do_usuario': ("SELECT * FROM notificacoes WHERE id_usuario = :id_usuario ORDER BY criado_em DESC LIMIT 100", 'usuario'),
+    'nao_lidas_do_usuario': ("SELECT count(*) FROM notificacoes WHERE id_usuario = :id_usuario AND status = 'nao_lida'", 'usuario'),
+    'pregadores_do_distrito': ("SELECT * FROM usuarios WHERE id_distrito = :id_distrito AND eh_pregador = true AND ativo = true", 'distrito'),
+    'avaliacoes_do_usuario': ("SELECT * FROM avaliacoes WHERE id_usuario_avaliado = :id_usuario", 'usuario'),
+}
+
+
+def popular(conn, num_distritos: int, num_igrejas: int, num_membros: int, num_meses: int, rng: random.Random):
+    print(f"🌱 Gerando {num_distritos} distritos × {num_igrejas} igrejas × {num_membros} membros, {num_meses} meses...")
+    for d in range(num_distritos):
+        id_distrito = gerar_uuid()
+        conn.execute(insert(Distrito), [{'id': id_distrito, 'nome': f"Distrito {d}"}])
+        igrejas = [{'id': gerar_uuid(), 'nome': f"Igreja {d}-{i}", 'id_distrito': id_distrito, 'horarios_culto': [{"dia_semana": "quarta", "horario": "19:00"}, {"dia_semana": "sabado", "horario": "09:00"}]} for i in range(num_igrejas)]
+        conn.execute(insert(Igreja), igrejas)
+        membros = [{'id': gerar_uuid(), 'nome_usuario': f"membro-{d}-{m}-{gerar_uuid()[:8]}", 'senha_hash': 'x', 'nome_completo': f"Membro {d}-{m}", 'funcao': 'membro', 'id_distrito': id_distrito, 'id_igreja': rng.choice(igrejas)['id'], 'eh_pregador': rng.random() < 0.3, 'eh_cantor': rng.random() < 0.2, 'ativo': True} for m in range(num_membros)]
+        conn.execute(insert(Usuario), membros)
+        pregadores = [m['id'] for m in membros if m['eh_pregador']] or [membros[0]['id']]
+        escalas, itens, avaliacoes, notificacoes = [], [], [], []
+        for indice in range(num_meses):
+            ano, mes = 2024 + indice // 12, indice % 12 + 1
+            for igreja in igrejas:
+                id_escala = gerar_uuid()
+                escalas.append({'id': id_escala, 'mes': mes, 'ano': ano, 'id_igreja': igreja['id'], 'id_distrito': id_distrito, 'modo_geracao': 'automatico', 'status': rng.choice(['rascunho', 'confirmada', 'confirmada', 'ativa'])})
+                for data, horario in cultos_do_mes(IgrejaPlano(id=igreja['id'], nome=igreja['nome'], horarios_culto=igreja['horarios_culto']), ano, mes):
+                    id_item, id_pregador = gerar_uuid(), rng.choice(pregadores)
+                    itens.append({'id': id_item, 'id_escala': id_escala, 'data': data, 'horario': horario, 'id_pregador': id_pregador, 'ids_cantores': [], 'status': rng.choice(['pendente', 'confirmado', 'confirmado', 'completado', 'recusado'])})
+                    notificacoes.append({'id': gerar_uuid(), 'id_usuario': id_pregador, 'tipo': 'atribuicao_escala', 'titulo': 'Nova Escala de Pregação', 'mensagem': f"Culto em {data}", 'id_relacionado': id_item, 'status': rng.choice(['lida', 'lida', 'nao_lida'])})
+                    if rng.random() < 0.3:
+                        avaliacoes.append({'id': gerar_uuid(), 'id_item_escala': id_item, 'id_igreja': igreja['id'], 'tipo_membro': 'pregador', 'id_usuario_avaliado': id_pregador, 'nota': rng.randint(1, 5)})
+        conn.execute(insert(Escala), escalas)
+        conn.execute(insert(ItemEscala), itens)
+        conn.execute(insert(Notificacao), notificacoes)
+        if avaliacoes:
+            conn.execute(insert(Avaliacao), avaliacoes)
+        print(f"  • Distrito {d + 1}/{num_distritos}: {len(escalas)} escalas, {len(itens)} itens")
+
+
+def parametros(conn):
+    item = conn.execute(text("SELECT i.data, i.id_escala, i.id_pregador, e.id_igreja, e.mes, e.ano, e.id_distrito FROM itens_escala i JOIN escalas e ON e.id = i.id_escala ORDER BY random() LIMIT 1")).mappings().one()
+    return {
+        'data': {'data': item['data']},
+        'igreja': {'id_igreja': item['id_igreja'], 'mes': item['mes'], 'ano': item['ano']},
+        'escala': {'id_escala': item['id_escala']},
+        'usuario': {'id_usuario': item['id_pregador']},
+        'distrito': {'id_distrito': item['id_distrito']},
+    }
+
+
+def medir(conn, repeticoes: int):
+    params = parametros(conn)
+    resultados = {}
+    for nome, (sql, chave) in CONSULTAS.items():
+        plano = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params[chave]).scalars().all()
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            conn.execute(text(sql), params[chave]).all()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        resultados[nome] = (statistics.median(tempos), plano)
+    return resultados
+
+
+def remover_indices(conn):
+    for nome in INDICES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {nome}"))
+    for nome, tabela in RESTRICOES.items():
+        conn.execute(text(f"ALTER TABLE {tabela} DROP CONSTRAINT IF EXISTS {nome}"))
+
+
+def criar_indices(conn):
+    for tabela in Base.metadata.sorted_tables:
+        for indice in tabela.indexes:
+            if indice.name in INDICES:
+                indice.create(bind=conn, checkfirst=True)
+    for nome, tabela in RESTRICOES.items():
+        conn.execute(text(f"ALTER TABLE {tabela} ADD CONSTRAINT {nome} UNIQUE (id_igreja, mes, ano)"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--distritos', type=int, default=20)
+    parser.add_argument('--igrejas', type=int, default=25)
+    parser.add_argument('--membros', type=int, default=300)
+    parser.add_argument('--meses', type=int, default=24)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--sem-seed', action='store_true', help="Não gerar dados; usar os que já existem")
+    parser.add_argument('--planos', action='store_true', help="Mostrar o plano completo de cada consulta")
+    args = parser.parse_args()
+
+    if not args.sem_seed:
+        with engine.begin() as conn:
+            popular(conn, args.distritos, args.igrejas, args.membros, args.meses, random.Random(42))
+
+    fases = {}
+    with engine.begin() as conn:
+        remover_indices(conn)
+        conn.execute(text("ANALYZE"))
+        fases['sem índices'] = medir(conn, args.repeticoes)
+    with engine.begin() as conn:
+        criar_indices(conn)
+        conn.execute(text("ANALYZE"))
+        fases['com índices'] = medir(conn, args.repeticoes)
+
+    print(f"\n{'consulta':<26}{'sem índices (ms)':>18}{'com índices (ms)':>18}{'ganho':>10}")
+    for nome in CONSULTAS:
+        antes, depois = fases['sem índices'][nome][0], fases['com índices'][nome][0]
+        print(f"{nome:<26}{antes:>18.2f}{depois:>18.2f}{antes / depois if depois else 0:>9.1f}x")
+    for fase, resultados in fases.items():
+        print(f"\n📋 Planos ({fase}):")
+        for nome, (_, plano) in resultados.items():
+            linhas = plano if args.planos else plano[:1]
+            print(f"  {nome}:")
+            for linha in linhas:
+                print(f"    {linha}")
+
+
+if __name__ == "__main__":
+    main()
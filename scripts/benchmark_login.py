@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark de concorrência do /auth/login
+
+Dispara uma rajada de logins concorrentes e, ao mesmo tempo, mede a latência
+de uma rota leve (`/api/auth/me`) usada como sonda. Se o bcrypt roda dentro
+do event loop, a sonda fica parada enquanto os logins são processados; com o
+hash fora do loop ela continua respondendo rápido.
+
+Rode contra a API já em execução (compare versões subindo cada uma em uma
+porta) e use um usuário de teste existente.
+
+Uso: python scripts/benchmark_login.py --url http://localhost:8001 --usuario admin --senha admin123 --logins 200 --concorrencia 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def resumo(valores):
+    return {'n': len(valores), 'p50_ms': round(percentil(valores, 50), 1), 'p95_ms': round(percentil(valores, 95), 1), 'max_ms': round(max(valores, default=0.0), 1)}
+
+
+async def executar(args) -> dict:
+    credenciais = {'nome_usuario': args.usuario, 'senha': args.senha}
+    limites = httpx.Limits(max_connections=args.concorrencia + 5)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limites) as http:
+        login = await http.post('/api/auth/login', json=credenciais)
+        login.raise_for_status()
+        cabecalhos = {'Authorization': f"Bearer {login.json()['access_token']}"}
+
+        fila = asyncio.Queue()
+        for _ in range(args.logins):
+            fila.put_nowait(None)
+        latencias_login, latencias_sonda, falhas = [], [], 0
+        terminou = asyncio.Event()
+
+        async def trabalhador():
+            nonlocal falhas
+            while not fila.empty():
+                fila.get_nowait()
+                inicio = time.perf_counter()
+                resposta = await http.post('/api/auth/login', json=credenciais)
+                latencias_login.append((time.perf_counter() - inicio) * 1000)
+                falhas += resposta.status_code != 200
+
+        async def sonda():
+            while not terminou.is_set():
+                inicio = time.perf_counter()
+                await http.get('/api/auth/me', headers=cabecalhos)
+                latencias_sonda.append((time.perf_counter() - inicio) * 1000)
+                await asyncio.sleep(args.intervalo_sonda)
+
+        tarefa_sonda = asyncio.create_task(sonda())
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabalhador() for _ in range(args.concorrencia)))
+        duracao = time.perf_counter() - inicio
+        terminou.set()
+        await tarefa_sonda
+
+    return {
+        'url': args.url,
+        'logins': args.logins,
+        'concorrencia': args.concorrencia,
+        'duracao_s': round(duracao, 2),
+        'logins_por_s': round(args.logins / duracao, 1),
+        'falhas': falhas,
+        'login': resumo(latencias_login),
+        'sonda_auth_me': resumo(latencias_sonda),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8001')
+    parser.add_argument('--usuario', default='admin')
+    parser.add_argument('--senha', default='admin123')
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concorrencia', type=int, default=50)
+    parser.add_argument('--intervalo-sonda', type=float, default=0.05, help="Segundos entre as chamadas da sonda")
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--json', help="Arquivo para salvar os resultados")
+    args = parser.parse_args()
+
+    resultado = asyncio.run(executar(args))
+    print(f"🔐 {resultado['logins']} logins ({resultado['concorrencia']} concorrentes) em {resultado['duracao_s']}s: {resultado['logins_por_s']} logins/s, {resultado['falhas']} falhas")
+    for nome in ['login', 'sonda_auth_me']:
+        medidas = resultado[nome]
+        print(f"  {nome:<14} n={medidas['n']:<5} p50={medidas['p50_ms']:>8} ms  p95={medidas['p95_ms']:>8} ms  max={medidas['max_ms']:>8} ms")
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+        print(f"💾 Resultados salvos em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark da fila de saída com o provedor fake
+
+Enfileira N mensagens sintéticas em mensagens_saida e mede quanto tempo o
+TrabalhadorSaida leva para esvaziar a fila para cada nível de concorrência,
+com a latência e a taxa de falha informadas. As mensagens do benchmark usam
+o prefixo 'benchmark:' na chave de deduplicação e são apagadas ao final.
+
+Uso: python scripts/benchmark_outbox.py --mensagens 2000 --concorrencia 1 10 50 --latencia 0.1 --taxa-falha 0.05
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / 'backend'))
+
+from sqlalchemy import delete, func, select
+from database import AsyncSessionLocal
+from models import MensagemSaida
+from outbox import ENVIADA, ENVIANDO, PENDENTE, ProvedorFake, TrabalhadorSaida, enfileirar
+
+
+async def limpar():
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(MensagemSaida).where(MensagemSaida.chave_dedup.like('benchmark:%')))
+        await db.commit()
+
+
+async def rodada(args, concorrencia: int) -> dict:
+    await limpar()
+    async with AsyncSessionLocal() as db:
+        mensagens = [{"chave_dedup": f"benchmark:{indice}", "destino": f"55{indice:09d}", "mensagem": f"Mensagem de teste {indice}"} for indice in range(args.mensagens)]
+        for inicio in range(0, len(mensagens), 1000):
+            await enfileirar(db, mensagens[inicio:inicio + 1000])
+        await enfileirar(db, mensagens[:10])  # duplicadas: devem ser ignoradas
+        await db.commit()
+
+    provedor = ProvedorFake(args.latencia, args.taxa_falha, semente=concorrencia)
+    trabalhador = TrabalhadorSaida(AsyncSessionLocal, provedor, concorrencia=concorrencia, por_segundo=args.por_segundo, lote=max(100, concorrencia * 2), max_tentativas=args.max_tentativas, espera_base=0.01, espera_maxima=0.1)
+    inicio = time.perf_counter()
+    while True:
+        await trabalhador.executar(ate_esvaziar=True)
+        async with AsyncSessionLocal() as db:
+            restantes = await db.scalar(select(func.count()).select_from(MensagemSaida).where(MensagemSaida.chave_dedup.like('benchmark:%'), MensagemSaida.status.in_([PENDENTE, ENVIANDO])))
+        if not restantes:
+            break
+        await asyncio.sleep(0.01)
+    duracao = time.perf_counter() - inicio
+
+    async with AsyncSessionLocal() as db:
+        total = await db.scalar(select(func.count()).select_from(MensagemSaida).where(MensagemSaida.chave_dedup.like('benchmark:%')))
+        enviadas = await db.scalar(select(func.count()).select_from(MensagemSaida).where(MensagemSaida.chave_dedup.like('benchmark:%'), MensagemSaida.status == ENVIADA))
+    await limpar()
+    return {
+        'concorrencia': concorrencia,
+        'duracao_s': round(duracao, 2),
+        'mensagens_por_s': round(args.mensagens / duracao, 1),
+        'enfileiradas': total,
+        'enviadas': enviadas,
+        'entregas_provedor': len(provedor.enviadas),
+        'retentativas': trabalhador.contadores['retentativas'],
+        'falharam': trabalhador.contadores['falhou'],
+    }
+
+
+async def executar(args):
+    return [await rodada(args, concorrencia) for concorrencia in args.concorrencia]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mensagens', type=int, default=2000)
+    parser.add_argument('--concorrencia', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--por-segundo', type=float, default=0, help="Limite de envios por segundo (0 = sem limite)")
+    parser.add_argument('--latencia', type=float, default=0.1, help="Latência simulada do provedor (s)")
+    parser.add_argument('--taxa-falha', type=float, default=0.05)
+    parser.add_argument('--max-tentativas', type=int, default=5)
+    parser.add_argument('--json', help="Arquivo para salvar os resultados")
+    args = parser.parse_args()
+
+    resultados = asyncio.run(executar(args))
+    print(f"📤 {args.mensagens} mensagens, latência {args.latencia}s, falha {args.taxa_falha:.0%}")
+    print(f"{'concorrência':>12}{'duração (s)':>14}{'msg/s':>10}{'enviadas':>10}{'retentativas':>14}{'falharam':>10}")
+    for resultado in resultados:
+        print(f"{resultado['concorrencia']:>12}{resultado['duracao_s']:>14}{resultado['mensagens_por_s']:>10}{resultado['enviadas']:>10}{resultado['retentativas']:>14}{resultado['falharam']:>10}")
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump(resultados, arquivo, indent=2)
+        print(f"💾 Resultados salvos em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos solvers de geração automática de escalas
+
+Gera um distrito sintético (sem banco de dados) e compara velocidade e
+qualidade do rodízio original com o solver otimizado.
+
+Uso: python scripts/benchmark_solver.py --igrejas 100 --membros 500
+"""
+import argparse
+import copy
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / 'backend'))
+
+from planner import SOLVERS, IgrejaPlano, MembroPlano, ProblemaEscala, avaliar_plano
+from occupancy import IndiceOcupacao
+
+DIAS = ['quarta', 'sexta', 'sabado', 'domingo']
+
+
+def gerar_problema(num_igrejas: int, num_membros: int, mes: int, ano: int, semente: int) -> ProblemaEscala:
+    rng = random.Random(semente)
+    igrejas = []
+    for i in range(num_igrejas):
+        dias = rng.sample(DIAS, rng.randint(1, 3))
+        igrejas.append(IgrejaPlano(id=f"igreja-{i}", nome=f"Igreja {i}", horarios_culto=[{"dia_semana": dia, "horario": "19:00"} for dia in dias], latitude=-23.5 + rng.uniform(-0.5, 0.5), longitude=-46.6 + rng.uniform(-0.5, 0.5)))
+    membros, indisponiveis = [], set()
+    for i in range(num_membros):
+        if rng.random() < 0.2:
+            inicio = rng.randint(1, 20)
+            indisponiveis.update((f"membro-{i}", f"{ano:04d}-{mes:02d}-{dia:02d}") for dia in range(inicio, inicio + rng.randint(1, 7) + 1))
+        membros.append(MembroPlano(id=f"membro-{i}", id_igreja=rng.choice(igrejas).id, eh_pregador=rng.random() < 0.6, eh_cantor=rng.random() < 0.4, pontuacao_pregacao=round(rng.uniform(30, 100), 1), pontuacao_canto=round(rng.uniform(30, 100), 1)))
+    pregadores = sorted((m for m in membros if m.eh_pregador), key=lambda m: m.pontuacao_pregacao, reverse=True)
+    cantores = sorted((m for m in membros if m.eh_cantor), key=lambda m: m.pontuacao_canto, reverse=True)
+    return ProblemaEscala(id_distrito="distrito-benchmark", mes=mes, ano=ano, igrejas=igrejas, pregadores=pregadores, cantores=cantores, ocupacao=IndiceOcupacao(), indisponiveis=indisponiveis, coordenadas={i.id: (i.latitude, i.longitude) for i in igrejas})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--igrejas', type=int, default=100)
+    parser.add_argument('--membros', type=int, default=500)
+    parser.add_argument('--mes', type=int, default=3)
+    parser.add_argument('--ano', type=int, default=2026)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--json', help="Arquivo para salvar os resultados")
+    args = parser.parse_args()
+
+    problema = gerar_problema(args.igrejas, args.membros, args.mes, args.ano, args.semente)
+    print(f"📊 {args.igrejas} igrejas, {len(problema.pregadores)} pregadores, {len(problema.cantores)} cantores ({args.mes:02d}/{args.ano})")
+    resultados = {}
+    for modo, solver in SOLVERS.items():
+        tempos = []
+        for _ in range(args.repeticoes):
+            copia = copy.deepcopy(problema)
+            inicio = time.perf_counter()
+            itens = solver(copia)
+            tempos.append(time.perf_counter() - inicio)
+        metricas = avaliar_plano(problema, itens)
+        metricas['tempo_ms'] = round(min(tempos) * 1000, 1)
+        resultados[modo] = metricas
+
+    colunas = list(next(iter(resultados.values())).keys())
+    print(f"\n{'métrica':<22}" + "".join(f"{modo:>16}" for modo in resultados))
+    for coluna in colunas:
+        print(f"{coluna:<22}" + "".join(f"{resultados[modo][coluna]:>16.3f}" if isinstance(resultados[modo][coluna], float) else f"{resultados[modo][coluna]:>16}" for modo in resultados))
+    if args.json:
+        Path(args.json).write_text(json.dumps(resultados, indent=2))
+        print(f"\n💾 Resultados salvos em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
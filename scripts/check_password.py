@@ -5,9 +5,8 @@ sys.path.append(str(Path(__file__).parent.parent / 'backend'))
 
 from database import SessionLocal
 from models import Usuario
-from passlib.context import CryptContext
+from passwords import pwd_context
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def check_user(username, password):
     db = SessionLocal()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Gera escalas automáticas para vários meses e distritos de uma vez
+
+Uso: python scripts/generate_schedules.py --inicio 2026-01 --fim 2026-12 [--distritos ID ...] [--modo otimizado]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / 'backend'))
+
+from database import SessionLocal
+from models import Distrito
+from planner import SOLVERS
+from jobs import JobGeracao, criar_pool, executar_job, meses_no_intervalo
+
+
+def parse_mes(valor: str):
+    ano, mes = valor.split('-')
+    return int(mes), int(ano)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--inicio', required=True, help="Primeiro mês (AAAA-MM)")
+    parser.add_argument('--fim', required=True, help="Último mês (AAAA-MM)")
+    parser.add_argument('--distritos', nargs='*', help="IDs dos distritos (padrão: todos os ativos)")
+    parser.add_argument('--modo', default='round_robin', choices=sorted(SOLVERS))
+    parser.add_argument('--workers', type=int, default=None, help="Processos no pool (padrão: número de CPUs)")
+    args = parser.parse_args()
+
+    meses = meses_no_intervalo(*parse_mes(args.inicio), *parse_mes(args.fim))
+    ids_distritos = args.distritos
+    if not ids_distritos:
+        db = SessionLocal()
+        ids_distritos = [id_distrito for (id_distrito,) in db.query(Distrito.id).filter(Distrito.ativo == True).all()]
+        db.close()
+
+    print(f"🗓️  Gerando {len(meses)} mês(es) para {len(ids_distritos)} distrito(s) com o solver '{args.modo}'...")
+
+    def ao_progredir(job: JobGeracao):
+        print(f"  • {len(job.concluidos) + len(job.erros)}/{len(job.ids_distritos)} distritos processados")
+
+    with criar_pool(args.workers) as pool:
+        job = executar_job(JobGeracao(ids_distritos=ids_distritos, meses=meses, modo=args.modo), pool=pool, ao_progredir=ao_progredir)
+    resumo = job.para_dict()
+    print(f"✅ {resumo['total_escalas']} escalas geradas em {resumo['distritos_concluidos']} distrito(s)")
+    for id_distrito, erro in job.erros.items():
+        print(f"❌ Distrito {id_distrito}: {erro}")
+    return 1 if job.erros else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Gerador de dados sintéticos em grande volume
+
+Cria N distritos com M igrejas cada e K membros por igreja, com períodos de
+indisponibilidade e anos de escalas, avaliações e notificações, carregados
+com COPY (ver backend/synthetic_data.py, também usado pelos benchmarks).
+
+Cada distrito ganha um pastor '<prefixo>.pastor<N>' e cada igreja um líder
+'<prefixo>.lider<N>.<M>', todos com a senha de --senha.
+
+Use um banco dedicado: os dados são adicionados ao DATABASE_URL.
+
+Uso: python scripts/generate_synthetic_data.py --distritos 10 --igrejas 20 --membros 30 --anos 3
+"""
+import argparse
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / 'backend'))
+
+from database import engine
+from synthetic_data import ParametrosSinteticos, gerar_dados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--distritos', type=int, default=5)
+    parser.add_argument('--igrejas', type=int, default=10, help="Igrejas por distrito")
+    parser.add_argument('--membros', type=int, default=30, help="Membros por igreja (além do líder)")
+    parser.add_argument('--anos', type=int, default=2, help="Anos de escalas a gerar")
+    parser.add_argument('--ano-inicial', type=int, default=date.today().year - 1)
+    parser.add_argument('--prefixo', default='sint', help="Prefixo dos nomes de usuário (precisam ser únicos no banco)")
+    parser.add_argument('--senha', default='senha123', help="Senha de todos os usuários gerados")
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    parametros = ParametrosSinteticos(distritos=args.distritos, igrejas=args.igrejas, membros=args.membros, anos=args.anos, ano_inicial=args.ano_inicial, prefixo=args.prefixo, senha=args.senha, semente=args.semente)
+    print(f"🌱 Gerando {args.distritos} distritos × {args.igrejas} igrejas × {args.membros} membros, {args.anos} ano(s) a partir de {args.ano_inicial}...")
+    inicio = time.perf_counter()
+
+    def progresso(indice, _):
+        print(f"  ✅ Distrito {indice + 1}/{args.distritos} ({time.perf_counter() - inicio:.1f}s)")
+
+    try:
+        totais = gerar_dados(engine, parametros, ao_carregar=progresso)
+    except Exception as e:
+        print(f"❌ Erro ao carregar os dados: {e}")
+        sys.exit(1)
+
+    print(f"\n🎉 Dados gerados em {time.perf_counter() - inicio:.1f}s:")
+    for nome, total in totais.items():
+        print(f"  - {nome}: {total}")
+    print(f"\n🔑 Login: {args.prefixo}.pastor0 / {args.senha}")
+
+
+if __name__ == "__main__":
+    main()
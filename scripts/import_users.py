@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Importa membros de um arquivo CSV ou XLSX para um distrito
+
+Mesmo processo de POST /api/users/import (backend/imports.py): valida o
+arquivo inteiro, confere os nomes de usuário em uma consulta, gera os hashes
+das senhas em paralelo (IMPORT_HASH_WORKERS threads) e grava tudo em lote.
+Havendo qualquer erro, nada é gravado. Use --simulacao para só validar.
+
+Colunas: nome_usuario, nome_completo, funcao (lider_igreja, pregador, cantor
+ou membro) e, opcionalmente, email, telefone, igreja (nome ou id),
+eh_pregador, eh_cantor (sim/não) e senha.
+
+Uso: python scripts/import_users.py membros.csv --distrito "Distrito Central" --senha-padrao trocar123 [--simulacao]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / 'backend'))
+
+from sqlalchemy import or_, select
+
+from database import SessionLocal
+from imports import ErroImportacao, formato_do_arquivo, importar_usuarios
+from models import Distrito
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('arquivo', help="Arquivo .csv ou .xlsx")
+    parser.add_argument('--distrito', required=True, help="Id ou nome do distrito")
+    parser.add_argument('--senha-padrao', help="Senha das linhas sem a coluna senha")
+    parser.add_argument('--formato', choices=['csv', 'xlsx'], help="Padrão: pela extensão do arquivo")
+    parser.add_argument('--simulacao', action='store_true', help="Só validar, sem gravar")
+    args = parser.parse_args()
+
+    formato = args.formato or formato_do_arquivo(args.arquivo)
+    if formato is None:
+        print("❌ Formato não reconhecido; use --formato csv ou --formato xlsx")
+        sys.exit(1)
+
+    db = SessionLocal()
+    try:
+        id_distrito = db.scalar(select(Distrito.id).where(or_(Distrito.id == args.distrito, Distrito.nome == args.distrito)))
+        if id_distrito is None:
+            print(f"❌ Distrito não encontrado: {args.distrito}")
+            sys.exit(1)
+        inicio = time.perf_counter()
+        with open(args.arquivo, 'rb') as arquivo:
+            resultado = importar_usuarios(db, arquivo, formato, id_distrito, senha_padrao=args.senha_padrao, simulacao=args.simulacao)
+        duracao = time.perf_counter() - inicio
+    except ErroImportacao as e:
+        print(f"❌ Arquivo inválido: {e}")
+        sys.exit(1)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erro ao importar: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    for erro in resultado['erros']:
+        print(f"   linha {erro['linha']}: {erro['erro']}")
+    if resultado['total_erros'] > len(resultado['erros']):
+        print(f"   ... e mais {resultado['total_erros'] - len(resultado['erros'])} erro(s)")
+    if resultado['erros']:
+        print(f"❌ {resultado['total_erros']} erro(s) em {resultado['total']} linha(s); nada foi gravado")
+        sys.exit(1)
+    if args.simulacao:
+        print(f"✅ Simulação: {resultado['validos']} linha(s) válida(s) em {duracao:.2f}s; nada foi gravado")
+    else:
+        print(f"✅ {resultado['importados']} membro(s) importado(s) em {duracao:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
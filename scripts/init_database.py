@@ -8,10 +8,13 @@ from pathlib import Path
 # Adicionar backend ao path
 sys.path.append(str(Path(__file__).parent.parent / 'backend'))
 
+from alembic import command
+from alembic.config import Config
 from database import engine, Base
 from models import (
     Usuario, Distrito, Igreja, Escala, ItemEscala,
-    Avaliacao, Notificacao, SolicitacaoTroca, Delegacao, LogAuditoria
+    Avaliacao, Notificacao, SolicitacaoTroca, Delegacao, LogAuditoria, Atribuicao, PeriodoIndisponibilidade, MensagemSaida, PontuacaoMembro,
+    ResumoDistrito, ResumoDistritoMes
 )
 
 def init_database():
@@ -20,6 +23,9 @@ def init_database():
     
     # Criar todas as tabelas
     Base.metadata.create_all(bind=engine)
+
+    # As tabelas já nascem com os índices atuais; marcar as migrações como aplicadas
+    command.stamp(Config(str(Path(__file__).parent.parent / 'backend' / 'alembic.ini')), "head")
     
     print("✅ Banco de dados criado com sucesso!")
     print("\n📊 Tabelas criadas:")
@@ -28,11 +34,17 @@ def init_database():
     print("  - igrejas")
     print("  - escalas")
     print("  - itens_escala")
+    print("  - atribuicoes")
+    print("  - periodos_indisponibilidade")
     print("  - avaliacoes")
+    print("  - pontuacoes_membro")
     print("  - notificacoes")
+    print("  - mensagens_saida")
     print("  - solicitacoes_troca")
     print("  - delegacoes")
     print("  - logs_auditoria")
+    print("  - resumos_distrito")
+    print("  - resumos_distrito_mes")
     print("\n🎉 Sistema pronto para uso!")
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Teste de carga da API
+
+Abre N clientes concorrentes (padrão 200) que repetem as rotas escolhidas
+durante um intervalo fixo e mede vazão (req/s), latência (p50/p95/p99) e
+erros. Os resultados podem ser salvos em JSON e comparados entre execuções,
+por exemplo a API atual contra uma versão anterior servida em outra porta:
+
+    git worktree add /tmp/escalas-antigo <commit>
+    (cd /tmp/escalas-antigo/backend && uvicorn server:app --port 8002)
+    (cd backend && uvicorn server:app --port 8001)
+
+    python scripts/load_test.py --url http://localhost:8002 --json antigo.json
+    python scripts/load_test.py --url http://localhost:8001 --json atual.json
+    python scripts/load_test.py --comparar antigo.json atual.json
+
+Uso: python scripts/load_test.py --url http://localhost:8001 --usuario admin --senha admin123 --clientes 200 --duracao 30
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+
+import httpx
+
+ROTAS_PADRAO = ['/api/auth/me', '/api/churches', '/api/users/preachers', '/api/schedules?limite=50', '/api/notifications']
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+async def cliente(http: httpx.AsyncClient, rotas, fim: float, latencias, status, semente: int):
+    rng = random.Random(semente)
+    while time.perf_counter() < fim:
+        rota = rng.choice(rotas)
+        inicio = time.perf_counter()
+        try:
+            resposta = await http.get(rota)
+            codigo = resposta.status_code
+        except httpx.HTTPError as exc:
+            codigo = type(exc).__name__
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        status[codigo] = status.get(codigo, 0) + 1
+
+
+async def executar(args) -> dict:
+    limites = httpx.Limits(max_connections=args.clientes, max_keepalive_connections=args.clientes)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limites) as http:
+        login = await http.post('/api/auth/login', json={'nome_usuario': args.usuario, 'senha': args.senha})
+        login.raise_for_status()
+        http.headers['Authorization'] = f"Bearer {login.json()['access_token']}"
+        print(f"🚀 {args.clientes} clientes por {args.duracao}s em {args.url}")
+        latencias, status = [], {}
+        inicio = time.perf_counter()
+        fim = inicio + args.duracao
+        await asyncio.gather(*(cliente(http, args.rota or ROTAS_PADRAO, fim, latencias, status, indice) for indice in range(args.clientes)))
+        duracao = time.perf_counter() - inicio
+    erros = sum(quantidade for codigo, quantidade in status.items() if not (isinstance(codigo, int) and codigo < 400))
+    return {
+        'url': args.url,
+        'clientes': args.clientes,
+        'duracao_s': round(duracao, 2),
+        'requisicoes': len(latencias),
+        'req_por_s': round(len(latencias) / duracao, 1),
+        'p50_ms': round(percentil(latencias, 50), 1),
+        'p95_ms': round(percentil(latencias, 95), 1),
+        'p99_ms': round(percentil(latencias, 99), 1),
+        'media_ms': round(statistics.fmean(latencias), 1) if latencias else 0.0,
+        'erros': erros,
+        'status': {str(codigo): quantidade for codigo, quantidade in status.items()},
+    }
+
+
+def imprimir(resultado: dict):
+    for chave in ['requisicoes', 'req_por_s', 'p50_ms', 'p95_ms', 'p99_ms', 'media_ms', 'erros']:
+        print(f"  {chave:<14}{resultado[chave]:>12}")
+    print(f"  {'status':<14}{json.dumps(resultado['status']):>12}")
+
+
+def comparar(caminho_a: str, caminho_b: str):
+    with open(caminho_a) as arquivo:
+        a = json.load(arquivo)
+    with open(caminho_b) as arquivo:
+        b = json.load(arquivo)
+    print(f"{'métrica':<14}{caminho_a:>20}{caminho_b:>20}{'variação':>12}")
+    for chave in ['req_por_s', 'p50_ms', 'p95_ms', 'p99_ms', 'media_ms', 'erros']:
+        variacao = f"{(b[chave] - a[chave]) / a[chave] * 100:+.0f}%" if a[chave] else '-'
+        print(f"{chave:<14}{a[chave]:>20}{b[chave]:>20}{variacao:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8001')
+    parser.add_argument('--usuario', default='admin')
+    parser.add_argument('--senha', default='admin123')
+    parser.add_argument('--clientes', type=int, default=200)
+    parser.add_argument('--duracao', type=float, default=30.0, help="Segundos de carga")
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--rota', action='append', help="Rota GET a exercitar (repita para várias; repetir a mesma aumenta o peso)")
+    parser.add_argument('--json', help="Arquivo para salvar os resultados")
+    parser.add_argument('--comparar', nargs=2, metavar=('ANTES', 'DEPOIS'), help="Comparar dois resultados salvos com --json")
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+    try:
+        resultado = asyncio.run(executar(args))
+    except httpx.HTTPError as exc:
+        print(f"❌ Falha ao acessar a API: {exc}")
+        sys.exit(1)
+    imprimir(resultado)
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+        print(f"💾 Resultados salvos em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
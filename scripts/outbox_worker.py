@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Worker da fila de saída: entrega as mensagens SMS/WhatsApp de mensagens_saida
+
+Rode um ou mais processos ao lado da API; eles dividem a fila entre si.
+O provedor 'log' apenas registra a mensagem; 'fake' simula latência e
+falhas (útil para testar retentativas).
+
+Uso: python scripts/outbox_worker.py --concorrencia 20 --por-segundo 50 [--provedor fake --latencia 0.2 --taxa-falha 0.1]
+"""
+import argparse
+import asyncio
+import logging
+import signal
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / 'backend'))
+
+from database import AsyncSessionLocal
+from outbox import ProvedorFake, ProvedorLog, TrabalhadorSaida
+
+
+async def executar(args):
+    provedor = ProvedorFake(args.latencia, args.taxa_falha) if args.provedor == 'fake' else ProvedorLog()
+    trabalhador = TrabalhadorSaida(AsyncSessionLocal, provedor, concorrencia=args.concorrencia, por_segundo=args.por_segundo, lote=args.lote, max_tentativas=args.max_tentativas, espera_base=args.espera_base)
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sinal, parar.set)
+    print(f"📤 Worker da fila de saída iniciado (provedor {args.provedor}, {args.concorrencia} envios simultâneos)")
+    await trabalhador.executar(parar, ate_esvaziar=args.uma_vez)
+    print(f"✅ Encerrado: {trabalhador.contadores}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--provedor', default='log', choices=['log', 'fake'])
+    parser.add_argument('--concorrencia', type=int, default=10, help="Envios simultâneos ao provedor")
+    parser.add_argument('--por-segundo', type=float, default=0, help="Limite de envios por segundo (0 = sem limite)")
+    parser.add_argument('--lote', type=int, default=100, help="Mensagens reservadas por vez")
+    parser.add_argument('--max-tentativas', type=int, default=5)
+    parser.add_argument('--espera-base', type=float, default=2.0, help="Segundos antes da 2ª tentativa; dobra a cada falha")
+    parser.add_argument('--latencia', type=float, default=0.05, help="Latência do provedor fake (s)")
+    parser.add_argument('--taxa-falha', type=float, default=0.0, help="Probabilidade de falha do provedor fake")
+    parser.add_argument('--uma-vez', action='store_true', help="Sair quando não houver mensagens prontas")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(executar(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Recalcula as pontuações de todos os membros a partir das avaliações
+
+Reconstrói a tabela pontuacoes_membro com um único INSERT ... SELECT agregado
+sobre avaliacoes, em uma transação. Rode depois da migração 0006 e sempre que
+avaliações forem corrigidas ou removidas diretamente no banco.
+
+As pontuações dos usuários (pontuacao_pregacao/pontuacao_canto) não mudam:
+elas partem do valor do cadastro, que as avaliações não registram. Com
+--redefinir-pontuacoes, as dos usuários avaliados passam a ser
+50 + 2 * Σ(nota - 3), descartando os valores atuais.
+
+Uso: python scripts/recompute_scores.py [--dry-run] [--redefinir-pontuacoes]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / 'backend'))
+
+from sqlalchemy import func, select
+from database import SessionLocal
+from models import PontuacaoMembro
+from scores import recalcular_pontuacoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dry-run', action='store_true', help="Calcula e mostra os totais sem gravar")
+    parser.add_argument('--redefinir-pontuacoes', action='store_true', help="Substituir as pontuações dos avaliados por 50 + 2 * Σ(nota - 3)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print("🔄 Recalculando pontuações a partir das avaliações...")
+        inicio = time.perf_counter()
+        atualizados = recalcular_pontuacoes(db, redefinir_pontuacoes=args.redefinir_pontuacoes)
+        agregados = db.scalar(select(func.count()).select_from(PontuacaoMembro))
+        duracao = time.perf_counter() - inicio
+        if args.dry_run:
+            db.rollback()
+            print("ℹ️  --dry-run: nada foi gravado")
+        else:
+            db.commit()
+        print(f"✅ {agregados} agregados em {duracao:.2f}s")
+        if args.redefinir_pontuacoes:
+            print(f"   pontuações redefinidas: {atualizados['pregador']} de pregação, {atualizados['cantor']} de canto")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erro ao recalcular pontuações: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Recalcula os resumos do painel de analytics
+
+Por padrão só os distritos marcados como desatualizados desde o último
+cálculo; com --todos, todos os distritos ativos. Pode ser agendado (cron)
+para que a primeira abertura do painel não pague o recálculo.
+
+Uso: python scripts/refresh_analytics.py [--todos]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / 'backend'))
+
+from database import SessionLocal
+from analytics import atualizar_desatualizados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--todos', action='store_true', help="Recalcular todos os distritos ativos")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        inicio = time.perf_counter()
+        distritos = atualizar_desatualizados(db, todos=args.todos)
+        print(f"✅ {len(distritos)} distrito(s) recalculado(s) em {time.perf_counter() - inicio:.2f}s")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erro ao recalcular os resumos: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
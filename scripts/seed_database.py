@@ -5,10 +5,9 @@ sys.path.append(str(Path(__file__).parent.parent / 'backend'))
 
 from database import SessionLocal
 from models import Usuario, Distrito, Igreja
-from passlib.context import CryptContext
+from passwords import pwd_context
 from datetime import datetime, timezone
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 db = SessionLocal()
 
 print("🌱 Populando banco de dados...")
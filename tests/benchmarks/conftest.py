@@ -0,0 +1,46 @@
+"""
+Dados dos benchmarks
+
+Carrega no banco de teste, uma vez por sessão, um volume de dados sintéticos
+(backend/synthetic_data.py) com um prefixo aleatório nos nomes de usuário.
+O volume vem de BENCHMARK_DISTRITOS, BENCHMARK_IGREJAS, BENCHMARK_MEMBROS e
+BENCHMARK_ANOS (padrão 3 × 10 × 20, 2 anos).
+"""
+import os
+import uuid
+from datetime import date
+
+import pytest
+
+from tests.conftest import SENHA
+
+
+class DadosSinteticos:
+    """Distrito medido: o do pastor do primeiro distrito gerado."""
+
+    def __init__(self, prefixo, id_distrito, cabecalhos):
+        self.prefixo = prefixo
+        self.nome_pastor = f'{prefixo}.pastor0'
+        self.id_distrito = id_distrito
+        self.cabecalhos = cabecalhos
+
+
+@pytest.fixture(scope='session')
+def dados_sinteticos(banco, client):
+    from synthetic_data import ParametrosSinteticos, gerar_dados
+
+    parametros = ParametrosSinteticos(
+        distritos=int(os.environ.get('BENCHMARK_DISTRITOS', 3)),
+        igrejas=int(os.environ.get('BENCHMARK_IGREJAS', 10)),
+        membros=int(os.environ.get('BENCHMARK_MEMBROS', 20)),
+        anos=int(os.environ.get('BENCHMARK_ANOS', 2)),
+        ano_inicial=date.today().year - 1,
+        prefixo=f'bench{uuid.uuid4().hex[:6]}',
+        senha=SENHA,
+    )
+    ids_distritos = []
+    gerar_dados(banco, parametros, ao_carregar=lambda _, id_distrito: ids_distritos.append(id_distrito))
+
+    resposta = client.post('/api/auth/login', json={'nome_usuario': f'{parametros.prefixo}.pastor0', 'senha': SENHA})
+    assert resposta.status_code == 200, resposta.text
+    return DadosSinteticos(parametros.prefixo, ids_distritos[0], {'Authorization': f"Bearer {resposta.json()['access_token']}"})
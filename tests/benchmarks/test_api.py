@@ -0,0 +1,107 @@
+"""
+Benchmarks das rotas principais sobre os dados sintéticos
+
+Cada benchmark registra também o número de consultas da última requisição
+(cabeçalho X-Query-Count) em `extra_info`. Os orçamentos de consultas valem
+aqui como nos outros testes (QUERY_BUDGET_STRICT).
+
+Uso: python -m pytest tests/benchmarks --benchmarks [--benchmark-json resultados.json]
+"""
+import itertools
+from datetime import date
+
+import pytest
+
+from sqlalchemy import func, select
+
+from tests.conftest import SENHA
+
+pytest.importorskip('pytest_benchmark')
+
+
+def medir(benchmark, requisicao, *args, **kwargs):
+    resposta = benchmark(requisicao, *args, **kwargs)
+    assert resposta.status_code < 400, resposta.text
+    benchmark.extra_info['consultas'] = int(resposta.headers.get('X-Query-Count', 0))
+    return resposta
+
+
+def test_login(benchmark, client, dados_sinteticos):
+    medir(benchmark, client.post, '/api/auth/login', json={'nome_usuario': dados_sinteticos.nome_pastor, 'senha': SENHA})
+
+
+def test_listar_escalas(benchmark, client, dados_sinteticos):
+    medir(benchmark, client.get, '/api/schedules', params={'id_distrito': dados_sinteticos.id_distrito, 'limite': 50}, headers=dados_sinteticos.cabecalhos)
+
+
+def test_gerar_escala(benchmark, client, dados_sinteticos):
+    # Um mês novo a cada rodada, anos depois dos dados gerados; as escalas são apagadas no final
+    meses = ((mes, ano) for ano in itertools.count(date.today().year + 10) for mes in range(1, 13))
+    geradas = []
+
+    def proximo_mes():
+        mes, ano = next(meses)
+        return (), {'params': {'mes': mes, 'ano': ano, 'id_distrito': dados_sinteticos.id_distrito}}
+
+    def gerar(params):
+        resposta = client.post('/api/schedules/generate-auto', params=params, headers=dados_sinteticos.cabecalhos)
+        if resposta.status_code == 200:
+            geradas.extend(resposta.json()['escalas'])
+        return resposta
+
+    try:
+        resposta = benchmark.pedantic(gerar, setup=proximo_mes, rounds=10, warmup_rounds=1)
+        assert resposta.status_code == 200, resposta.text
+        benchmark.extra_info['consultas'] = int(resposta.headers.get('X-Query-Count', 0))
+    finally:
+        for id_escala in geradas:
+            client.delete(f'/api/schedules/{id_escala}', headers=dados_sinteticos.cabecalhos)
+
+
+def test_confirmar_escala(benchmark, client, dados_sinteticos):
+    # Cada rodada gera (fora da medição) um mês novo e confirma uma das escalas geradas
+    meses = ((mes, ano) for ano in itertools.count(date.today().year + 30) for mes in range(1, 13))
+    geradas = []
+
+    def gerar_mes():
+        mes, ano = next(meses)
+        resposta = client.post('/api/schedules/generate-auto', params={'mes': mes, 'ano': ano, 'id_distrito': dados_sinteticos.id_distrito}, headers=dados_sinteticos.cabecalhos)
+        assert resposta.status_code == 200, resposta.text
+        geradas.extend(resposta.json()['escalas'])
+        return (resposta.json()['escalas'][0],), {}
+
+    def confirmar(id_escala):
+        return client.post(f'/api/schedules/{id_escala}/confirm', headers=dados_sinteticos.cabecalhos)
+
+    try:
+        resposta = benchmark.pedantic(confirmar, setup=gerar_mes, rounds=10, warmup_rounds=1)
+        assert resposta.status_code == 200, resposta.text
+        benchmark.extra_info['consultas'] = int(resposta.headers.get('X-Query-Count', 0))
+    finally:
+        for id_escala in geradas:
+            client.delete(f'/api/schedules/{id_escala}', headers=dados_sinteticos.cabecalhos)
+
+
+def test_listar_notificacoes(benchmark, client, db, dados_sinteticos):
+    # O membro do distrito com mais notificações
+    from models import Notificacao, Usuario
+    nome_usuario = db.scalar(
+        select(Usuario.nome_usuario).join(Notificacao, Notificacao.id_usuario == Usuario.id)
+        .where(Usuario.id_distrito == dados_sinteticos.id_distrito)
+        .group_by(Usuario.id).order_by(func.count().desc()).limit(1)
+    )
+    login = client.post('/api/auth/login', json={'nome_usuario': nome_usuario, 'senha': SENHA})
+    assert login.status_code == 200, login.text
+    resposta = medir(benchmark, client.get, '/api/notifications', headers={'Authorization': f"Bearer {login.json()['access_token']}"})
+    assert resposta.json()
+
+
+def test_painel_de_analytics(benchmark, client, dados_sinteticos):
+    medir(benchmark, client.get, '/api/analytics/dashboard', params={'id_distrito': dados_sinteticos.id_distrito}, headers=dados_sinteticos.cabecalhos)
+
+
+def test_painel_de_analytics_304(benchmark, client, dados_sinteticos):
+    parametros = {'id_distrito': dados_sinteticos.id_distrito}
+    etag = client.get('/api/analytics/dashboard', params=parametros, headers=dados_sinteticos.cabecalhos).headers['ETag']
+    resposta = medir(benchmark, client.get, '/api/analytics/dashboard', params=parametros, headers={**dados_sinteticos.cabecalhos, 'If-None-Match': etag})
+    assert resposta.status_code == 304
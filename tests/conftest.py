@@ -0,0 +1,135 @@
+"""
+Configuração dos testes
+
+Os testes de lógica pura (assignment, planner) não usam o banco. Os demais
+usam um PostgreSQL de teste em `TEST_DATABASE_URL` (padrão
+postgresql://postgres@localhost:5432/escalas_test), recriado a cada
+execução; com o servidor fora do ar, esses testes são pulados.
+
+Os benchmarks (tests/benchmarks, pytest-benchmark) carregam um volume de
+dados sintéticos e só rodam com --benchmarks.
+
+Uso (na raiz do projeto): python -m pytest tests
+"""
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL', 'postgresql://postgres@localhost:5432/escalas_test')
+
+# Antes de importar o backend: engines, custo do bcrypt e orçamento de consultas são lidos na importação
+os.environ['DATABASE_URL'] = TEST_DATABASE_URL
+os.environ.pop('ASYNC_DATABASE_URL', None)
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+os.environ.setdefault('QUERY_BUDGET_STRICT', '1')
+sys.path.insert(0, str(Path(__file__).parent.parent / 'backend'))
+
+SENHA = 'senha123'
+
+
+def pytest_addoption(parser):
+    parser.addoption('--benchmarks', action='store_true', help="Rodar os benchmarks de tests/benchmarks (carrega dados sintéticos)")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--benchmarks'):
+        return
+    pular = pytest.mark.skip(reason="benchmarks só rodam com --benchmarks")
+    for item in items:
+        if 'benchmarks' in item.path.parts:
+            item.add_marker(pular)
+
+
+@pytest.fixture(scope='session')
+def banco():
+    """Recria o banco de teste com as tabelas atuais."""
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.engine import make_url
+    from sqlalchemy.exc import OperationalError
+
+    url = make_url(TEST_DATABASE_URL)
+    admin = create_engine(url.set(database='postgres'), isolation_level='AUTOCOMMIT')
+    try:
+        with admin.connect() as conexao:
+            conexao.execute(text(f'DROP DATABASE IF EXISTS "{url.database}" WITH (FORCE)'))
+            conexao.execute(text(f"CREATE DATABASE \"{url.database}\" ENCODING 'UTF8' LC_COLLATE 'C' LC_CTYPE 'C' TEMPLATE template0"))
+    except OperationalError as exc:
+        pytest.skip(f"PostgreSQL de teste indisponível: {exc.orig}")
+    finally:
+        admin.dispose()
+
+    from database import Base, engine
+    import models  # noqa: F401  (registra as tabelas)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(banco):
+    from database import SessionLocal
+    sessao = SessionLocal()
+    yield sessao
+    sessao.rollback()
+    sessao.close()
+
+
+@pytest.fixture(scope='session')
+def client(banco):
+    from fastapi.testclient import TestClient
+    import server
+    with TestClient(server.app) as cliente:
+        yield cliente
+
+
+class Distrito:
+    """Distrito de teste: pastor, igrejas e membros criados por `criar_distrito`."""
+
+    def __init__(self, id, pastor, igrejas, membros):
+        self.id = id
+        self.pastor = pastor
+        self.igrejas = igrejas
+        self.membros = membros
+
+
+def criar_distrito(db, igrejas: int = 3, membros: int = 8) -> Distrito:
+    """Cria um distrito isolado (nomes com sufixo aleatório) e faz commit."""
+    from models import Distrito as DistritoModelo, Igreja, Usuario
+    from passwords import hash_senha
+
+    sufixo = uuid.uuid4().hex[:8]
+    senha_hash = hash_senha(SENHA)
+    pastor = Usuario(nome_usuario=f'pastor.{sufixo}', senha_hash=senha_hash, nome_completo='Pastor', funcao='pastor_distrital', eh_pregador=True)
+    db.add(pastor)
+    db.flush()
+    distrito = DistritoModelo(nome=f'Distrito {sufixo}', id_pastor=pastor.id)
+    db.add(distrito)
+    db.flush()
+    pastor.id_distrito = distrito.id
+    lista_igrejas = [Igreja(nome=f'Igreja {i} {sufixo}', id_distrito=distrito.id, latitude=-23.5 + i * 0.01, longitude=-46.6, horarios_culto=[{"dia_semana": "quarta", "horario": "19:00"}, {"dia_semana": "sabado", "horario": "09:00"}]) for i in range(igrejas)]
+    db.add_all(lista_igrejas)
+    db.flush()
+    lista_membros = [Usuario(nome_usuario=f'membro{i}.{sufixo}', senha_hash=senha_hash, nome_completo=f'Membro {i}', funcao='pregador', id_distrito=distrito.id, id_igreja=lista_igrejas[i % igrejas].id, eh_pregador=True, eh_cantor=i % 2 == 0, pontuacao_pregacao=50 + i) for i in range(membros)]
+    db.add_all(lista_membros)
+    db.commit()
+    return Distrito(distrito.id, pastor, lista_igrejas, lista_membros)
+
+
+def cabecalhos(client, usuario) -> dict:
+    resposta = client.post('/api/auth/login', json={'nome_usuario': usuario.nome_usuario, 'senha': SENHA})
+    assert resposta.status_code == 200, resposta.text
+    return {'Authorization': f"Bearer {resposta.json()['access_token']}"}
+
+
+@pytest.fixture
+def distrito(db) -> Distrito:
+    return criar_distrito(db)
+
+
+@pytest.fixture
+def autenticar(client):
+    """Cabeçalho Authorization de um usuário criado pelos fixtures (senha padrão)."""
+    return lambda usuario: cabecalhos(client, usuario)
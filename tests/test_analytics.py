@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import select, update
+
+from tests.conftest import criar_distrito
+
+ANO, MES = 2033, 4
+
+
+@pytest.fixture
+def dois_distritos(db):
+    from analytics import obter_resumo
+    a, b = criar_distrito(db), criar_distrito(db)
+    for distrito in (a, b):
+        obter_resumo(db, distrito.id)
+    db.commit()
+    return a, b
+
+
+def desatualizado(db, distrito) -> bool:
+    from models import ResumoDistrito
+    db.expire_all()
+    return db.scalar(select(ResumoDistrito.desatualizado).where(ResumoDistrito.id_distrito == distrito.id))
+
+
+def test_gravar_plano_marca_so_o_distrito_do_plano(db, dois_distritos):
+    from planner import carregar_problema, gravar_plano, resolver
+    a, b = dois_distritos
+    problema = carregar_problema(db, a.id, MES, ANO)
+    gravar_plano(db, problema, resolver(problema, 'round_robin'), a.pastor.id)
+    db.commit()
+    assert desatualizado(db, a)
+    assert not desatualizado(db, b)
+
+
+def test_excluir_escala_marca_so_o_distrito_da_escala(db, client, autenticar, dois_distritos):
+    from analytics import obter_resumo
+    from planner import carregar_problema, gravar_plano, resolver
+    a, b = dois_distritos
+    problema = carregar_problema(db, a.id, MES, ANO)
+    ids_escalas = gravar_plano(db, problema, resolver(problema, 'round_robin'), a.pastor.id)
+    db.commit()
+    obter_resumo(db, a.id)
+    db.commit()
+
+    resposta = client.delete(f'/api/schedules/{ids_escalas[0]}', headers=autenticar(a.pastor))
+    assert resposta.status_code == 200, resposta.text
+    assert desatualizado(db, a)
+    assert not desatualizado(db, b)
+
+
+def test_escrita_em_lote_sem_alcance_conhecido_marca_todos(db, dois_distritos):
+    from models import Usuario
+    a, b = dois_distritos
+    db.execute(update(Usuario).where(Usuario.id == a.membros[0].id).values(pontuacao_pregacao=99))
+    db.commit()
+    assert desatualizado(db, a) and desatualizado(db, b)
@@ -0,0 +1,52 @@
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+from assignment import CUSTO_PROIBIDO, atribuicao_custo_minimo
+
+
+def custo_total(custo, resultado):
+    return sum(custo[linha, coluna] for linha, coluna in enumerate(resultado) if coluna >= 0)
+
+
+def melhor_por_forca_bruta(custo):
+    n_linhas, n_colunas = custo.shape
+    if n_linhas <= n_colunas:
+        return min(sum(custo[linha, coluna] for linha, coluna in enumerate(colunas)) for colunas in permutations(range(n_colunas), n_linhas))
+    return melhor_por_forca_bruta(custo.T)
+
+
+@pytest.mark.parametrize('formato', [(1, 1), (3, 3), (4, 4), (2, 5), (3, 6), (5, 2), (6, 3)])
+def test_custo_minimo_igual_a_forca_bruta(formato):
+    rng = np.random.default_rng(sum(formato))
+    for _ in range(20):
+        custo = rng.integers(0, 50, size=formato).astype(float)
+        resultado = atribuicao_custo_minimo(custo)
+        assert len(resultado) == formato[0]
+        atribuidos = [coluna for coluna in resultado if coluna >= 0]
+        assert len(atribuidos) == len(set(atribuidos)) == min(formato)
+        assert custo_total(custo, resultado) == pytest.approx(melhor_por_forca_bruta(custo))
+
+
+def test_pares_proibidos_nunca_sao_atribuidos():
+    custo = np.array([
+        [1.0, CUSTO_PROIBIDO, CUSTO_PROIBIDO],
+        [2.0, CUSTO_PROIBIDO, CUSTO_PROIBIDO],
+        [3.0, 1.0, CUSTO_PROIBIDO],
+    ])
+    resultado = atribuicao_custo_minimo(custo)
+    # Só as colunas 0 e 1 são viáveis: uma das duas primeiras linhas fica sem atribuição
+    assert sorted(resultado.tolist()) == [-1, 0, 1]
+    assert resultado[2] == 1
+    assert all(custo[linha, coluna] < CUSTO_PROIBIDO for linha, coluna in enumerate(resultado) if coluna >= 0)
+
+
+def test_linha_totalmente_proibida_fica_sem_atribuicao():
+    custo = np.array([[CUSTO_PROIBIDO, CUSTO_PROIBIDO], [5.0, 1.0]])
+    assert atribuicao_custo_minimo(custo).tolist() == [-1, 1]
+
+
+def test_matrizes_vazias():
+    assert atribuicao_custo_minimo(np.zeros((0, 3))).tolist() == []
+    assert atribuicao_custo_minimo(np.zeros((2, 0))).tolist() == [-1, -1]
@@ -0,0 +1,123 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import insert
+
+from tests.conftest import criar_distrito
+
+ANO, MES = 2032, 5
+
+
+@pytest.fixture
+def cache():
+    from availability import _cache_mes
+    _cache_mes.limpar()
+    return _cache_mes
+
+
+@pytest.fixture
+def dois_distritos(db, cache):
+    from availability import disponibilidade_do_mes
+    a, b = criar_distrito(db), criar_distrito(db)
+    for distrito in (a, b):
+        for mes in (MES, MES + 1):
+            disponibilidade_do_mes(db, distrito.id, ANO, mes)
+    return a, b
+
+
+def em_cache(db, cache, distrito, mes=MES) -> bool:
+    """A entrada do mês na versão atual (a gravada no banco) ainda está em cache."""
+    from availability import versao_do_mes
+    return cache.obter((distrito.id, ANO, mes, versao_do_mes(db, distrito.id, ANO, mes))) is not None
+
+
+def test_alterar_membro_invalida_so_o_proprio_distrito(db, cache, dois_distritos):
+    a, b = dois_distritos
+    a.membros[0].nome_completo = 'Outro Nome'
+    db.commit()
+    assert not em_cache(db, cache, a) and not em_cache(db, cache, a, MES + 1)
+    assert em_cache(db, cache, b) and em_cache(db, cache, b, MES + 1)
+
+
+def test_escala_invalida_so_o_mes_e_os_membros_escalados(db, cache, dois_distritos):
+    from models import Escala, ItemEscala
+    a, b = dois_distritos
+    escala = Escala(mes=MES, ano=ANO, id_igreja=a.igrejas[0].id, id_distrito=a.id, id_gerado_por=a.pastor.id, modo_geracao='manual', status='confirmada')
+    escala.itens.append(ItemEscala(data=f'{ANO}-{MES:02d}-10', horario='19:00', id_pregador=b.membros[0].id, ids_cantores=[]))
+    db.add(escala)
+    db.commit()
+    # O pregador é do distrito B: a ocupação dele no mês muda nos dois distritos
+    assert not em_cache(db, cache, a) and not em_cache(db, cache, b)
+    assert em_cache(db, cache, a, MES + 1) and em_cache(db, cache, b, MES + 1)
+
+
+def test_indisponibilidade_invalida_os_meses_do_membro(db, cache, dois_distritos):
+    from models import PeriodoIndisponibilidade
+    a, b = dois_distritos
+    db.add(PeriodoIndisponibilidade(id_usuario=a.membros[1].id, data_inicio=date(ANO, MES, 1), data_fim=date(ANO, MES, 3)))
+    db.commit()
+    assert not em_cache(db, cache, a) and not em_cache(db, cache, a, MES + 1)
+    assert em_cache(db, cache, b)
+
+
+def test_insert_em_lote_usa_as_linhas_do_comando(db, cache, dois_distritos):
+    from models import Usuario
+    a, b = dois_distritos
+    db.execute(insert(Usuario), [{"nome_usuario": f'novo.{a.id}', "senha_hash": 'x', "nome_completo": 'Novo', "funcao": 'pregador', "id_distrito": b.id, "eh_pregador": True}])
+    db.commit()
+    assert em_cache(db, cache, a)
+    assert not em_cache(db, cache, b)
+
+
+def test_excluir_escala_pela_api_preserva_os_outros_distritos(db, client, autenticar, cache):
+    from availability import disponibilidade_do_mes
+    from models import Escala, ItemEscala
+    a, b = criar_distrito(db), criar_distrito(db)
+    escala = Escala(mes=MES, ano=ANO, id_igreja=a.igrejas[0].id, id_distrito=a.id, id_gerado_por=a.pastor.id, modo_geracao='manual', status='confirmada')
+    escala.itens.append(ItemEscala(data=f'{ANO}-{MES:02d}-10', horario='19:00', id_pregador=a.membros[0].id, ids_cantores=[]))
+    db.add(escala)
+    db.commit()
+    for distrito in (a, b):
+        disponibilidade_do_mes(db, distrito.id, ANO, MES)
+    assert disponibilidade_do_mes(db, a.id, ANO, MES).ocupacao.ocupado(a.membros[0].id, f'{ANO}-{MES:02d}-10')
+
+    resposta = client.delete(f'/api/schedules/{escala.id}', headers=autenticar(a.pastor))
+    assert resposta.status_code == 200, resposta.text
+    assert not em_cache(db, cache, a)
+    assert em_cache(db, cache, b)
+    db.expire_all()
+    assert not disponibilidade_do_mes(db, a.id, ANO, MES).ocupacao.ocupado(a.membros[0].id, f'{ANO}-{MES:02d}-10')
+
+
+def test_status_da_escala_invalida_os_escalados_de_outro_distrito(db, cache):
+    from availability import disponibilidade_do_mes
+    from models import Escala, ItemEscala
+    a, b = criar_distrito(db), criar_distrito(db)
+    escala = Escala(mes=MES, ano=ANO, id_igreja=a.igrejas[0].id, id_distrito=a.id, id_gerado_por=a.pastor.id, modo_geracao='manual', status='rascunho')
+    escala.itens.append(ItemEscala(data=f'{ANO}-{MES:02d}-10', horario='19:00', id_pregador=b.membros[0].id, ids_cantores=[]))
+    db.add(escala)
+    db.commit()
+    assert not disponibilidade_do_mes(db, b.id, ANO, MES).ocupacao.ocupado(b.membros[0].id, f'{ANO}-{MES:02d}-10')
+
+    escala.status = 'confirmada'
+    db.commit()
+    assert not em_cache(db, cache, b)
+    assert disponibilidade_do_mes(db, b.id, ANO, MES).ocupacao.ocupado(b.membros[0].id, f'{ANO}-{MES:02d}-10')
+
+
+def test_escrita_de_outro_processo_muda_a_versao(db, banco, cache, dois_distritos):
+    # Outro processo não passa pelos eventos desta sessão: grava direto e incrementa a versão no banco
+    from availability import _incrementar_versoes, disponibilidade_do_mes
+    from models import PeriodoIndisponibilidade
+    a, b = dois_distritos
+    membro = a.membros[1]
+    assert (membro.id, f'{ANO}-{MES:02d}-02') not in disponibilidade_do_mes(db, a.id, ANO, MES).indisponiveis
+    db.commit()
+
+    with banco.begin() as conexao:
+        conexao.execute(insert(PeriodoIndisponibilidade.__table__).values(id='outro-processo', id_usuario=membro.id, data_inicio=date(ANO, MES, 1), data_fim=date(ANO, MES, 3)))
+        _incrementar_versoes(conexao, {('usuario', membro.id, None)})
+
+    assert not em_cache(db, cache, a)
+    assert (membro.id, f'{ANO}-{MES:02d}-02') in disponibilidade_do_mes(db, a.id, ANO, MES).indisponiveis
+    assert em_cache(db, cache, b)
@@ -0,0 +1,14 @@
+import pytest
+
+
+@pytest.mark.parametrize('parametros', [{'data_inicio': '2024-13-01'}, {'data_fim': 'ontem'}, {'data_inicio': '2024-02-30'}])
+def test_exportacao_de_avaliacoes_rejeita_data_invalida_antes_do_streaming(client, distrito, autenticar, parametros):
+    resposta = client.get('/api/export/evaluations', params={'formato': 'csv', **parametros}, headers=autenticar(distrito.pastor))
+    assert resposta.status_code == 400
+    assert resposta.json()['detail'] == "Dates must be YYYY-MM-DD"
+
+
+def test_exportacao_de_avaliacoes_com_periodo(client, distrito, autenticar):
+    resposta = client.get('/api/export/evaluations', params={'formato': 'csv', 'id_distrito': distrito.id, 'data_inicio': '2024-01-01', 'data_fim': '2024-02-01'}, headers=autenticar(distrito.pastor))
+    assert resposta.status_code == 200
+    assert resposta.text.splitlines()[0].startswith('id,id_item_escala,id_igreja,id_distrito')
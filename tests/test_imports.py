@@ -0,0 +1,126 @@
+import io
+import uuid
+
+import pytest
+
+from tests.conftest import SENHA
+
+CABECALHO = 'nome_usuario,nome_completo,funcao,email,igreja,eh_pregador,eh_cantor,senha\n'
+
+
+def arquivo(*linhas: str) -> io.BytesIO:
+    return io.BytesIO((CABECALHO + ''.join(f'{linha}\n' for linha in linhas)).encode())
+
+
+@pytest.fixture
+def sufixo():
+    return uuid.uuid4().hex[:8]
+
+
+def test_importa_as_linhas_validas(db, distrito, sufixo):
+    from imports import importar_usuarios
+    from models import Usuario
+    from passwords import verificar_e_atualizar
+    igreja = distrito.igrejas[1]
+    resultado = importar_usuarios(db, arquivo(
+        f'ana.{sufixo},Ana Lima,pregador,ana@example.com,{igreja.nome},sim,não,',
+        f'bruno.{sufixo},Bruno Costa,cantor,,{igreja.id},0,1,propria123',
+    ), 'csv', distrito.id, senha_padrao=SENHA)
+
+    assert resultado == {"total": 2, "validos": 2, "importados": 2, "simulacao": False, "total_erros": 0, "erros": []}
+    ana = db.query(Usuario).filter_by(nome_usuario=f'ana.{sufixo}').one()
+    bruno = db.query(Usuario).filter_by(nome_usuario=f'bruno.{sufixo}').one()
+    assert (ana.id_distrito, ana.id_igreja, ana.eh_pregador, ana.eh_cantor, ana.email) == (distrito.id, igreja.id, True, False, 'ana@example.com')
+    assert (bruno.eh_pregador, bruno.eh_cantor, bruno.email) == (False, True, None)
+    assert verificar_e_atualizar(SENHA, ana.senha_hash)[0] and verificar_e_atualizar('propria123', bruno.senha_hash)[0]
+
+
+def test_erros_de_validacao_com_o_numero_da_linha(db, distrito, sufixo):
+    from imports import importar_usuarios
+    resultado = importar_usuarios(db, arquivo(
+        f'ana.{sufixo},Ana,pregador,,,,,',
+        f'bruno.{sufixo},Bruno,administrador,,,,,',
+        f'carla.{sufixo},Carla,cantor,nao-e-email,,,,',
+        f'davi.{sufixo},Davi,membro,,Igreja Inexistente,,,',
+        f'elisa.{sufixo},Elisa,membro,,,talvez,,',
+    ), 'csv', distrito.id, senha_padrao=SENHA)
+
+    erros = {erro['linha']: erro['erro'] for erro in resultado['erros']}
+    assert sorted(erros) == [3, 4, 5, 6]
+    assert erros[3].startswith('funcao:')
+    assert erros[4].startswith('email:')
+    assert erros[5].startswith('igreja:')
+    assert erros[6].startswith('eh_pregador:')
+    assert (resultado['total'], resultado['validos'], resultado['importados']) == (5, 1, 0)
+
+
+def test_nomes_de_usuario_repetidos_no_arquivo_e_no_banco(db, distrito, sufixo):
+    from imports import importar_usuarios
+    existente = distrito.membros[0].nome_usuario
+    resultado = importar_usuarios(db, arquivo(
+        f'ana.{sufixo},Ana,pregador,,,,,',
+        f'ana.{sufixo},Ana de Novo,cantor,,,,,',
+        f'{existente},Membro Existente,membro,,,,,',
+    ), 'csv', distrito.id, senha_padrao=SENHA)
+
+    assert resultado['erros'] == [
+        {"linha": 3, "erro": "nome_usuario: duplicated in line 2"},
+        {"linha": 4, "erro": "nome_usuario: username already exists"},
+    ]
+    assert resultado['importados'] == 0
+
+
+def test_importacao_e_tudo_ou_nada(db, distrito, sufixo):
+    from imports import importar_usuarios
+    from models import Usuario
+    resultado = importar_usuarios(db, arquivo(
+        f'ana.{sufixo},Ana,pregador,,,,,',
+        f'bruno.{sufixo},Bruno,pregador,,,,,',
+        f'carla.{sufixo},Carla,pregador,,,,,',  # sem senha e sem senha padrão
+    ), 'csv', distrito.id)
+
+    assert [erro['linha'] for erro in resultado['erros']] == [2, 3, 4]
+    assert db.query(Usuario).filter(Usuario.nome_usuario.like(f'%.{sufixo}')).count() == 0
+
+
+def test_simulacao_so_valida(db, distrito, sufixo):
+    from imports import importar_usuarios
+    from models import Usuario
+    resultado = importar_usuarios(db, arquivo(f'ana.{sufixo},Ana,pregador,,,,,'), 'csv', distrito.id, senha_padrao=SENHA, simulacao=True)
+    assert (resultado['validos'], resultado['importados'], resultado['simulacao']) == (1, 0, True)
+    assert db.query(Usuario).filter(Usuario.nome_usuario.like(f'%.{sufixo}')).count() == 0
+
+
+def test_lotes_menores_que_o_arquivo(db, distrito, sufixo):
+    from imports import importar_usuarios
+    linhas = [f'm{i}.{sufixo},Membro {i},membro,,,,,' for i in range(7)] + [f'x.{sufixo},X,invalida,,,,,']
+    resultado = importar_usuarios(db, arquivo(*linhas), 'csv', distrito.id, senha_padrao=SENHA, tamanho_lote=3)
+    assert [erro['linha'] for erro in resultado['erros']] == [9]
+    assert resultado['validos'] == 7 and resultado['importados'] == 0
+
+
+@pytest.mark.parametrize('conteudo, mensagem', [
+    (b'', 'Empty file'),
+    (b'nome_usuario,funcao\nana,pregador\n', 'Missing columns: nome_completo'),
+    (CABECALHO.encode('utf-16'), 'must be UTF-8'),
+])
+def test_arquivo_ilegivel(db, distrito, conteudo, mensagem):
+    from imports import ErroImportacao, importar_usuarios
+    with pytest.raises(ErroImportacao, match=mensagem):
+        importar_usuarios(db, io.BytesIO(conteudo), 'csv', distrito.id, senha_padrao=SENHA)
+
+
+def test_rota_de_importacao(client, autenticar, db, distrito, sufixo):
+    from models import Usuario
+    cabecalhos = autenticar(distrito.pastor)
+    conteudo = arquivo(f'ana.{sufixo},Ana,pregador,,,,,').getvalue()
+
+    invalido = client.post('/api/users/import', headers=cabecalhos, files={'arquivo': ('membros.csv', arquivo(f'ana.{sufixo},Ana,bispo,,,,,').getvalue())}, data={'senha_padrao': SENHA})
+    assert invalido.status_code == 400
+    assert invalido.json()['detail']['message'] == 'No users were imported'
+
+    assert client.post('/api/users/import', headers=cabecalhos, files={'arquivo': ('membros.txt', conteudo)}).status_code == 400
+    resposta = client.post('/api/users/import', headers=cabecalhos, files={'arquivo': ('membros.csv', conteudo)}, data={'senha_padrao': SENHA})
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json()['importados'] == 1
+    assert db.query(Usuario).filter_by(nome_usuario=f'ana.{sufixo}', id_distrito=distrito.id).count() == 1
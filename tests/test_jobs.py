@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta, timezone
+
+import jobs
+from jobs import JobGeracao, registrar_job
+from tests.conftest import criar_distrito
+
+
+def test_status_do_job_so_para_quem_pode_ver(client, db, distrito, autenticar):
+    outro = criar_distrito(db)
+    job = registrar_job(JobGeracao(ids_distritos=[distrito.id], meses=[(2031, 3)], id_gerado_por=distrito.pastor.id))
+
+    assert client.get(f'/api/schedules/jobs/{job.id}', headers=autenticar(distrito.pastor)).status_code == 200
+    assert client.get(f'/api/schedules/jobs/{job.id}', headers=autenticar(outro.pastor)).status_code == 200  # pastor distrital
+    assert client.get(f'/api/schedules/jobs/{job.id}', headers=autenticar(distrito.membros[0])).status_code == 403
+    assert client.get(f'/api/schedules/jobs/{job.id}', headers=autenticar(outro.membros[0])).status_code == 403
+    assert client.get('/api/schedules/jobs/inexistente', headers=autenticar(distrito.pastor)).status_code == 404
+
+
+def test_jobs_finalizados_sao_descartados(monkeypatch):
+    monkeypatch.setattr(jobs, '_jobs', {})
+    monkeypatch.setattr(jobs, 'GENERATION_JOB_MAX', 3)
+    agora = datetime.now(timezone.utc)
+    expirado = registrar_job(JobGeracao(ids_distritos=['d'], meses=[(2031, 3)], status='concluido', finalizado_em=agora - timedelta(seconds=jobs.GENERATION_JOB_TTL + 1)))
+    recente = registrar_job(JobGeracao(ids_distritos=['d'], meses=[(2031, 3)], status='concluido', finalizado_em=agora))
+    assert jobs.obter_job(expirado.id) is None
+    assert jobs.obter_job(recente.id) is recente
+
+    em_andamento = [registrar_job(JobGeracao(ids_distritos=['d'], meses=[(2031, 3)], status='executando')) for _ in range(3)]
+    # Acima do limite sai o finalizado; os em andamento ficam mesmo passando do limite
+    assert jobs.obter_job(recente.id) is None
+    assert all(jobs.obter_job(job.id) is job for job in em_andamento)
+
+
+def test_jobs_dividem_o_pool_de_processos(db):
+    primeiro, segundo = criar_distrito(db), criar_distrito(db)
+    pool = jobs.pool_compartilhado()
+    try:
+        for distrito in (primeiro, segundo):
+            job = jobs.executar_job(JobGeracao(ids_distritos=[distrito.id], meses=[(2031, 3), (2031, 4)]))
+            assert job.status == 'concluido', job.erros
+            assert len(job.escalas[distrito.id]) == 2 * len(distrito.igrejas)
+        assert jobs.pool_compartilhado() is pool
+        assert pool._max_workers == jobs.GENERATION_WORKERS
+    finally:
+        jobs.encerrar_pool()
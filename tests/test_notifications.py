@@ -0,0 +1,23 @@
+import time
+
+import jwt
+
+
+def test_stream_nao_aceita_o_token_de_acesso(client, autenticar, distrito):
+    cabecalho = autenticar(distrito.pastor)
+    token_acesso = cabecalho['Authorization'].split(' ', 1)[1]
+    resposta = client.get('/api/notifications/stream', params={'token': token_acesso})
+    assert resposta.status_code == 401
+
+
+def test_token_do_stream_nao_serve_para_as_outras_rotas(client, autenticar, distrito):
+    import server
+    resposta = client.post('/api/notifications/stream-token', headers=autenticar(distrito.pastor))
+    assert resposta.status_code == 200, resposta.text
+    token = resposta.json()['token']
+
+    payload = jwt.decode(token, server.SECRET_KEY, algorithms=[server.ALGORITHM])
+    assert payload['escopo'] == 'notifications_stream'
+    assert payload['exp'] <= time.time() + server.STREAM_TOKEN_EXPIRE_SECONDS + 1
+
+    assert client.get('/api/auth/me', headers={'Authorization': f'Bearer {token}'}).status_code == 401
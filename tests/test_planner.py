@@ -0,0 +1,115 @@
+import pytest
+
+from planner import IgrejaPlano, MembroPlano, ProblemaEscala, avaliar_plano, cultos_do_mes, resolver, resolver_round_robin
+
+ANO, MES = 2031, 3
+DOMINGO = [{"dia_semana": "domingo", "horario": "19:00"}]
+
+
+def problema(igrejas=1, pregadores=3, **opcoes) -> ProblemaEscala:
+    return ProblemaEscala(
+        id_distrito='d',
+        mes=MES,
+        ano=ANO,
+        igrejas=[IgrejaPlano(id=f'i{i}', nome=f'I{i}', horarios_culto=DOMINGO) for i in range(igrejas)],
+        pregadores=[MembroPlano(id=f'p{i}', eh_pregador=True, pontuacao_pregacao=90 - i) for i in range(pregadores)],
+        **opcoes,
+    )
+
+
+def domingos():
+    return [data for data, _ in cultos_do_mes(IgrejaPlano(id='x', nome='x', horarios_culto=DOMINGO), ANO, MES)]
+
+
+def test_cultos_do_mes_usa_os_dias_da_semana_em_portugues():
+    assert domingos() == ['2031-03-02', '2031-03-09', '2031-03-16', '2031-03-23', '2031-03-30']
+
+
+def test_round_robin_segue_a_ordem_de_pontuacao():
+    itens = resolver_round_robin(problema())
+    assert [item.id_pregador for item in itens] == ['p0', 'p1', 'p2', 'p0', 'p1']
+
+
+def test_round_robin_pula_indisponiveis_e_ocupados():
+    p = problema()
+    primeiro, segundo = domingos()[:2]
+    p.indisponiveis.add(('p0', primeiro))
+    p.ocupacao.adicionar('p2', segundo, 'item-de-outra-escala')
+    itens = {item.data: item.id_pregador for item in resolver_round_robin(p)}
+    assert itens[primeiro] == 'p1'
+    assert itens[segundo] != 'p2'
+
+
+def test_round_robin_nao_escala_o_mesmo_pregador_duas_vezes_na_data():
+    p = problema(igrejas=3, pregadores=3)
+    itens = resolver_round_robin(p)
+    assert len(itens) == 3 * len(domingos())
+    assert avaliar_plano(p, itens)['conflitos'] == 0
+
+
+def test_round_robin_deixa_o_culto_sem_item_quando_ninguem_esta_livre():
+    p = problema(igrejas=2, pregadores=1)
+    itens = resolver_round_robin(p)
+    assert len(itens) == len(domingos())
+    assert {item.id_igreja for item in itens} == {'i0'}
+
+
+def test_resolver_rejeita_modo_desconhecido():
+    with pytest.raises(ValueError):
+        resolver(problema(), 'aleatorio')
+
+
+def test_carregar_e_gravar_plano_no_banco(db, distrito):
+    from models import Atribuicao, Escala, ItemEscala
+    from planner import carregar_problema, gravar_plano
+
+    p = carregar_problema(db, distrito.id, MES, ANO)
+    assert len(p.igrejas) == 3 and len(p.pregadores) == 9  # membros + pastor
+    itens = resolver(p, 'round_robin')
+    ids_escalas = gravar_plano(db, p, itens, distrito.pastor.id)
+    db.commit()
+
+    assert db.query(Escala).filter(Escala.id.in_(ids_escalas)).count() == 3
+    assert db.query(ItemEscala).filter(ItemEscala.id_escala.in_(ids_escalas)).count() == len(itens)
+    assert db.query(Atribuicao).filter(Atribuicao.id_item_escala.in_([item.id for item in itens])).count() == len(itens)
+    # Igrejas que já têm escala no mês não entram de novo no problema
+    assert carregar_problema(db, distrito.id, MES, ANO).igrejas == []
+
+
+def test_otimizado_respeita_indisponiveis_e_ocupados():
+    p = problema(igrejas=2, pregadores=4)
+    primeiro = domingos()[0]
+    p.indisponiveis.add(('p0', primeiro))
+    p.ocupacao.adicionar('p1', primeiro, 'item-de-outra-escala')
+    itens = resolver(p, 'otimizado')
+    assert {item.id_pregador for item in itens if item.data == primeiro} == {'p2', 'p3'}
+    assert avaliar_plano(p, itens)['conflitos'] == 0
+
+
+def test_otimizado_distribui_as_participacoes():
+    p = problema(igrejas=1, pregadores=5)
+    for pregador in p.pregadores:
+        pregador.pontuacao_pregacao = 50
+    itens = resolver(p, 'otimizado')
+    metricas = avaliar_plano(p, itens)
+    assert metricas['taxa_preenchimento'] == 1.0
+    assert metricas['max_aparicoes'] == 1  # cinco domingos, cinco pregadores
+
+
+def test_otimizado_prefere_a_maior_pontuacao_quando_ha_folga():
+    p = problema(igrejas=1, pregadores=2)
+    p.pregadores[0].pontuacao_pregacao, p.pregadores[1].pontuacao_pregacao = 10, 90
+    p.pesos.equilibrio = 0
+    itens = resolver(p, 'otimizado')
+    assert {item.id_pregador for item in itens} == {'p1'}
+
+
+def test_otimizado_preenche_cantores_sem_repetir_o_pregador_na_data():
+    membros = [MembroPlano(id=f'm{i}', eh_pregador=True, eh_cantor=True, pontuacao_pregacao=50, pontuacao_canto=50) for i in range(4)]
+    p = problema(igrejas=2, pregadores=0, cantores_por_culto=1)
+    p.pregadores, p.cantores = membros, membros
+    itens = resolver(p, 'otimizado')
+    assert len(itens) == 2 * len(domingos())
+    for item in itens:
+        assert len(item.ids_cantores) == 1
+    assert avaliar_plano(p, itens)['conflitos'] == 0
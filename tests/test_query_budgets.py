@@ -0,0 +1,108 @@
+"""
+Orçamentos de consultas das rotas (`@orcamento_consultas`)
+
+Os testes rodam com QUERY_BUDGET_STRICT=1 (conftest): uma rota acima do
+orçamento responderia 500. As leituras rodam duas vezes (caches frios e
+quentes) e os comandos SQL são contados por um listener próprio no engine da
+API, conferido contra o orçamento e contra o cabeçalho X-Query-Count.
+"""
+import pytest
+from sqlalchemy import event
+
+ANO = 2034
+
+
+@pytest.fixture
+def contar_comandos(banco):
+    from database import async_engine
+    comandos = []
+
+    def registrar(conexao, cursor, sql, parametros, contexto, executemany):
+        comandos.append(sql)
+
+    event.listen(async_engine.sync_engine, 'before_cursor_execute', registrar)
+    yield comandos
+    event.remove(async_engine.sync_engine, 'before_cursor_execute', registrar)
+
+
+@pytest.fixture
+def requisitar(client, contar_comandos):
+    import profiling
+    assert profiling.QUERY_BUDGET_STRICT
+
+    def requisitar(metodo, caminho, orcamento, **opcoes):
+        contar_comandos.clear()
+        resposta = client.request(metodo, caminho, **opcoes)
+        assert resposta.status_code < 400, resposta.text
+        assert int(resposta.headers['X-Query-Count']) == len(contar_comandos), contar_comandos
+        assert len(contar_comandos) <= orcamento, contar_comandos
+        return resposta
+    return requisitar
+
+
+@pytest.mark.parametrize('caminho, orcamento', [
+    ('/api/auth/me', 2),
+    ('/api/districts', 3),
+    ('/api/churches', 3),
+    ('/api/users/preachers', 3),
+    ('/api/users/singers', 3),
+    ('/api/notifications', 3),
+    ('/api/notifications/unread-count', 3),
+])
+def test_leituras_dentro_do_orcamento(requisitar, autenticar, distrito, caminho, orcamento):
+    cabecalhos = autenticar(distrito.pastor)
+    for _ in range(2):
+        requisitar('GET', caminho, orcamento, headers=cabecalhos)
+
+
+def test_escalas_dentro_do_orcamento(requisitar, autenticar, distrito):
+    cabecalhos = autenticar(distrito.pastor)
+    gerada = requisitar('POST', '/api/schedules/generate-auto', 15, params={'mes': 3, 'ano': ANO, 'id_distrito': distrito.id}, headers=cabecalhos).json()
+    for _ in range(2):
+        requisitar('GET', '/api/schedules', 4, params={'id_distrito': distrito.id, 'limite': 50}, headers=cabecalhos)
+
+    id_escala = gerada['escalas'][0]
+    escala = next(escala for escala in requisitar('GET', '/api/schedules', 4, params={'id_distrito': distrito.id}, headers=cabecalhos).json() if escala['id'] == id_escala)
+    membros = [membro.id for membro in distrito.membros]
+    itens = [{'id': item['id'], 'id_pregador': membros[indice % len(membros)], 'ids_cantores': []} for indice, item in enumerate(escala['itens'])]
+    requisitar('PATCH', f'/api/schedules/{id_escala}/items', 14, json={'itens': itens}, headers=cabecalhos)
+    requisitar('POST', f'/api/schedules/{id_escala}/confirm', 10, headers=cabecalhos)
+
+
+def test_analytics_dentro_do_orcamento(requisitar, autenticar, distrito):
+    cabecalhos = autenticar(distrito.pastor)
+    for _ in range(2):
+        requisitar('GET', '/api/analytics/dashboard', 20, params={'id_distrito': distrito.id}, headers=cabecalhos)
+        requisitar('GET', '/api/analytics/report', 25, params={'id_distrito': distrito.id}, headers=cabecalhos)
+
+
+def test_rota_acima_do_orcamento_responde_500(client, autenticar, distrito, monkeypatch):
+    import server
+    cabecalhos = autenticar(distrito.pastor)
+    monkeypatch.setattr(server.get_notifications, 'orcamento_consultas', 0)
+    resposta = client.get('/api/notifications', headers=cabecalhos)
+    assert resposta.status_code == 500
+    assert resposta.json()['detail'].startswith('Query budget exceeded')
+    assert int(resposta.headers['X-Query-Count']) > 0
+
+
+def test_orcamentos_declarados():
+    """Os orçamentos conferidos acima são os declarados nas rotas."""
+    import server
+    orcamentos = {(metodo, rota.path): rota.endpoint.orcamento_consultas for rota in server.app.routes if hasattr(getattr(rota, 'endpoint', None), 'orcamento_consultas') for metodo in rota.methods}
+    assert orcamentos == {
+        ('GET', '/api/auth/me'): 2,
+        ('GET', '/api/districts'): 3,
+        ('GET', '/api/churches'): 3,
+        ('GET', '/api/users/preachers'): 3,
+        ('GET', '/api/users/singers'): 3,
+        ('GET', '/api/schedules'): 4,
+        ('POST', '/api/schedules/generate-auto'): 15,
+        ('PATCH', '/api/schedules/{schedule_id}/items'): 14,
+        ('POST', '/api/schedules/{schedule_id}/confirm'): 10,
+        ('GET', '/api/notifications'): 3,
+        ('GET', '/api/notifications/unread-count'): 3,
+        ('GET', '/api/analytics/dashboard'): 20,
+        ('GET', '/api/analytics/report'): 25,
+        ('GET', '/api/analytics/report/{secao}'): 25,
+    }
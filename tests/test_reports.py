@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from tests.conftest import criar_distrito
+
+CRIACAO = datetime(2035, 2, 20, 12, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def dados(db):
+    """Distrito com itens em março e abril de 2035 na igreja 0, em março na igreja 1 e nenhum na igreja 2."""
+    from models import Avaliacao, Escala, ItemEscala
+    distrito = criar_distrito(db, membros=4)
+    igreja0, igreja1, _ = distrito.igrejas
+    m0, m1, m2, m3 = distrito.membros
+
+    def escala(igreja, mes, *itens):
+        nova = Escala(mes=mes, ano=2035, id_igreja=igreja.id, id_distrito=distrito.id, id_gerado_por=distrito.pastor.id, modo_geracao='manual', status='confirmada')
+        for data, id_pregador, ids_cantores, status, horas in itens:
+            confirmado_em = CRIACAO + timedelta(hours=horas) if horas is not None else None
+            nova.itens.append(ItemEscala(data=data, horario='09:00', id_pregador=id_pregador, ids_cantores=ids_cantores, status=status, criado_em=CRIACAO, confirmado_em=confirmado_em))
+        db.add(nova)
+        return nova
+
+    marco = escala(igreja0, 3,
+        ('2035-03-05', m0.id, [m1.id], 'confirmado', 2),
+        ('2035-03-12', m0.id, [], 'recusado', None),
+        ('2035-03-19', m0.id, [], 'completado', 4),
+        ('2035-03-26', m2.id, [], 'confirmado', 10),
+    )
+    escala(igreja0, 4, ('2035-04-02', None, [], 'pendente', None))
+    escala(igreja1, 3,
+        ('2035-03-07', m3.id, [], 'cancelado', None),
+        ('2035-03-14', m3.id, [], 'pendente', None),
+    )
+    db.flush()
+    item = marco.itens[0]
+    for id_usuario, tipo_membro, nota, criado_em in [
+        (m0.id, 'pregador', 5, datetime(2035, 3, 6, tzinfo=timezone.utc)),
+        (m0.id, 'pregador', 4, datetime(2035, 3, 20, tzinfo=timezone.utc)),
+        (m1.id, 'cantor', 3, datetime(2035, 3, 6, tzinfo=timezone.utc)),
+        (m2.id, 'pregador', 1, datetime(2035, 5, 10, tzinfo=timezone.utc)),
+    ]:
+        db.add(Avaliacao(id_item_escala=item.id, id_igreja=igreja0.id, tipo_membro=tipo_membro, id_usuario_avaliado=id_usuario, nota=nota, criado_em=criado_em))
+    db.commit()
+    return distrito
+
+
+def test_participacao(db, dados):
+    from reports import carregar_dados, participacao
+    m0, m1, m2, m3 = dados.membros
+    linhas = {(linha['id_usuario'], linha['papel']): linha for linha in participacao(carregar_dados(db, dados.id))}
+
+    assert set(linhas) == {(m0.id, 'pregador'), (m1.id, 'cantor'), (m2.id, 'pregador'), (m3.id, 'pregador')}
+    pregador = linhas[(m0.id, 'pregador')]
+    assert (pregador['total'], pregador['confirmado'], pregador['recusado'], pregador['completado']) == (3, 1, 1, 1)
+    assert (pregador['taxa_confirmacao'], pregador['taxa_recusa']) == (0.6667, 0.3333)
+    assert pregador['nome_completo'] == m0.nome_completo
+    assert (linhas[(m1.id, 'cantor')]['taxa_confirmacao'], linhas[(m1.id, 'cantor')]['taxa_recusa']) == (1.0, 0.0)
+    assert (linhas[(m3.id, 'pregador')]['cancelado'], linhas[(m3.id, 'pregador')]['pendente'], linhas[(m3.id, 'pregador')]['taxa_confirmacao']) == (1, 1, 0.0)
+
+
+def test_latencia_confirmacao(db, dados):
+    from reports import carregar_dados, latencia_confirmacao
+    m0, _, m2, _ = dados.membros
+    latencia = latencia_confirmacao(carregar_dados(db, dados.id))
+
+    # 2h, 4h e 10h
+    assert latencia['geral'] == {'confirmados': 3, 'media_horas': 5.3333, 'mediana_horas': 4.0, 'p90_horas': 8.8}
+    por_pregador = {linha['id_pregador']: linha for linha in latencia['por_pregador']}
+    assert (por_pregador[m0.id]['confirmados'], por_pregador[m0.id]['media_horas'], por_pregador[m0.id]['p90_horas']) == (2, 3.0, 3.8)
+    assert (por_pregador[m2.id]['confirmados'], por_pregador[m2.id]['media_horas']) == (1, 10.0)
+    assert [linha['id_pregador'] for linha in latencia['por_pregador']] == [m0.id, m2.id]
+
+
+def test_distribuicao_notas(db, dados):
+    from reports import carregar_dados, distribuicao_notas
+    m0, m1, m2, _ = dados.membros
+    notas = distribuicao_notas(carregar_dados(db, dados.id))
+
+    assert notas['histograma'] == {
+        'cantor': {'1': 0, '2': 0, '3': 1, '4': 0, '5': 0},
+        'pregador': {'1': 1, '2': 0, '3': 0, '4': 1, '5': 1},
+    }
+    por_membro = {(linha['id_usuario_avaliado'], linha['tipo_membro']): linha for linha in notas['por_membro']}
+    assert (por_membro[(m0.id, 'pregador')]['total'], por_membro[(m0.id, 'pregador')]['media']) == (2, 4.5)
+    assert por_membro[(m1.id, 'cantor')]['desvio_padrao'] is None  # uma só avaliação
+    assert por_membro[(m2.id, 'pregador')]['media'] == 1.0
+
+
+def test_cobertura(db, dados):
+    from reports import carregar_dados, cobertura
+    matriz = cobertura(carregar_dados(db, dados.id))
+
+    assert matriz['meses'] == ['2035-03', '2035-04']
+    assert [igreja['id'] for igreja in matriz['igrejas']] == [igreja.id for igreja in dados.igrejas]
+    assert matriz['valores'] == [
+        [0.75, 0.0],   # um item recusado em março; o de abril não tem pregador
+        [0.5, None],   # um item cancelado; nenhum item em abril
+        [None, None],  # igreja sem itens
+    ]
+
+
+def test_periodo_filtra_itens_e_avaliacoes(db, dados):
+    from reports import calcular, carregar_dados
+    carregados = carregar_dados(db, dados.id, '2035-03-01', '2035-04-01')
+    assert sorted(carregados.itens['data'].str[:7].unique()) == ['2035-03']
+    assert len(carregados.avaliacoes) == 3
+
+    relatorio = calcular(carregados)
+    assert relatorio['cobertura']['meses'] == ['2035-03']
+    assert relatorio['distribuicao_notas']['histograma']['pregador'] == {'1': 0, '2': 0, '3': 0, '4': 1, '5': 1}
+    assert relatorio['latencia_confirmacao']['geral']['confirmados'] == 3
+
+    abril = calcular(carregar_dados(db, dados.id, '2035-04-01', '2035-05-01'))
+    assert abril['participacao'] == [] and abril['distribuicao_notas'] == {'histograma': {}, 'por_membro': []}
+    assert abril['cobertura']['valores'] == [[0.0], [None], [None]]
+
+
+def test_etag_e_cache_mudam_depois_de_uma_escrita_no_distrito(db, client, autenticar, dados):
+    from models import Escala, ItemEscala
+    from reports import _relatorios
+    cabecalhos = autenticar(dados.pastor)
+    parametros = {'id_distrito': dados.id}
+
+    primeira = client.get('/api/analytics/report', params=parametros, headers=cabecalhos)
+    assert primeira.status_code == 200, primeira.text
+    etag = primeira.headers['ETag']
+    assert client.get('/api/analytics/report', params=parametros, headers={**cabecalhos, 'If-None-Match': etag}).status_code == 304
+    chaves = [chave for chave in list(_relatorios._itens) if chave[0] == dados.id]
+    assert len(chaves) == 1
+
+    item = db.query(ItemEscala).join(Escala).filter(Escala.id_distrito == dados.id, ItemEscala.data == '2035-04-02').one()
+    item.id_pregador = dados.membros[1].id
+    db.commit()
+
+    segunda = client.get('/api/analytics/report', params=parametros, headers={**cabecalhos, 'If-None-Match': etag})
+    assert segunda.status_code == 200
+    assert segunda.headers['ETag'] != etag
+    assert segunda.json()['cobertura']['valores'][0] == [0.75, 1.0]
+    assert chaves[0] not in _relatorios._itens
+    assert len([chave for chave in list(_relatorios._itens) if chave[0] == dados.id]) == 1
+
+
+def test_secao_do_relatorio(client, autenticar, dados):
+    cabecalhos = autenticar(dados.pastor)
+    resposta = client.get('/api/analytics/report/coverage', params={'id_distrito': dados.id}, headers=cabecalhos)
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json()['meses'] == ['2035-03', '2035-04']
+
+    desconhecida = client.get('/api/analytics/report/inexistente', params={'id_distrito': dados.id}, headers=cabecalhos)
+    assert desconhecida.status_code == 404
+    assert desconhecida.json()['detail'] == 'Unknown report'
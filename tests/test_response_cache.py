@@ -0,0 +1,54 @@
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def backend_redis(monkeypatch):
+    """BackendRedis com os clientes assíncrono e síncrono ligados a um mesmo servidor falso."""
+    import response_cache
+    servidor = fakeredis.FakeServer()
+    backend = response_cache.BackendRedis('redis://localhost:6379/0', ttl=60)
+    backend._cliente = fakeredis.aioredis.FakeRedis(server=servidor)
+    backend._cliente_sync = fakeredis.FakeRedis(server=servidor)
+    monkeypatch.setattr(response_cache, 'backend', backend)
+    return backend
+
+
+def nomes(resposta) -> set:
+    return {igreja['nome'] for igreja in resposta.json()}
+
+
+def test_lista_em_cache_no_redis_com_etag(client, autenticar, distrito, backend_redis):
+    cabecalhos = autenticar(distrito.pastor)
+    primeira = client.get('/api/churches', headers=cabecalhos)
+    assert primeira.status_code == 200
+    assert backend_redis._cliente_sync.keys('respostas:churches:*')
+
+    segunda = client.get('/api/churches', headers={**cabecalhos, 'If-None-Match': primeira.headers['ETag']})
+    assert segunda.status_code == 304
+    assert int(segunda.headers['X-Query-Count']) == 0
+
+
+def test_escrita_pela_api_invalida_antes_da_proxima_leitura(client, autenticar, distrito, backend_redis, monkeypatch):
+    cabecalhos = autenticar(distrito.pastor)
+    monkeypatch.setattr(backend_redis, 'incrementar_sync', lambda namespaces: pytest.fail("cliente síncrono usado no event loop"))
+    igreja = distrito.igrejas[0]
+    assert igreja.nome in nomes(client.get('/api/churches', headers=cabecalhos))
+
+    resposta = client.put(f'/api/churches/{igreja.id}', json={'nome': f'{igreja.nome} (nova)'}, headers=cabecalhos)
+    assert resposta.status_code == 200, resposta.text
+    assert f'{igreja.nome} (nova)' in nomes(client.get('/api/churches', headers=cabecalhos))
+    assert int(backend_redis._cliente_sync.get('respostas:versao:igrejas')) >= 1
+
+
+def test_commit_fora_do_event_loop_usa_o_cliente_sincrono(db, client, autenticar, distrito, backend_redis):
+    cabecalhos = autenticar(distrito.pastor)
+    client.get('/api/churches', headers=cabecalhos)
+    versao = int(backend_redis._cliente_sync.get('respostas:versao:igrejas') or 0)
+
+    igreja = distrito.igrejas[1]
+    igreja.nome = f'{igreja.nome} (script)'
+    db.commit()
+    assert int(backend_redis._cliente_sync.get('respostas:versao:igrejas')) == versao + 1
+    assert igreja.nome in nomes(client.get('/api/churches', headers=cabecalhos))
@@ -0,0 +1,118 @@
+import pytest
+
+
+def test_recusa_enfileira_o_aviso_com_chave_estavel(db, client, autenticar, distrito):
+    from models import Escala, ItemEscala, MensagemSaida
+    distrito.pastor.telefone = '11999990000'
+    escala = Escala(mes=6, ano=2032, id_igreja=distrito.igrejas[0].id, id_distrito=distrito.id, id_gerado_por=distrito.pastor.id, modo_geracao='manual', status='confirmada')
+    pregador = distrito.membros[0]
+    item = ItemEscala(data='2032-06-05', horario='09:00', id_pregador=pregador.id, ids_cantores=[])
+    escala.itens.append(item)
+    db.add(escala)
+    db.commit()
+
+    resposta = client.post(f'/api/schedule-items/{item.id}/refuse', params={'motivo': 'viagem'}, headers=autenticar(pregador))
+    assert resposta.status_code == 200, resposta.text
+    mensagens = db.query(MensagemSaida).filter(MensagemSaida.destino == '11999990000').all()
+    assert [mensagem.chave_dedup for mensagem in mensagens] == [f'recusa:{item.id}:{pregador.id}']
+
+
+@pytest.fixture
+def escala(db, distrito):
+    """Escala confirmada com dois itens no mesmo sábado e um em cada um dos dois sábados seguintes."""
+    from models import Escala, ItemEscala
+    nova = Escala(mes=9, ano=2032, id_igreja=distrito.igrejas[0].id, id_distrito=distrito.id, id_gerado_por=distrito.pastor.id, modo_geracao='manual', status='confirmada')
+    m = distrito.membros
+    nova.itens.extend([
+        ItemEscala(data='2032-09-04', horario='09:00', id_pregador=m[0].id, ids_cantores=[]),
+        ItemEscala(data='2032-09-04', horario='19:00', id_pregador=m[1].id, ids_cantores=[]),
+        ItemEscala(data='2032-09-11', horario='09:00', id_pregador=m[3].id, ids_cantores=[]),
+        ItemEscala(data='2032-09-18', horario='09:00', id_pregador=m[4].id, ids_cantores=[]),
+    ])
+    db.add(nova)
+    db.commit()
+    return nova
+
+
+def alterar(client, cabecalhos, escala, *itens):
+    return client.patch(f'/api/schedules/{escala.id}/items', json={'itens': list(itens)}, headers=cabecalhos)
+
+
+def erros(resposta) -> list:
+    assert resposta.status_code == 400, resposta.text
+    assert resposta.json()['detail']['message'] == 'No items were updated'
+    return [(erro['id_item'], erro['erro']) for erro in resposta.json()['detail']['erros']]
+
+
+def ordenados(escala) -> list:
+    return sorted(escala.itens, key=lambda item: (item.data, item.horario))
+
+
+def pregadores(db, escala) -> list:
+    db.expire_all()
+    return [item.id_pregador for item in ordenados(escala)]
+
+
+def test_lote_e_tudo_ou_nada_e_lista_todos_os_erros(db, client, autenticar, distrito, escala):
+    m = distrito.membros
+    manha, _, seguinte, ultimo = ordenados(escala)
+    antes = pregadores(db, escala)
+    resposta = alterar(client, autenticar(distrito.pastor), escala,
+        {'id': ultimo.id, 'id_pregador': m[5].id},  # válido
+        {'id': 'inexistente', 'id_pregador': m[5].id},
+        {'id': manha.id, 'id_pregador': m[1].id},  # já prega à noite no mesmo dia
+        {'id': seguinte.id, 'id_pregador': m[2].id, 'ids_cantores': [m[2].id]},  # cantor = pregador
+    )
+    assert erros(resposta) == [
+        ('inexistente', 'Schedule item not found'),
+        (manha.id, 'Preacher already scheduled on this date'),
+        (seguinte.id, f'Singer {m[2].id} already scheduled on this date'),
+    ]
+    assert pregadores(db, escala) == antes
+
+
+def test_item_repetido_no_lote(client, autenticar, distrito, escala):
+    m = distrito.membros
+    seguinte = ordenados(escala)[2]
+    resposta = alterar(client, autenticar(distrito.pastor), escala, {'id': seguinte.id, 'id_pregador': m[5].id}, {'id': seguinte.id, 'id_pregador': m[6].id})
+    assert erros(resposta) == [(seguinte.id, 'Item appears more than once in the batch')]
+
+
+def test_mesmo_membro_duas_vezes_na_data_dentro_do_lote(client, autenticar, distrito, escala):
+    m = distrito.membros
+    manha, noite = ordenados(escala)[:2]
+    resposta = alterar(client, autenticar(distrito.pastor), escala, {'id': manha.id, 'id_pregador': m[5].id}, {'id': noite.id, 'id_pregador': m[5].id})
+    assert erros(resposta) == [(manha.id, 'Preacher already scheduled on this date'), (noite.id, 'Preacher already scheduled on this date')]
+
+
+def test_conflito_com_outra_escala(db, client, autenticar, distrito, escala):
+    from models import Escala, ItemEscala
+    m = distrito.membros
+    outra = Escala(mes=9, ano=2032, id_igreja=distrito.igrejas[1].id, id_distrito=distrito.id, id_gerado_por=distrito.pastor.id, modo_geracao='manual', status='confirmada')
+    outra.itens.append(ItemEscala(data='2032-09-11', horario='09:00', id_pregador=m[5].id, ids_cantores=[m[6].id]))
+    db.add(outra)
+    db.commit()
+
+    seguinte = ordenados(escala)[2]
+    resposta = alterar(client, autenticar(distrito.pastor), escala, {'id': seguinte.id, 'id_pregador': m[5].id, 'ids_cantores': [m[6].id]})
+    assert erros(resposta) == [(seguinte.id, 'Preacher already scheduled on this date'), (seguinte.id, f'Singer {m[6].id} already scheduled on this date')]
+
+
+def test_membro_trocado_entre_itens_do_lote(db, client, autenticar, distrito, escala):
+    m = distrito.membros
+    manha, noite = ordenados(escala)[:2]
+    resposta = alterar(client, autenticar(distrito.pastor), escala, {'id': manha.id, 'id_pregador': m[1].id}, {'id': noite.id, 'id_pregador': m[0].id})
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json()['atualizados'] == 2
+    assert pregadores(db, escala)[:2] == [m[1].id, m[0].id]
+
+
+@pytest.mark.parametrize('status', ['recusado', 'cancelado'])
+def test_item_recusado_ou_cancelado_nao_ocupa(db, client, autenticar, distrito, escala, status):
+    m = distrito.membros
+    manha, noite = ordenados(escala)[:2]
+    noite.status = status
+    db.commit()
+    resposta = alterar(client, autenticar(distrito.pastor), escala, {'id': manha.id, 'id_pregador': m[1].id})
+    assert resposta.status_code == 200, resposta.text
+    assert pregadores(db, escala)[0] == m[1].id
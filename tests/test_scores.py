@@ -0,0 +1,64 @@
+import pytest
+
+
+@pytest.fixture
+def item(db, distrito):
+    from models import Escala, ItemEscala
+    escala = Escala(mes=8, ano=2032, id_igreja=distrito.igrejas[0].id, id_distrito=distrito.id, id_gerado_por=distrito.pastor.id, modo_geracao='manual', status='confirmada')
+    item = ItemEscala(data='2032-08-07', horario='09:00', id_pregador=distrito.membros[0].id, ids_cantores=[distrito.membros[2].id])
+    escala.itens.append(item)
+    db.add(escala)
+    db.commit()
+    return item
+
+
+def avaliar(client, distrito, item, id_usuario, nota, tipo_membro='pregador'):
+    resposta = client.post('/api/evaluations', json={'id_item_escala': item.id, 'id_igreja': distrito.igrejas[0].id, 'tipo_membro': tipo_membro, 'id_usuario_avaliado': id_usuario, 'nota': nota})
+    assert resposta.status_code == 200, resposta.text
+
+
+def pontuacoes(db, id_usuario):
+    from models import Usuario
+    db.expire_all()
+    usuario = db.get(Usuario, id_usuario)
+    return usuario.pontuacao_pregacao, usuario.pontuacao_canto
+
+
+def test_avaliacao_parte_da_pontuacao_atual(db, client, distrito, item):
+    pregador, cantor = distrito.membros[0], distrito.membros[2]
+    pregador.pontuacao_pregacao, cantor.pontuacao_canto = 85.0, 30.0
+    db.commit()
+
+    avaliar(client, distrito, item, pregador.id, 4)
+    assert pontuacoes(db, pregador.id)[0] == 87.0
+    avaliar(client, distrito, item, pregador.id, 1)
+    assert pontuacoes(db, pregador.id)[0] == 83.0
+    avaliar(client, distrito, item, cantor.id, 5, 'cantor')
+    assert pontuacoes(db, cantor.id) == (52.0, 34.0)  # a de pregação (50 + 2) não muda
+
+
+def test_avaliacao_limita_a_pontuacao(db, client, distrito, item):
+    pregador = distrito.membros[0]
+    pregador.pontuacao_pregacao = 99.0
+    db.commit()
+    avaliar(client, distrito, item, pregador.id, 5)
+    assert pontuacoes(db, pregador.id)[0] == 100.0
+
+
+def test_recalcular_preserva_as_pontuacoes_por_padrao(db, client, distrito, item):
+    from models import PontuacaoMembro
+    from scores import recalcular_pontuacoes
+    pregador = distrito.membros[0]
+    pregador.pontuacao_pregacao = 85.0
+    db.commit()
+    avaliar(client, distrito, item, pregador.id, 4)
+
+    assert recalcular_pontuacoes(db) == {'pregador': 0, 'cantor': 0}
+    db.commit()
+    assert pontuacoes(db, pregador.id)[0] == 87.0
+    agregado = db.get(PontuacaoMembro, (pregador.id, 'pregador'))
+    assert (agregado.total_avaliacoes, agregado.soma_notas) == (1, 4)
+
+    recalcular_pontuacoes(db, redefinir_pontuacoes=True)
+    db.commit()
+    assert pontuacoes(db, pregador.id)[0] == 52.0